@@ -0,0 +1,316 @@
+"""
+This module contains the classes and functionalities for reading the EV database. The database file is parsed and
+indexed once per process and the EV lookups are served from memory. The parsed database is invalidated when the
+modification time or the size of the file changes.
+
+The database can also be compiled into a binary snapshot (see compile_database), which consists of a .npy file with
+the numeric parameters as a dense float array and a .json side table with the parameter names, the vehicle aliases and
+the text of the text parameters. When the snapshot is newer than the .csv file, it is loaded instead of parsing the .csv
+file, its float array is memory mapped, and the numeric parameters of the vehicles are read from it.
+
+The vehicle aliases and their basic vehicle information are listed without parsing the database (see list_aliases and
+list_vehicles). Only the header row and the leading basic vehicle rows of the .csv file are read.
+"""
+
+__all__ = ['EVDatabase', 'VehicleInfo', 'snapshot_paths', 'compile_database', 'get_database', 'clear_database_cache',
+           'list_aliases', 'list_vehicles']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import csv
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from EV_sim.config import definations
+
+
+_TEXT_CLASSIFICATIONS = ('basic vehicle',)  # parameter classifications whose rows are texts, even if they are numbers
+
+
+def _to_float(text: Optional[str]) -> float:
+    """
+    Converts the text of a database entry to a float, or np.nan if it is empty or not a number.
+    """
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _is_text_row(key: tuple, row: list) -> bool:
+    """
+    Checks if a row of the database is a text parameter, i.e., a basic vehicle row (e.g., the year is an identifier
+    rather than a number) or a row with an entry that is not a number.
+    """
+    return (key[0] in _TEXT_CLASSIFICATIONS) or any((entry is not None) and math.isnan(_to_float(entry))
+                                                    for entry in row)
+
+
+def _file_stamp(file_dir: str) -> Optional[tuple]:
+    """
+    Returns the modification time and the size of a file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(file_dir)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def snapshot_paths(file_dir: str = definations.EV_DATA_DIR) -> tuple[str, str]:
+    """
+    Returns the locations of the binary snapshot files of an EV database file.
+    :param file_dir: (str) location of the EV_dataset.csv file
+    :return: (tuple) locations of the .npy file of the numeric parameters and of the .json side table
+    """
+    root = os.path.splitext(file_dir)[0]
+    return f"{root}.npy", f"{root}.json"
+
+
+class EVDatabase:
+    """
+    EVDatabase stores the parsed EV database. The numeric entries are stored as a dense float array (np.nan for the
+    empty and the text entries), and the entries of the text parameters (see _is_text_row) also as a table of texts
+    (None for the empty entries, and None instead of the row for the numeric parameters). The rows are the
+    (parameter classification, parameter name) pairs and the columns are the vehicle aliases.
+    """
+
+    def __init__(self, file_dir: str, index: list, aliases: list, text: list, values: npt.ArrayLike,
+                 file_stamps: tuple = ()) -> None:
+        """
+        EVDatabase constructor. Use the from_csv or from_snapshot class methods to load a database.
+        :param file_dir: (str) location of the EV_dataset.csv file
+        :param index: (list) (parameter classification, parameter name) pairs of the rows
+        :param aliases: (list) vehicle aliases of the columns
+        :param text: (list) texts of the entries, a list per text parameter row and None per numeric parameter row
+        :param values: (np.ndarray) numeric entries of shape (number of rows, number of aliases)
+        :param file_stamps: (tuple) modification times and sizes of the files the database was loaded from
+        """
+        self.file_dir = file_dir
+        self.index = [tuple(key) for key in index]
+        self.aliases = list(aliases)
+        self.text = text
+        self.values = values
+        self.file_stamps = file_stamps
+        self._columns = {alias: i for i, alias in enumerate(self.aliases)}
+        self._vehicles = {}  # parameters of the vehicles that have been looked up
+
+    @classmethod
+    def from_csv(cls, file_dir: str = definations.EV_DATA_DIR) -> 'EVDatabase':
+        """
+        Parses the EV database .csv file.
+        :param file_dir: (str) location of the EV_dataset.csv file
+        :return: (EVDatabase) parsed database
+        """
+        stamp = _file_stamp(file_dir)
+        df = pd.read_csv(file_dir, header=0)
+        df.set_index(['Parameter Classification', 'Parameter Name'], inplace=True)
+        text = [[None if pd.isnull(entry) else str(entry) for entry in row] for row in df.itertuples(index=False)]
+        values = np.array([[_to_float(entry) for entry in row] for row in text], dtype=np.float64)
+        text = [row if _is_text_row(key, row) else None for key, row in zip(df.index, text)]
+        return cls(file_dir=file_dir, index=df.index.tolist(), aliases=df.columns.tolist(), text=text, values=values,
+                   file_stamps=(stamp,))
+
+    @classmethod
+    def from_snapshot(cls, file_dir: str = definations.EV_DATA_DIR) -> 'EVDatabase':
+        """
+        Loads the binary snapshot of the EV database. The float array is memory mapped.
+        :param file_dir: (str) location of the EV_dataset.csv file the snapshot was compiled from
+        :return: (EVDatabase) loaded database
+        """
+        npy_file, json_file = snapshot_paths(file_dir)
+        stamps = (_file_stamp(npy_file), _file_stamp(json_file))
+        with open(json_file) as f:
+            side_table = json.load(f)
+        values = np.load(npy_file, mmap_mode='r')
+        if values.shape != (len(side_table['index']), len(side_table['aliases'])):
+            raise ValueError(f"The snapshot files of {file_dir} do not match.")
+        return cls(file_dir=file_dir, index=side_table['index'], aliases=side_table['aliases'],
+                   text=side_table['text'], values=values, file_stamps=stamps)
+
+    def vehicle(self, alias_name: str) -> dict:
+        """
+        Returns the parameters of a vehicle, grouped by the parameter classification, e.g.,
+        database.vehicle("Volt_2017")["wheel"]["radius [m]"]. The entries of the numeric parameters are floats read
+        from the float array, the entries of the text parameters are texts as in the .csv file, and the empty entries
+        are np.nan.
+        :param alias_name: (str) vehicle alias
+        :return: (dict) dictionaries of the parameters keyed by the parameter classification
+        """
+        if alias_name not in self._columns:
+            raise Exception(f"{alias_name} not in EV dataset")
+        if alias_name not in self._vehicles:
+            column = self._columns[alias_name]
+            numbers = self.values[:, column].tolist()
+            params = {}
+            for (classification, name), row, number in zip(self.index, self.text, numbers):
+                if row is None:
+                    entry = number
+                else:
+                    entry = math.nan if row[column] is None else row[column]
+                params.setdefault(classification, {})[name] = entry
+            self._vehicles[alias_name] = params
+        return self._vehicles[alias_name]
+
+    def is_stale(self) -> bool:
+        """
+        Checks if the files the database was loaded from have been modified, or if a newer snapshot is available.
+        :return: (bool) True if the database needs to be reloaded.
+        """
+        return _source_stamps(self.file_dir)[1] != self.file_stamps
+
+    def __repr__(self):
+        return f"EVDatabase('{self.file_dir}')"
+
+
+def _source_stamps(file_dir: str) -> tuple[bool, tuple]:
+    """
+    Determines whether the snapshot or the .csv file of the database is to be loaded.
+    :return: (tuple) True if the snapshot is to be loaded, and the stamps of the files to be loaded.
+    """
+    csv_stamp = _file_stamp(file_dir)
+    snapshot_stamps = tuple(_file_stamp(path) for path in snapshot_paths(file_dir))
+    use_snapshot = (None not in snapshot_stamps) and \
+                   ((csv_stamp is None) or all(stamp[0] > csv_stamp[0] for stamp in snapshot_stamps))
+    return use_snapshot, (snapshot_stamps if use_snapshot else (csv_stamp,))
+
+
+def compile_database(file_dir: str = definations.EV_DATA_DIR) -> tuple[str, str]:
+    """
+    Compiles the EV database .csv file into the binary snapshot next to it. The side table only holds the texts of
+    the text parameters. The snapshot files are written to temporary files first and then renamed.
+    :param file_dir: (str) location of the EV_dataset.csv file
+    :return: (tuple) locations of the .npy and the .json snapshot files
+    """
+    database = EVDatabase.from_csv(file_dir=file_dir)
+    npy_file, json_file = snapshot_paths(file_dir)
+    with open(f"{json_file}.tmp", 'w') as f:
+        json.dump({'index': database.index, 'aliases': database.aliases, 'text': database.text}, f)
+    with open(f"{npy_file}.tmp", 'wb') as f:
+        np.save(f, database.values)
+    os.replace(f"{json_file}.tmp", json_file)
+    os.replace(f"{npy_file}.tmp", npy_file)
+    return npy_file, json_file
+
+
+_databases = {}  # parsed databases of the process, keyed by the absolute file location
+_lock = threading.Lock()
+
+
+def get_database(file_dir: str = definations.EV_DATA_DIR) -> EVDatabase:
+    """
+    Returns the parsed EV database of the file. The database is only loaded on the first call and when its files
+    have been modified since. The binary snapshot is loaded instead of the .csv file when it is newer.
+    :param file_dir: (str) location of the EV_dataset.csv file
+    :return: (EVDatabase) parsed EV database
+    """
+    key = os.path.abspath(file_dir)
+    with _lock:
+        database = _databases.get(key)
+        use_snapshot, stamps = _source_stamps(file_dir)
+        if (database is None) or (database.file_stamps != stamps):
+            database = EVDatabase.from_snapshot(file_dir) if use_snapshot else EVDatabase.from_csv(file_dir)
+            _databases[key] = database
+        return database
+
+
+def clear_database_cache() -> None:
+    """
+    Removes all the parsed EV databases and the vehicle listings of the process.
+    """
+    with _lock:
+        _databases.clear()
+        _listings.clear()
+
+
+@dataclass(frozen=True)
+class VehicleInfo:
+    """
+    Class object that stores the basic vehicle information of a vehicle in the EV database. The empty entries are None.
+    """
+    alias_name: str
+    model_name: Optional[str]
+    year: Optional[str]
+    manufacturer: Optional[str]
+    trim: Optional[str]
+
+
+_BASIC_FIELDS = ('model_name', 'year', 'manufacturer', 'trim')  # basic vehicle rows of the VehicleInfo fields
+
+
+def _read_listing(file_dir: str) -> list[VehicleInfo]:
+    """
+    Reads the vehicle aliases from the header row of the .csv file, and their basic vehicle information from the basic
+    vehicle rows at the start of the file. The rest of the file is not read.
+    """
+    basic = {}
+    with open(file_dir, newline='') as f:
+        reader = csv.reader(f)
+        aliases = next(reader)[2:]
+        for row in reader:
+            if row[0] != 'basic vehicle':
+                break
+            basic[row[1]] = [entry if entry else None for entry in row[2:]]
+    columns = [basic.get(name, [None] * len(aliases)) for name in _BASIC_FIELDS]
+    return [VehicleInfo(alias, *entries) for alias, *entries in zip(aliases, *columns)]
+
+
+def _listing_from_database(database: EVDatabase) -> list[VehicleInfo]:
+    """
+    Returns the basic vehicle information of a parsed database.
+    """
+    rows = {key: i for i, key in enumerate(database.index)}
+    columns = [database.text[rows[('basic vehicle', name)]] if ('basic vehicle', name) in rows
+               else [None] * len(database.aliases) for name in _BASIC_FIELDS]
+    return [VehicleInfo(alias, *entries) for alias, *entries in zip(database.aliases, *columns)]
+
+
+_listings = {}  # vehicle listings of the process, keyed by the absolute file location
+
+
+def list_vehicles(file_dir: str = definations.EV_DATA_DIR) -> list[VehicleInfo]:
+    """
+    Lists the vehicles in the EV database with their basic vehicle information. The listing is read from the header
+    and the basic vehicle rows of the .csv file, or taken from the parsed database if it has been loaded, and it is
+    memoized until the file is modified.
+    :param file_dir: (str) location of the EV_dataset.csv file
+    :return: (list) VehicleInfo objects of the vehicles, in the order of the database
+    """
+    key = os.path.abspath(file_dir)
+    stamp = _file_stamp(file_dir)
+    with _lock:
+        listing = _listings.get(key)
+        if (listing is not None) and (listing[0] == stamp):
+            return list(listing[1])
+        database = _databases.get(key)
+    if stamp is None:  # only the snapshot of the database exists
+        vehicles = _listing_from_database(get_database(file_dir))
+    elif (database is not None) and (database.file_stamps == (stamp,)):
+        vehicles = _listing_from_database(database)
+    else:
+        vehicles = _read_listing(file_dir)
+    with _lock:
+        _listings[key] = (stamp, vehicles)
+    return list(vehicles)
+
+
+def list_aliases(file_dir: str = definations.EV_DATA_DIR) -> list[str]:
+    """
+    Lists the vehicle aliases in the EV database (see list_vehicles).
+    :param file_dir: (str) location of the EV_dataset.csv file
+    :return: (list) vehicle aliases, in the order of the database
+    """
+    return [vehicle.alias_name for vehicle in list_vehicles(file_dir=file_dir)]
+
+
+if __name__ == '__main__':
+    print(f"Compiled {compile_database()}")
@@ -1,17 +1,60 @@
+import itertools
 import os
+import threading
 import typing
 from typing import overload
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from EV_sim.config import definations
 
 
+def _convert_speed(speed: npt.ArrayLike, from_unit: str, to_unit: str) -> npt.ArrayLike:
+    """
+    Converts a speed array between the 'mps' (m/s), 'kmph' (km/h) and 'mph' (mph) units. The conversions to and from
+    mph go through km/h.
+    """
+    if from_unit == to_unit:
+        return speed
+    if from_unit == 'kmph':
+        kmph = speed
+    else:
+        kmph = speed * 1.609344 if from_unit == 'mph' else speed * 3600 / 1000
+    if to_unit == 'kmph':
+        return kmph
+    return kmph / 1.609344 if to_unit == 'mph' else kmph * 1000 / 3600
+
+
+def _speed_property(unit: str, doc: str) -> property:
+    """
+    Creates the property of the desired speed in a unit. The speed is calculated from the stored speed array when it
+    is first used and then cached. Setting the property replaces the stored speed array.
+    """
+    def getter(self) -> npt.ArrayLike:
+        if self._speed is None:
+            raise AttributeError(f"{self!r} has no desired speed.")
+        if unit not in self._speeds:
+            self._speeds[unit] = _convert_speed(self._speed, self._speed_unit, unit)
+        return self._speeds[unit]
+
+    def setter(self, speed: npt.ArrayLike) -> None:
+        self._set_speed(speed, unit)
+
+    return property(getter, setter, doc=doc)
+
+
 class DriveCycle:
     """
-    DriveCycle class searches for and stores arrays of time and desired speed information.
+    DriveCycle class searches for and stores arrays of time and desired speed information. The desired speed is stored
+    as a single array in the unit of the drive cycle file (mph), and the speed_kmph and speed_mps attributes are
+    calculated from it when they are first used, with the same expressions as the km/h and m/s columns were.
     """
+    speed_mps = _speed_property('mps', "desired speed, m/s")
+    speed_kmph = _speed_property('kmph', "desired speed, km/h")
+    speed_mph = _speed_property('mph', "desired speed, mph")
 
     @overload
     def __int__(self, drive_cycle_name: str) -> None:
@@ -22,12 +65,18 @@ class DriveCycle:
         ...
 
     def __init__(self, drive_cycle_name: typing.Optional[str],
-                 folder_dir: str = os.path.join(definations.ROOT_DIR, "data", "drive_cycles")):
+                 folder_dir: str = os.path.join(definations.ROOT_DIR, "data", "drive_cycles"),
+                 dtype: npt.DTypeLike = None):
         """
         DriveCycle constructor
         :param drive_cycle_name: Drive cycle name as store in the data/drive_cycles directory.
         :param folder_dir: The relative path directory to data/drive_cycles.
+        :param dtype: floating point type of the time and speed arrays, e.g., np.float32 to halve their memory. None
+        keeps the time array as parsed and stores the speed as float64.
         """
+        self._speed = None  # desired speed in the unit of _speed_unit
+        self._speed_unit = 'mph'
+        self._speeds = {}  # speeds in the units that have been calculated
         if isinstance(drive_cycle_name, str) or (drive_cycle_name is None):
             if isinstance(drive_cycle_name, str):
                 self.drive_cycle_name = drive_cycle_name  # insert the name of the .txt file in the relevant directory.
@@ -50,20 +99,72 @@ class DriveCycle:
                 raise TypeError("Drive cycle's folder directory needs to be a string type.")
 
             df_drivecycle = self.parse_file()
-            self.t = df_drivecycle['Test Time, secs'].to_numpy()  # time array in seconds
-            self.speed_mph = df_drivecycle['Target Speed, mph'].to_numpy()  # desired speed, m/h
-            self.speed_kmph = df_drivecycle["Target Speed [km/h]"].to_numpy()  # desired speed, km/h
-            self.speed_mps = df_drivecycle["Target Speed [m/h]"].to_numpy()  # desired speed, mps
+            self.t = df_drivecycle['Test Time, secs'].to_numpy(dtype=dtype)  # time array in seconds
+            speed_mph = df_drivecycle['Target Speed, mph'].to_numpy(dtype=float)
+            self.speed_mph = speed_mph if dtype is None else speed_mph.astype(dtype)  # desired speed, mph
             del df_drivecycle
 
     def parse_file(self):
         # file_dir = self.folder_dir + f"{self.drive_cycle_name}.txt"
         file_dir = os.path.join(self.folder_dir, f"{self.drive_cycle_name}.csv")
         # df = pd.read_csv(file_dir, sep="\t", skiprows=2, header=None, names=["Test Time [s]", "Target Speed [milesph]"])
-        df = pd.read_csv(file_dir)
-        df["Target Speed [km/h]"] = df["Target Speed, mph"] * 1.609344  # creates a col with units in km/h
-        df["Target Speed [m/h]"] = df["Target Speed [km/h]"] * 1000 / 3600  # creates a col with units in m/s
-        return df
+        return pd.read_csv(file_dir)
+
+    def _set_speed(self, speed: npt.ArrayLike, unit: str) -> None:
+        """
+        Replaces the desired speed array, and the speeds in the other units that have been calculated from it.
+        :param speed: (np.ndarray) desired speed
+        :param unit: (str) unit of the desired speed: 'mps', 'kmph' or 'mph'
+        """
+        self._speed = speed
+        self._speed_unit = unit
+        self._speeds = {unit: speed}
+
+    def resample(self, speed_tol: float, keep: typing.Optional[npt.ArrayLike] = None) -> 'DriveCycle':
+        """
+        Returns a drive cycle decimated to a coarser, non-uniform time grid. The retained time steps are chosen such
+        that the linear interpolation of the speed between them deviates from the original speed by at most speed_tol
+        (Ramer-Douglas-Peucker simplification). The first and the last time steps, and the time steps where the
+        vehicle comes to a stop or starts from standstill, are always retained. The indices of the retained time steps
+        in the original drive cycle are stored in the source_index attribute of the returned drive cycle, e.g., to
+        decimate a road grade array.
+        :param speed_tol: (float) maximum speed deviation, km/h
+        :param keep: (np.ndarray) indices of additional time steps to retain.
+        :return: (DriveCycle) resampled drive cycle
+        """
+        if speed_tol < 0:
+            raise ValueError("speed_tol needs to be non-negative.")
+        t = np.asarray(self.t, dtype=float)
+        speed = self.speed_kmph
+        retained = np.zeros(len(t), dtype=bool)
+        retained[[0, -1]] = True
+        standstill = speed == 0
+        boundaries = np.nonzero(standstill[1:] != standstill[:-1])[0]
+        retained[boundaries] = True
+        retained[boundaries + 1] = True
+        if keep is not None:
+            retained[keep] = True
+
+        segments = list(zip(np.nonzero(retained)[0][:-1], np.nonzero(retained)[0][1:]))
+        while segments:
+            i, j = segments.pop()
+            if j - i < 2:
+                continue
+            interp = speed[i] + (speed[j] - speed[i]) * (t[i + 1: j] - t[i]) / (t[j] - t[i])
+            deviation = np.abs(speed[i + 1: j] - interp)
+            m = int(np.argmax(deviation))
+            if deviation[m] > speed_tol:
+                k = i + 1 + m
+                retained[k] = True
+                segments.extend([(i, k), (k, j)])
+
+        index = np.nonzero(retained)[0]
+        cycle = DriveCycle(drive_cycle_name=None)
+        cycle.drive_cycle_name = self.drive_cycle_name
+        cycle.t = self.t[index]
+        cycle._set_speed(self._speed[index], self._speed_unit)
+        cycle.source_index = index
+        return cycle
 
     def plot(self):
         """
@@ -82,3 +183,264 @@ class DriveCycle:
 
     def __str__(self):
         return f"{self.drive_cycle_name}"
+
+
+def convert_to_binary(file_dir: str, binary_file_dir: typing.Optional[str] = None, dtype: npt.DTypeLike = np.float64,
+                      chunksize: int = 1_000_000) -> str:
+    """
+    Converts a drive cycle .csv file (with the 'Test Time, secs' and 'Target Speed, mph' columns) into the binary
+    drive cycle format, which is read by the MappedDriveCycle class. The binary file is a .npy file that contains a
+    C-ordered array of shape (2, number of time steps): the first row is the time, s, and the second row is the
+    desired speed, mph, as in the .csv file. The .csv file is read in chunks and written to the memory mapped binary
+    file, so that the memory use of the conversion does not depend on the length of the drive cycle.
+    :param file_dir: (str) location of the drive cycle .csv file
+    :param binary_file_dir: (str) location of the binary file. None writes it next to the .csv file.
+    :param dtype: floating point type of the binary file, e.g., np.float32 to halve its size.
+    :param chunksize: (int) number of rows of the .csv file that are read at a time
+    :return: (str) location of the binary file
+    """
+    if binary_file_dir is None:
+        binary_file_dir = f"{os.path.splitext(file_dir)[0]}.npy"
+    with open(file_dir, 'rb') as f:
+        num_rows = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':  # last row without a line break
+            num_rows += 1
+    num_rows -= 1  # header row
+    data = np.lib.format.open_memmap(f"{binary_file_dir}.tmp", mode='w+', dtype=dtype, shape=(2, num_rows))
+    start = 0
+    for df in pd.read_csv(file_dir, chunksize=chunksize, skip_blank_lines=False):
+        stop = start + len(df)
+        data[0, start: stop] = df['Test Time, secs'].to_numpy()
+        data[1, start: stop] = df['Target Speed, mph'].to_numpy()
+        start = stop
+    if start != num_rows:
+        raise ValueError(f"{file_dir} has {start} data rows, but {num_rows} lines were counted.")
+    data.flush()
+    del data
+    os.replace(f"{binary_file_dir}.tmp", binary_file_dir)
+    return binary_file_dir
+
+
+class MappedDriveCycle(DriveCycle):
+    """
+    MappedDriveCycle opens a drive cycle in the binary drive cycle format (see convert_to_binary) as a memory mapped
+    array, so that opening it does not depend on the length of the drive cycle and only the parts of the file that are
+    used are read into memory. The time and the speed in mph are views of the memory mapped file, and the speeds in
+    the other units are calculated from the speed in mph when they are first used, as for the .csv drive cycles.
+    """
+
+    def __init__(self, file_dir: str) -> None:
+        """
+        MappedDriveCycle constructor.
+        :param file_dir: (str) location of the binary drive cycle file
+        """
+        super().__init__(drive_cycle_name=None)
+        data = np.load(file_dir, mmap_mode='r')
+        if (data.ndim != 2) or (data.shape[0] != 2):
+            raise ValueError(f"{file_dir} is not a binary drive cycle file.")
+        self.drive_cycle_name = os.path.splitext(os.path.basename(file_dir))[0]
+        self.file_dir = file_dir
+        self.t = data[0]  # time array in seconds
+        self.speed_mph = data[1]  # desired speed, mph
+
+
+class StreamingDriveCycle:
+    """
+    StreamingDriveCycle reads a drive cycle in chunks of a fixed number of time steps, so that drive cycles that do
+    not fit in memory (e.g., week-long fleet logs) can be simulated chunk by chunk (see stepper.simulate_stream).
+    Iterating over it yields (time, s, desired speed, km/h) array pairs of chunk_size time steps, except for the
+    last chunk, which may be shorter. The drive cycles read from files can be iterated over more than once, while the
+    ones read from an iterator can only be iterated over once.
+    """
+
+    def __init__(self, chunks: typing.Callable[[], typing.Iterator], chunk_size: int,
+                 drive_cycle_name: typing.Optional[str] = None) -> None:
+        """
+        StreamingDriveCycle constructor. Use the from_csv, from_binary, from_iterator or from_drive_cycle class
+        methods to create a streaming drive cycle.
+        :param chunks: function that returns an iterator over the (time, desired speed in km/h) chunks
+        :param chunk_size: (int) number of time steps per chunk
+        :param drive_cycle_name: (str) drive cycle name
+        """
+        if (not isinstance(chunk_size, (int, np.integer))) or (chunk_size < 1):
+            raise ValueError("chunk_size needs to be a positive integer.")
+        self._chunks = chunks
+        self.chunk_size = int(chunk_size)
+        self.drive_cycle_name = drive_cycle_name
+
+    @classmethod
+    def from_csv(cls, file_dir: str, chunk_size: int = 100_000) -> 'StreamingDriveCycle':
+        """
+        Streams a drive cycle .csv file with the 'Test Time, secs' and 'Target Speed, mph' columns.
+        :param file_dir: (str) location of the drive cycle .csv file
+        :param chunk_size: (int) number of time steps per chunk
+        :return: (StreamingDriveCycle) streaming drive cycle
+        """
+        def chunks():
+            for df in pd.read_csv(file_dir, chunksize=chunk_size):
+                yield df['Test Time, secs'].to_numpy(dtype=float), df['Target Speed, mph'].to_numpy() * 1.609344
+
+        return cls(chunks, chunk_size=chunk_size, drive_cycle_name=os.path.splitext(os.path.basename(file_dir))[0])
+
+    @classmethod
+    def from_binary(cls, file_dir: str, chunk_size: int = 100_000) -> 'StreamingDriveCycle':
+        """
+        Streams a drive cycle in the binary drive cycle format (see convert_to_binary).
+        :param file_dir: (str) location of the binary drive cycle file
+        :param chunk_size: (int) number of time steps per chunk
+        :return: (StreamingDriveCycle) streaming drive cycle
+        """
+        def chunks():
+            cycle = MappedDriveCycle(file_dir)
+            for a in range(0, len(cycle.t), chunk_size):
+                yield np.array(cycle.t[a: a + chunk_size]), cycle.speed_mph[a: a + chunk_size] * 1.609344
+
+        return cls(chunks, chunk_size=chunk_size, drive_cycle_name=os.path.splitext(os.path.basename(file_dir))[0])
+
+    @classmethod
+    def from_iterator(cls, samples: typing.Iterable, chunk_size: int = 100_000,
+                      drive_cycle_name: typing.Optional[str] = None) -> 'StreamingDriveCycle':
+        """
+        Streams the samples of an iterable, e.g., a generator of live telemetry samples.
+        :param samples: (Iterable) (time, s, desired speed, km/h) samples
+        :param chunk_size: (int) number of time steps per chunk
+        :param drive_cycle_name: (str) drive cycle name
+        :return: (StreamingDriveCycle) streaming drive cycle
+        """
+        iterator = iter(samples)
+
+        def chunks():
+            while True:
+                chunk = np.array(list(itertools.islice(iterator, chunk_size)), dtype=float).reshape(-1, 2)
+                if len(chunk) == 0:
+                    return
+                yield chunk[:, 0], chunk[:, 1]
+
+        return cls(chunks, chunk_size=chunk_size, drive_cycle_name=drive_cycle_name)
+
+    @classmethod
+    def from_drive_cycle(cls, drive_cycle: DriveCycle, chunk_size: int = 100_000) -> 'StreamingDriveCycle':
+        """
+        Streams a DriveCycle object.
+        :param drive_cycle: (DriveCycle) drive cycle
+        :param chunk_size: (int) number of time steps per chunk
+        :return: (StreamingDriveCycle) streaming drive cycle
+        """
+        def chunks():
+            for a in range(0, len(drive_cycle.t), chunk_size):
+                yield drive_cycle.t[a: a + chunk_size], drive_cycle.speed_kmph[a: a + chunk_size]
+
+        return cls(chunks, chunk_size=chunk_size, drive_cycle_name=drive_cycle.drive_cycle_name)
+
+    def __iter__(self) -> typing.Iterator[tuple[npt.ArrayLike, npt.ArrayLike]]:
+        return iter(self._chunks())
+
+    def __repr__(self):
+        return f"StreamingDriveCycle({self.drive_cycle_name}, {self.chunk_size})"
+
+
+class DriveCycleRegistry:
+    """
+    DriveCycleRegistry parses the drive cycle files of a folder once and hands out DriveCycle objects whose arrays are
+    read-only views of the parsed arrays, so that the same drive cycle is not parsed again by every simulation. A drive
+    cycle is parsed again when the modification time or the size of its file changes, e.g.,
+
+    registry = get_registry()
+    registry.preload()
+    us06 = registry.get("us06")
+    """
+
+    def __init__(self, folder_dir: str = os.path.join(definations.ROOT_DIR, "data", "drive_cycles")) -> None:
+        """
+        DriveCycleRegistry constructor.
+        :param folder_dir: The relative path directory to data/drive_cycles.
+        """
+        if not os.path.exists(folder_dir):
+            raise ValueError(f"{folder_dir} does not exists.")
+        self.folder_dir = folder_dir
+        self._cycles = {}  # parsed drive cycles and the stamps of their files, keyed by the drive cycle name
+        self._lock = threading.Lock()
+
+    def names(self) -> list[str]:
+        """
+        Lists the drive cycles in the folder.
+        :return: (list) sorted drive cycle names
+        """
+        return sorted(os.path.splitext(file)[0] for file in os.listdir(self.folder_dir) if file.endswith(".csv"))
+
+    def _parsed(self, drive_cycle_name: str) -> DriveCycle:
+        """
+        Returns the parsed drive cycle, and parses it if it has not been parsed or its file has been modified since.
+        """
+        stat = os.stat(os.path.join(self.folder_dir, f"{drive_cycle_name}.csv"))
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cycles.get(drive_cycle_name)
+            if (cached is None) or (cached[0] != stamp):
+                cycle = DriveCycle(drive_cycle_name=drive_cycle_name, folder_dir=self.folder_dir)
+                # the speeds in all the units are calculated once here, so that the handed out cycles share them
+                for array in (cycle.t, cycle.speed_mph, cycle.speed_kmph, cycle.speed_mps):
+                    array.setflags(write=False)
+                cached = (stamp, cycle)
+                self._cycles[drive_cycle_name] = cached
+            return cached[1]
+
+    def get(self, drive_cycle_name: str) -> DriveCycle:
+        """
+        Returns a drive cycle. Its arrays are read-only views of the parsed arrays, which are shared by all the drive
+        cycles handed out for the same file.
+        :param drive_cycle_name: Drive cycle name as store in the folder.
+        :return: (DriveCycle) drive cycle
+        """
+        parsed = self._parsed(drive_cycle_name)
+        cycle = DriveCycle(drive_cycle_name=None)
+        cycle.drive_cycle_name = parsed.drive_cycle_name
+        cycle.folder_dir = parsed.folder_dir
+        cycle.t = parsed.t.view()
+        cycle._set_speed(parsed._speed.view(), parsed._speed_unit)
+        cycle._speeds.update((unit, speed.view()) for unit, speed in parsed._speeds.items())
+        return cycle
+
+    def preload(self) -> list[str]:
+        """
+        Parses all the drive cycles in the folder, e.g., at the startup of an application.
+        :return: (list) names of the parsed drive cycles
+        """
+        names = self.names()
+        for drive_cycle_name in names:
+            self._parsed(drive_cycle_name)
+        return names
+
+    def clear(self) -> None:
+        """
+        Removes all the parsed drive cycles.
+        """
+        with self._lock:
+            self._cycles.clear()
+
+    def __getitem__(self, drive_cycle_name: str) -> DriveCycle:
+        return self.get(drive_cycle_name)
+
+    def __contains__(self, drive_cycle_name: str) -> bool:
+        return os.path.isfile(os.path.join(self.folder_dir, f"{drive_cycle_name}.csv"))
+
+    def __repr__(self):
+        return f"DriveCycleRegistry('{self.folder_dir}')"
+
+
+_registries = {}  # drive cycle registries of the process, keyed by the absolute folder location
+_lock = threading.Lock()
+
+
+def get_registry(folder_dir: str = os.path.join(definations.ROOT_DIR, "data", "drive_cycles")) -> DriveCycleRegistry:
+    """
+    Returns the drive cycle registry of a folder, which is shared by the whole process.
+    :param folder_dir: The relative path directory to data/drive_cycles.
+    :return: (DriveCycleRegistry) drive cycle registry
+    """
+    key = os.path.abspath(folder_dir)
+    with _lock:
+        if key not in _registries:
+            _registries[key] = DriveCycleRegistry(folder_dir=folder_dir)
+        return _registries[key]
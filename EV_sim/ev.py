@@ -3,14 +3,17 @@ This module provides the classes pertaining to the parameters and functionailiti
 electric vehicle.
 """
 
-__all__ = ['ACInductionMotor', 'Wheel', 'Gearbox', 'DriveTrain', 'BatteryCell', 'BatteryModule', 'BatteryPack', 'EV',
-           'EVFromDatabase']
+__all__ = ['ACInductionMotor', 'Wheel', 'Gearbox', 'DriveTrain', 'BatteryCell', 'BatteryModule', 'BatteryPack',
+           'EVKernelParams', 'EV', 'EVFromDatabase']
 
 __authors__ = "Moin Ahmed"
 __copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
 
 
+import hashlib
+import operator
 import os
+import struct
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -18,6 +21,8 @@ import numpy as np
 import pandas as pd
 
 from EV_sim.config import definations
+from EV_sim.database import get_database, list_aliases
+from EV_sim.sqlite_store import is_sqlite_file, get_store
 
 
 @dataclass
@@ -191,6 +196,69 @@ class BatteryPack(BatteryModule):
         self.pack_V_min = self.num_modules * self.Ns * self.cell_V_min # battery pack min. voltage, V
 
 
+# Attribute paths, relative to the EV object, of the parameters the EVKernelParams are calculated from. The derived
+# attributes of the components (e.g., pack_mass) are used instead of their inputs as they are set at construction.
+_KERNEL_PARAMETER_PATHS = ('alias_name', 'm', 'payload_capacity', 'C_d', 'A_front', 'C_r', 'overhead_power',
+                           'drive_train.wheel.r', 'drive_train.wheel.I', 'drive_train.num_wheel',
+                           'drive_train.gear_box.N', 'drive_train.gear_box.I', 'drive_train.frac_regen_torque',
+                           'drive_train.eff', 'motor.RPM_r', 'motor.RPM_max', 'motor.L_max', 'motor.I', 'motor.P_max',
+                           'pack.pack_mass', 'pack.pack_V_nom', 'pack.Np')
+_kernel_parameters = operator.attrgetter(*_KERNEL_PARAMETER_PATHS)
+
+# Attribute paths of all the physical parameters of the EV, i.e., all its numeric parameters, including the derived
+# attributes the simulations use. The EV fingerprint is calculated from them.
+_PHYSICAL_PARAMETER_PATHS = _KERNEL_PARAMETER_PATHS[1:] + ('drive_train.inverter_eff', 'motor.eff', 'pack.cell_cap',
+                                                           'pack.cell_mass', 'pack.cell_V_max', 'pack.cell_V_nom',
+                                                           'pack.cell_V_min', 'pack.Ns', 'pack.module_overhead_mass',
+                                                           'pack.num_modules', 'pack.pack_overhead_mass',
+                                                           'pack.SOC_full', 'pack.SOC_empty', 'pack.eff',
+                                                           'pack.module_cap')
+_physical_parameters = operator.attrgetter(*_PHYSICAL_PARAMETER_PATHS)
+_FINGERPRINT_PREFIX = ','.join(_PHYSICAL_PARAMETER_PATHS).encode()  # changes the fingerprints if the paths change
+
+
+@dataclass(frozen=True, slots=True)
+class EVKernelParams:
+    """
+    Immutable snapshot of the EV parameters used by the simulation engines, with the derived masses and the maximum
+    speed calculated once. The nested component attributes are flattened, so that they are read with a single
+    attribute lookup.
+    """
+    alias_name: Optional[str]
+    equiv_mass: float  # vehicle equivalent mass, kg
+    max_mass: float  # vehicle maximum mass, kg
+    max_speed: float  # vehicle maximum speed, km/h
+    C_d: float  # drag coefficient, unit-less
+    A_front: float  # vehicle frontal area, m^2
+    C_r: float  # rolling coefficient, unit-less
+    overhead_power: float  # vehicle overhead power, W
+    wheel_r: float  # wheel radius, m
+    gear_N: float  # gearbox ratio
+    frac_regen_torque: float  # fraction of regenerated torque
+    drive_train_eff: float  # drivetrain efficiency
+    RPM_r: float  # rated motor speed, rpm
+    RPM_max: float  # max. motor speed, rpm
+    L_max: float  # max. motor torque, Nm
+    P_max: float  # max. motor power, kW
+    pack_V_nom: float  # battery pack nominal voltage, V
+    Np: int  # number of cells in parallel
+    key: tuple  # values of the EV parameters the snapshot is calculated from
+
+    @classmethod
+    def from_ev(cls, ev: 'EV') -> 'EVKernelParams':
+        """
+        Calculates the snapshot of the EV parameters.
+        :param ev: (EV) EV object
+        :return: (EVKernelParams) snapshot of the EV parameters
+        """
+        return cls(alias_name=ev.alias_name, equiv_mass=ev.equiv_mass, max_mass=ev.max_mass, max_speed=ev.max_speed,
+                   C_d=ev.C_d, A_front=ev.A_front, C_r=ev.C_r, overhead_power=ev.overhead_power,
+                   wheel_r=ev.drive_train.wheel.r, gear_N=ev.drive_train.gear_box.N,
+                   frac_regen_torque=ev.drive_train.frac_regen_torque, drive_train_eff=ev.drive_train.eff,
+                   RPM_r=ev.motor.RPM_r, RPM_max=ev.motor.RPM_max, L_max=ev.motor.L_max, P_max=ev.motor.P_max,
+                   pack_V_nom=ev.pack.pack_V_nom, Np=ev.pack.Np, key=_kernel_parameters(ev))
+
+
 @dataclass
 class EV:
     """
@@ -216,6 +284,36 @@ class EV:
     payload_capacity: Optional[float] = None # vehicle payload capacity, kg
     overhead_power: Optional[float] = None # vehicle overhear power, W
 
+    def kernel_params(self) -> EVKernelParams:
+        """
+        Returns the snapshot of the parameters used by the simulation engines. The snapshot is cached and it is only
+        recalculated when any of the parameters it is calculated from has been changed since the previous call, e.g.,
+        when the EV or one of its components is mutated between simulations.
+        :return: (EVKernelParams) snapshot of the EV parameters
+        """
+        params = self.__dict__.get('_kernel_params')
+        if (params is None) or (params.key != _kernel_parameters(self)):
+            params = EVKernelParams.from_ev(self)
+            self.__dict__['_kernel_params'] = params
+        return params
+
+    def fingerprint(self) -> str:
+        """
+        Returns the content fingerprint of the physical parameters of the EV and its components, which changes whenever
+        any of them changes. The names (e.g., alias name and cell chemistry) are not included, as they do not affect the
+        simulations. The fingerprint is a hexadecimal digest of the parameter values as 64-bit floats, so it is the
+        same in all processes and can be used as a cache key of the simulation results. It is cached like the
+        kernel_params.
+        :return: (str) fingerprint of the EV
+        """
+        values = _physical_parameters(self)
+        cached = self.__dict__.get('_fingerprint')
+        if (cached is None) or (cached[0] != values):
+            data = struct.pack(f'<{len(values)}d', *values)
+            cached = (values, hashlib.blake2b(_FINGERPRINT_PREFIX + data, digest_size=16).hexdigest())
+            self.__dict__['_fingerprint'] = cached
+        return cached[1]
+
     @property
     def curb_mass(self) -> float:
         """
@@ -258,6 +356,14 @@ class EV:
         return 2 * np.pi * self.drive_train.wheel.r * self.motor.RPM_max * 60 / (1000 * self.drive_train.gear_box.N)
 
 
+def _vehicle_source(file_dir: str):
+    """
+    Returns the EV database of a file: the SQLite store for the SQLite database files and the parsed .csv database (or
+    its binary snapshot) otherwise.
+    """
+    return get_store(file_dir=file_dir) if is_sqlite_file(file_dir) else get_database(file_dir=file_dir)
+
+
 class EVFromDatabase(EV):
     """
     EVFromDatabase inherits from the EV class. It is meant to update the attributes of its parent EV class using the
@@ -267,7 +373,8 @@ class EVFromDatabase(EV):
         """
         EV class constructor.
         :param alias_name: (str) Vehicle alias [i.e, identifier]
-        :param database_dir: (str) The file location of the data/EV/EV_dataset.csv relative to the working directory.
+        :param database_dir: (str) The file location of the data/EV/EV_dataset.csv relative to the working directory,
+        or of a SQLite database file (.db, .sqlite or .sqlite3) the EV database has been imported into.
         """
         self.alias_name = alias_name
         df_basicinfo = self.parse_basic_data(file_dir=database_dir)
@@ -349,24 +456,22 @@ class EVFromDatabase(EV):
     @staticmethod
     def list_all_EV_alias(file_dir: str) -> list:
         """
-        Lists all the EV alias in the EV database.
+        Lists all the EV alias in the EV database. Only the header row of the .csv file is read (see
+        database.list_aliases).
         :return: (list) list of all EV alias in the EV database
         """
-        df = pd.read_csv(file_dir)
-        df.set_index(['Parameter Classification', 'Parameter Name'], inplace=True)
-        return df.columns.tolist()
+        if is_sqlite_file(file_dir):
+            return get_store(file_dir=file_dir).aliases
+        return list_aliases(file_dir=file_dir)
 
     def create_df(self, file_dir: str):
         """
-        returns a dataframe containing all the relevant EV information.
+        returns the relevant EV information, grouped by the parameter classification. The database is loaded once per
+        process (see database.get_database), or looked up in the SQLite database file (see sqlite_store.get_store).
         :param file_dir:
         :return:
         """
-        df = pd.read_csv(file_dir, header=0)
-        df.set_index(['Parameter Classification', 'Parameter Name'], inplace=True)
-        if self.alias_name not in df.columns:
-            raise Exception(f"{self.alias_name} not in EV dataset")
-        return df[self.alias_name]
+        return _vehicle_source(file_dir=file_dir).vehicle(self.alias_name)
 
     def parse_basic_data(self, file_dir: str):
         """
@@ -0,0 +1,370 @@
+"""
+This module contains the array kernels for the vehicle dynamics simulations. The segment kernel evaluates whole runs
+of time steps, where the vehicle follows the drive cycle, with NumPy array operations and only falls back to scalar
+stepping where the motor limits make the vehicle lag behind the desired speed. The batch kernel advances many
+scenarios in lockstep with one set of array operations per time step.
+"""
+
+__all__ = ['SEGMENT_RTOL', 'SEGMENT_ATOL', 'simulate_step', 'simulate_segments', 'simulate_batch', 'simulate_summary']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import math
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.ev import EV, EVKernelParams
+from EV_sim.sol import select_channels, Solution, BatchSolution
+from EV_sim.utils.constants import PhysicsConstants
+
+
+SEGMENT_RTOL = 1e-9  # relative tolerance of the segment kernel results w.r.t. the time stepping results
+SEGMENT_ATOL = 1e-9  # absolute tolerance of the segment kernel results w.r.t. the time stepping results
+
+_SWEEPS = 2  # number of vectorized passes before the inconsistent time steps are stepped through one at a time
+
+
+_POWER_VARIABLES = ('demand_power', 'limit_power', 'battery_demand', 'current')  # calculated after the speeds
+
+
+def _evaluate(c: dict, des_speed: npt.ArrayLike, dt: npt.ArrayLike, roll_F: npt.ArrayLike,
+                     prev_speed: npt.ArrayLike, prev_motor_speed: npt.ArrayLike, keep: Optional[set] = None) -> dict:
+    """
+    Evaluates the per time step equations of the vehicle dynamics over all the time steps. The speeds at the previous
+    time steps are inputs, so that the equations are independent of each other and can be evaluated with array
+    operations.
+    :param c: (dict) constants of the EV and the external conditions.
+    :param des_speed: (np.ndarray) desired speed, m/s
+    :param dt: (np.ndarray) time step size, s
+    :param roll_F: (np.ndarray) grade force, N
+    :param prev_speed: (np.ndarray) speed at the previous time steps, m/s
+    :param prev_motor_speed: (np.ndarray) motor speed at the previous time steps, rpm
+    :param keep: (set) names of the simulation variables to return. None returns all of them. The other variables are
+    released as soon as they are no longer needed, and the powers and the current are only calculated if one of them
+    is kept.
+    :return: (dict) arrays of the simulation variables.
+    """
+    res = {}
+
+    def release(*names):
+        if keep is not None:
+            for name in names:
+                if name not in keep:
+                    del res[name]
+
+    res['des_acc'] = (des_speed - prev_speed) / dt
+    res['des_acc_F'] = c['equiv_mass'] * res['des_acc']
+    release('des_acc')
+    res['aero_F'] = c['aero_coeff'] * (prev_speed ** 2)
+    res['roll_grade_F'] = np.where(np.abs(prev_speed) > 0, roll_F + c['roll_F'], roll_F)
+    res['demand_torque'] = (res['des_acc_F'] + res['aero_F'] + res['roll_grade_F'] + c['road_F']) * c['r'] / c['N']
+    release('des_acc_F')
+
+    res['max_torque'] = np.where(prev_motor_speed < c['RPM_r'], c['L_max'],
+                                 c['L_max'] * c['RPM_r'] / np.where(prev_motor_speed < c['RPM_r'], 1.0,
+                                                                    prev_motor_speed))
+    res['limit_regen'] = np.minimum(res['max_torque'], c['regen_torque'])
+    res['limit_torque'] = np.minimum(res['demand_torque'], res['max_torque'])
+    release('demand_torque', 'max_torque')
+    res['motor_torque'] = np.where(res['limit_torque'] > 0, res['limit_torque'],
+                                   np.maximum(-res['limit_regen'], res['limit_torque']))
+    release('limit_regen')
+
+    res['actual_acc_F'] = res['limit_torque'] * c['N'] / c['r'] - res['aero_F'] - res['roll_grade_F'] - c['road_F']
+    release('limit_torque', 'aero_F', 'roll_grade_F')
+    res['actual_acc'] = res['actual_acc_F'] / c['equiv_mass']
+    release('actual_acc_F')
+    res['motor_speed'] = np.minimum(c['RPM_max'], c['N'] * (prev_speed + res['actual_acc'] * dt) * 60 /
+                                    (2 * np.pi * c['r']))
+    release('actual_acc')
+    res['actual_speed'] = res['motor_speed'] * 2 * np.pi * c['r'] / (60 * c['N'])
+
+    if (keep is None) or not keep.isdisjoint(_POWER_VARIABLES):
+        res['demand_power'] = (res['motor_torque'] * 2 * np.pi) * (prev_motor_speed + res['motor_speed']) / \
+            (2 * 60000)
+        res['limit_power'] = np.maximum(-c['P_max'], np.minimum(c['P_max'], res['demand_power']))
+        release('demand_power')
+        res['battery_demand'] = np.where(res['limit_power'] > 0, c['overhead'] + res['limit_power'] / c['eff'],
+                                         c['overhead'] + res['limit_power'] * c['eff'])
+        release('limit_power')
+        res['current'] = res['battery_demand'] * 1000 / c['V_nom']
+        release('battery_demand')
+    release('motor_torque', 'motor_speed', 'actual_speed')
+    return res
+
+
+def _speed_step(c: dict, des_speed: float, dt: float, roll_F: float, prev_speed: float,
+                prev_motor_speed: float) -> tuple[float, float]:
+    """
+    Scalar counterpart of _evaluate for a single time step that only calculates the vehicle and motor speeds. The
+    floating point operations are identical to the ones in _evaluate.
+    :return: (tuple) actual speed, m/s, and motor speed, rpm
+    """
+    roll_grade_F = roll_F + c['roll_F'] if abs(prev_speed) > 0 else roll_F
+    aero_F = c['aero_coeff'] * (prev_speed ** 2)
+    demand_torque = (c['equiv_mass'] * ((des_speed - prev_speed) / dt) + aero_F + roll_grade_F + c['road_F']) * \
+        c['r'] / c['N']
+    max_torque = c['L_max'] if prev_motor_speed < c['RPM_r'] else c['L_max'] * c['RPM_r'] / prev_motor_speed
+    actual_acc_F = min(demand_torque, max_torque) * c['N'] / c['r'] - aero_F - roll_grade_F - c['road_F']
+    motor_speed = min(c['RPM_max'], c['N'] * (prev_speed + (actual_acc_F / c['equiv_mass']) * dt) * 60 /
+                      (2 * math.pi * c['r']))
+    return motor_speed * 2 * math.pi * c['r'] / (60 * c['N']), motor_speed
+
+
+def simulate_step(c: dict, des_speed: float, dt: float, roll_F: float, prev_speed: float, prev_motor_speed: float,
+                  prev_distance: float, prev_SOC: float) -> tuple:
+    """
+    Scalar counterpart of _evaluate that simulates a single time step, including the distance and the battery SOC.
+    The floating point operations are the same as the ones in _evaluate.
+    :param c: (dict) constants of the EV and the external conditions.
+    :param des_speed: (float) desired speed, m/s
+    :param dt: (float) time step size, s
+    :param roll_F: (float) grade force, N
+    :param prev_speed: (float) speed at the previous time step, m/s
+    :param prev_motor_speed: (float) motor speed at the previous time step, rpm
+    :param prev_distance: (float) distance at the previous time step, km
+    :param prev_SOC: (float) battery SOC at the previous time step
+    :return: (tuple) values of the simulation variables in the order of SOLUTION_CHANNELS.
+    """
+    des_acc = (des_speed - prev_speed) / dt
+    des_acc_F = c['equiv_mass'] * des_acc
+    aero_F = c['aero_coeff'] * (prev_speed ** 2)
+    roll_grade_F = roll_F + c['roll_F'] if abs(prev_speed) > 0 else roll_F
+    demand_torque = (des_acc_F + aero_F + roll_grade_F + c['road_F']) * c['r'] / c['N']
+
+    max_torque = c['L_max'] if prev_motor_speed < c['RPM_r'] else c['L_max'] * c['RPM_r'] / prev_motor_speed
+    limit_regen = min(max_torque, c['regen_torque'])
+    limit_torque = min(demand_torque, max_torque)
+    motor_torque = limit_torque if limit_torque > 0 else max(-limit_regen, limit_torque)
+
+    actual_acc_F = limit_torque * c['N'] / c['r'] - aero_F - roll_grade_F - c['road_F']
+    actual_acc = actual_acc_F / c['equiv_mass']
+    motor_speed = min(c['RPM_max'], c['N'] * (prev_speed + actual_acc * dt) * 60 / (2 * math.pi * c['r']))
+    actual_speed = motor_speed * 2 * math.pi * c['r'] / (60 * c['N'])
+    distance = prev_distance + ((actual_speed + prev_speed) / 2) * dt / 1000
+
+    demand_power = (motor_torque * 2 * math.pi) * (prev_motor_speed + motor_speed) / (2 * 60000)
+    limit_power = max(-c['P_max'], min(c['P_max'], demand_power))
+    battery_demand = c['overhead'] + limit_power / c['eff'] if limit_power > 0 else \
+        c['overhead'] + limit_power * c['eff']
+    current = battery_demand * 1000 / c['V_nom']
+    return (des_acc, des_acc_F, aero_F, roll_grade_F, demand_torque, max_torque, limit_regen, limit_torque,
+            motor_torque, actual_acc_F, actual_acc, motor_speed, actual_speed, actual_speed * 3600 / 1000, distance,
+            demand_power, limit_power, battery_demand, current, current / c['Np'], prev_SOC - current * dt)
+
+
+def _constants(ev: Union[EV, EVKernelParams], rho: float, road_force: float) -> dict:
+    """
+    Collects the cycle invariant constants of the EV and the external conditions.
+    :param ev: (EV) EV object, or the snapshot of its parameters (EVKernelParams)
+    :param rho: (float) air density, kg/m^3
+    :param road_force: (float) road force, N
+    :return: (dict) constants used by the kernel.
+    """
+    p = ev if isinstance(ev, EVKernelParams) else ev.kernel_params()
+    return {'equiv_mass': p.equiv_mass, 'max_mass': p.max_mass, 'aero_coeff': 0.5 * rho * p.A_front * p.C_d,
+            'roll_F': p.C_r * p.max_mass * PhysicsConstants.g, 'road_F': road_force, 'r': p.wheel_r, 'N': p.gear_N,
+            'RPM_r': p.RPM_r, 'RPM_max': p.RPM_max, 'L_max': p.L_max, 'regen_torque': p.frac_regen_torque * p.L_max,
+            'P_max': p.P_max, 'overhead': p.overhead_power / 1000, 'eff': p.drive_train_eff, 'V_nom': p.pack_V_nom,
+            'Np': p.Np}
+
+
+def simulate_segments(ev: Union[EV, EVKernelParams], t: npt.ArrayLike, des_speed: npt.ArrayLike, grade_angle,
+                      rho: float, road_force: float, prev_time: float, channels: Optional[Sequence[str]] = None,
+                      init_speed: float = 0.0, init_motor_speed: float = 0.0, init_distance: float = 0.0,
+                      init_SOC: float = 0.0, out: Optional[Solution] = None) -> Solution:
+    """
+    Simulates the vehicle dynamics over the whole drive cycle. The speeds at the previous time steps are first guessed
+    by assuming that the vehicle follows the drive cycle. With these guesses, every time step is independent and the
+    whole cycle is evaluated with array operations. Runs of time steps where the guesses are consistent with the
+    calculated speeds are kept as is. Only the time steps where they are not, i.e., where the motor torque or speed
+    limits make the vehicle lag behind the drive cycle or where round-off accumulates at standstill, are stepped
+    through one at a time. Finally, the simulation variables of the requested channels are evaluated in one pass with
+    the resulting speeds. The results agree with the time stepping simulation within SEGMENT_RTOL and SEGMENT_ATOL.
+    :param ev: (EV) EV object, or the snapshot of its parameters (EVKernelParams)
+    :param t: (np.ndarray) time array, s
+    :param des_speed: (np.ndarray) desired speed, m/s
+    :param grade_angle: (float or np.ndarray) road grade angle, rad
+    :param rho: (float) air density, kg/m^3
+    :param road_force: (float) road force, N
+    :param prev_time: (float) time before the first time step, s
+    :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+    :param init_speed: (float) speed before the first time step, m/s
+    :param init_motor_speed: (float) motor speed before the first time step, rpm
+    :param init_distance: (float) distance before the first time step, km
+    :param init_SOC: (float) battery SOC before the first time step
+    :param out: (Solution) Solution object with the requested channels and time steps that the results are written to.
+    None creates a new one.
+    :return: (Solution) Solution object containing the simulation results.
+    """
+    c = _constants(ev=ev, rho=rho, road_force=road_force)
+    n = len(t)
+    if out is None:
+        sol = Solution(veh_alias=ev.alias_name, t=t, channels=channels)
+    else:
+        sol = out
+        sol.t = t
+
+    dt = np.empty(n)
+    dt[0] = t[0] - prev_time
+    dt[1:] = t[1:] - t[:-1]
+    roll_F = np.broadcast_to(c['max_mass'] * PhysicsConstants.g * np.sin(grade_angle), (n,))
+
+    # Guess of the previous speeds assuming that the vehicle follows the drive cycle.
+    prev_speed = np.empty(n)
+    prev_speed[:1] = init_speed
+    prev_speed[1:] = des_speed[:-1]
+    prev_motor_speed = np.empty(n)
+    prev_motor_speed[:1] = init_motor_speed
+    prev_motor_speed[1:] = np.minimum(c['RPM_max'], c['N'] * des_speed[:-1] * 60 / (2 * np.pi * c['r']))
+
+    # Vectorized passes remove most of the round-off differences between the guesses and the calculated speeds.
+    for sweep in range(_SWEEPS):
+        res = _evaluate(c, des_speed, dt, roll_F, prev_speed, prev_motor_speed, keep={'actual_speed', 'motor_speed'})
+        speed, motor_speed = res['actual_speed'], res['motor_speed']
+        mismatch = (prev_speed[1:] != speed[:-1]) | (prev_motor_speed[1:] != motor_speed[:-1])
+        if not mismatch.any() or sweep == _SWEEPS - 1:
+            break
+        prev_speed[1:] = speed[:-1]
+        prev_motor_speed[1:] = motor_speed[:-1]
+
+    if mismatch.any():
+        # The remaining inconsistent time steps are stepped through in order. A time step is recalculated with the
+        # speeds of the time step before it, and the time step after it is recalculated as well if its speeds changed.
+        indices = (np.nonzero(mismatch)[0] + 1).tolist()
+        p = 0
+        while p < len(indices):
+            k = indices[p]
+            while k < n:
+                speed[k], motor_speed[k] = _speed_step(c, float(des_speed[k]), float(dt[k]), float(roll_F[k]),
+                                                       float(speed[k - 1]), float(motor_speed[k - 1]))
+                prev_speed[k], prev_motor_speed[k] = speed[k - 1], motor_speed[k - 1]
+                k += 1
+                if k < n and prev_speed[k] == speed[k - 1] and prev_motor_speed[k] == motor_speed[k - 1]:
+                    break
+            while p < len(indices) and indices[p] <= k:
+                p += 1
+
+    # Only the simulation variables the requested channels are calculated from are evaluated with the final speeds.
+    keep = set(sol.channels)
+    if not keep.isdisjoint(('actual_speed_kmph', 'distance')):
+        keep.add('actual_speed')
+    if not keep.isdisjoint(('cell_current', 'battery_SOC')):
+        keep.add('current')
+    if mismatch.any() or not keep <= {'actual_speed', 'motor_speed'}:
+        del res, speed, motor_speed
+        res = _evaluate(c, des_speed, dt, roll_F, prev_speed, prev_motor_speed, keep=keep)
+
+    for name in sol.channels:
+        if name in res:
+            setattr(sol, name, res[name])
+    if 'actual_speed_kmph' in sol.channels:
+        sol.actual_speed_kmph = res['actual_speed'] * 3600 / 1000
+    if 'cell_current' in sol.channels:
+        sol.cell_current = res['current'] / c['Np']
+    if 'distance' in sol.channels:
+        sol.distance = np.cumsum(np.concatenate(([init_distance],
+                                                 ((res['actual_speed'] + prev_speed) / 2) * dt / 1000)))[1:]
+    if 'battery_SOC' in sol.channels:
+        sol.battery_SOC = np.cumsum(np.concatenate(([init_SOC], -(res['current'] * dt))))[1:]
+    return sol
+
+
+def simulate_batch(evs: list, t: list, des_speed: list, grade_angle: list, rho: list, road_force: list,
+                   prev_time: list, drive_cycle_names: list, channels: Optional[Sequence[str]] = None) -> BatchSolution:
+    """
+    Simulates a batch of scenarios in lockstep. Each argument is a list with one entry per scenario. The vehicle
+    parameters are stacked into arrays and the drive cycles are padded to the longest one, so that every time step of
+    all the scenarios is evaluated with one set of array operations.
+    :param evs: (list) EV object of each scenario
+    :param t: (list) time array of each scenario, s
+    :param des_speed: (list) desired speed array of each scenario, m/s
+    :param grade_angle: (list) road grade angle (float or np.ndarray) of each scenario, rad
+    :param rho: (list) air density of each scenario, kg/m^3
+    :param road_force: (list) road force of each scenario, N
+    :param prev_time: (list) time before the first time step of each scenario, s
+    :param drive_cycle_names: (list) drive cycle name of each scenario
+    :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+    :return: (BatchSolution) time and simulation results of shape (scenario, 1 + channel, time)
+    """
+    channels = select_channels(channels)
+    num_scenarios = len(evs)
+    lengths = np.array([len(t_i) for t_i in t])
+    n = int(lengths.max())
+
+    consts = [_constants(ev=ev, rho=rho_i, road_force=road_force_i) for ev, rho_i, road_force_i in
+              zip(evs, rho, road_force)]
+    c = {key: np.array([c_i[key] for c_i in consts]) for key in consts[0]}
+
+    # The padded time steps continue the time array with 1 s steps at standstill, and are discarded afterwards.
+    t_batch = np.empty((num_scenarios, n))
+    dt = np.ones((num_scenarios, n))
+    des_batch = np.zeros((num_scenarios, n))
+    roll_F = np.empty((num_scenarios, n))
+    for i in range(num_scenarios):
+        length = lengths[i]
+        t_batch[i, :length] = t[i]
+        t_batch[i, length:] = t[i][-1] + np.arange(1, n - length + 1)
+        dt[i, 0] = t[i][0] - prev_time[i]
+        dt[i, 1:length] = t[i][1:] - t[i][:-1]
+        des_batch[i, :length] = des_speed[i]
+        roll_F[i] = c['max_mass'][i] * PhysicsConstants.g * np.sin(grade_angle[i])
+    dt = np.ascontiguousarray(dt.T)
+    des_batch = np.ascontiguousarray(des_batch.T)
+    roll_F = np.ascontiguousarray(roll_F.T)
+
+    data = np.empty((n, 1 + len(channels), num_scenarios))
+    data[:, 0, :] = t_batch.T
+    prev_speed = np.zeros(num_scenarios)
+    prev_motor_speed = np.zeros(num_scenarios)
+    prev_distance = np.zeros(num_scenarios)
+    prev_SOC = np.zeros(num_scenarios)
+    for k in range(n):
+        res = _evaluate(c, des_batch[k], dt[k], roll_F[k], prev_speed, prev_motor_speed)
+        res['actual_speed_kmph'] = res['actual_speed'] * 3600 / 1000
+        res['cell_current'] = res['current'] / c['Np']
+        res['distance'] = prev_distance + ((res['actual_speed'] + prev_speed) / 2) * dt[k] / 1000
+        res['battery_SOC'] = prev_SOC - res['current'] * dt[k]
+        data_k = data[k]
+        for i, name in enumerate(channels):
+            data_k[1 + i] = res[name]
+        prev_speed, prev_motor_speed = res['actual_speed'], res['motor_speed']
+        prev_distance, prev_SOC = res['distance'], res['battery_SOC']
+
+    data = np.ascontiguousarray(data.transpose(2, 1, 0))
+    for i in range(num_scenarios):
+        data[i, 1:, lengths[i]:] = np.nan
+    return BatchSolution(veh_alias=[ev.alias_name for ev in evs], drive_cycle_name=list(drive_cycle_names),
+                         lengths=lengths, data=data, channels=channels)
+
+
+def simulate_summary(c: dict, des_speed: npt.ArrayLike, dt: npt.ArrayLike, roll_F: npt.ArrayLike) -> dict:
+    """
+    Simulates scenarios that share the same time array in lockstep and only keeps their summary metrics.
+    :param c: (dict) constants of each scenario, as arrays of shape (scenario,)
+    :param des_speed: (np.ndarray) desired speed of shape (time, scenario), m/s
+    :param dt: (np.ndarray) time step size of shape (time,), s
+    :param roll_F: (np.ndarray) grade force of shape (time, scenario), N
+    :return: (dict) battery energy, kWh, energy consumption, Wh/km, peak battery current, A, and final battery SOC of
+    each scenario.
+    """
+    num_scenarios = des_speed.shape[1]
+    prev_speed = np.zeros(num_scenarios)
+    prev_motor_speed = np.zeros(num_scenarios)
+    distance = np.zeros(num_scenarios)
+    SOC = np.zeros(num_scenarios)
+    energy = np.zeros(num_scenarios)
+    peak_current = np.full(num_scenarios, -np.inf)
+    for k in range(len(dt)):
+        res = _evaluate(c, des_speed[k], dt[k], roll_F[k], prev_speed, prev_motor_speed)
+        distance = distance + ((res['actual_speed'] + prev_speed) / 2) * dt[k] / 1000
+        SOC = SOC - res['current'] * dt[k]
+        energy = energy + res['battery_demand'] * dt[k]
+        np.maximum(peak_current, res['current'], out=peak_current)
+        prev_speed, prev_motor_speed = res['actual_speed'], res['motor_speed']
+    energy = energy / 3600
+    return {'energy': energy, 'Wh_per_km': energy * 1000 / distance, 'peak_current': peak_current,
+            'final_SOC': SOC}
@@ -8,7 +8,10 @@ __all__ = ['VehicleDynamics']
 __authors__ = "Moin Ahmed"
 __copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
 
+import dataclasses
+import types
 from collections.abc import Callable
+from typing import Optional, Sequence
 
 import numpy as np
 import numpy.typing
@@ -17,10 +20,34 @@ from EV_sim.ev import EV
 from EV_sim.extern_conditions import ExternalConditions
 from EV_sim.drivecycles import DriveCycle
 from EV_sim.utils.constants import PhysicsConstants
-from EV_sim.sol import Solution
+from EV_sim.sol import SOLUTION_CHANNELS, select_channels, SimState, Solution, BatchSolution
+from EV_sim.kernel import SEGMENT_RTOL, SEGMENT_ATOL, _constants, simulate_segments, simulate_batch
+from EV_sim.stepper import VehicleStepper
 from EV_sim.utils.timer import sol_timer
 
 
+class _ChannelBuffer:
+    """
+    Buffer of a simulation variable of the time stepping simulation. It either writes the values to a row of the
+    results, whose first element is the time step with the start index, or only keeps the value of the last time step.
+    """
+    __slots__ = ('row', 'start', 'value')
+
+    def __init__(self, row: Optional[numpy.typing.ArrayLike], start: int) -> None:
+        self.row = row
+        self.start = start
+        self.value = 0.0
+
+    def __getitem__(self, k: int) -> float:
+        return self.value if self.row is None else self.row[k - self.start]
+
+    def __setitem__(self, k: int, value: float) -> None:
+        if self.row is None:
+            self.value = float(value)
+        else:
+            self.row[k - self.start] = value
+
+
 class VehicleDynamics:
     """
     VehicleDynamics simulates the demanded power and current from the batter pack.
@@ -54,13 +81,18 @@ class VehicleDynamics:
                 raise ValueError("The lengths of external condition's road grade and drive cycle's time array do not "
                                  "match.")
 
+        self._params = None  # EVKernelParams of the running time stepping simulation
+        self._des_speed = None  # desired speed array of the running time stepping simulation, m/s
+        self._incremental = None  # inputs and results of the previous simulate_incremental call
+        self.incremental_range = None  # (start, stop) time step indices recalculated by simulate_incremental
+
     @property
     def des_speed(self) -> numpy.typing.ArrayLike:
         """
         Desired vehicle speed in m/s.
         :return: (np.ndarray) Array of desired speed, m/s
         """
-        return np.minimum(self.DriveCycle.speed_kmph, self.EV.max_speed) / 3.6
+        return np.minimum(self.DriveCycle.speed_kmph, self.EV.kernel_params().max_speed) / 3.6
 
     @staticmethod
     def desired_acc(desired_speed: float, prev_speed: float, current_time: float, prev_time: float) -> float:
@@ -125,6 +157,45 @@ class VehicleDynamics:
         prev_time = 2 * self.DriveCycle.t[0] - self.DriveCycle.t[1]
         return prev_speed, prev_motor_speed, prev_distance, prev_SOC, prev_time
 
+    def initial_state(self, start_state: Optional[SimState] = None, start_index: Optional[int] = None) -> SimState:
+        """
+        Returns the simulation state the simulation starts from.
+        :param start_state: (SimState) state to resume the simulation from. None starts from the initial conditions.
+        :param start_index: (int) index of the first time step to be simulated. Defaults to the index of start_state.
+        :return: (SimState) simulation state
+        """
+        if start_state is None:
+            if start_index not in (None, 0):
+                raise ValueError("start_index requires a start_state.")
+            prev_speed, prev_motor_speed, prev_distance, prev_SOC, prev_time = self.init_cond()
+            return SimState(index=0, prev_time=prev_time, prev_speed=prev_speed, prev_motor_speed=prev_motor_speed,
+                            prev_distance=prev_distance, prev_SOC=prev_SOC)
+        if not isinstance(start_state, SimState):
+            raise TypeError("start_state needs to be a SimState object.")
+        if start_index is not None:
+            start_state = dataclasses.replace(start_state, index=start_index)
+        if start_state.index > len(self.DriveCycle.t):
+            raise ValueError("The start index is beyond the drive cycle's time array.")
+        return start_state
+
+    @staticmethod
+    def _check_checkpoint(checkpoint_every: Optional[int], checkpoint_file: Optional[str]) -> None:
+        if checkpoint_every is None:
+            return
+        if (not isinstance(checkpoint_every, int)) or (checkpoint_every < 1):
+            raise ValueError("checkpoint_every needs to be a positive integer.")
+        if checkpoint_file is None:
+            raise ValueError("checkpoint_every requires a checkpoint_file.")
+
+    @staticmethod
+    def _check_out(out: Optional[Solution], channels: tuple, length: int) -> None:
+        if out is None:
+            return
+        if not isinstance(out, Solution):
+            raise TypeError("out needs to be a Solution object.")
+        if (out.channels != channels) or (len(out.t) != length):
+            raise ValueError("out needs to have the requested channels and the simulated number of time steps.")
+
     def create_init_arrays(self) -> Solution:
         """
         Create numpy arrays with zero elements of the desired sizes for all the simulation results. These simulation
@@ -135,38 +206,317 @@ class VehicleDynamics:
         sol = Solution(veh_alias=self.EV.alias_name, t=self.DriveCycle.t)
         return sol
 
+    @staticmethod
+    def step_buffers(sol: Solution, start: int) -> types.SimpleNamespace:
+        """
+        Returns the buffers the time steps write the simulation variables to when only some of the channels or time
+        steps are requested. The requested channels are written to the rows of the Solution object, whose first column
+        is the time step with the start index, and the other channels only keep the value of the current time step.
+        :param sol: (Solution) Solution object for the results from the start index on.
+        :param start: (int) index of the first simulated time step.
+        :return: (SimpleNamespace) buffer of each channel, indexed by the time step index.
+        """
+        return types.SimpleNamespace(**{name: _ChannelBuffer(getattr(sol, name) if name in sol.channels else None,
+                                                             start=start) for name in SOLUTION_CHANNELS})
+
     @staticmethod
     def simulate_over_all_timesteps(func) -> Callable[[], Solution]:
         """
         Acts as a decorator function, whose wrapper function defines the initial conditions and performs simulation
-        iterations over all time steps.
+        iterations over all time steps. The wrapper function takes the optional arguments engine ('loop' for the time
+        stepping or 'segment' for the segment kernel), channels (names of the simulation result channels to keep,
+        where None keeps all the channels), start_state and start_index (SimState to resume from and the index of the
+        first time step to simulate; the returned Solution only covers the time steps from this index on),
+        checkpoint_every and checkpoint_file (the SimState is saved to the file every checkpoint_every time steps
+        and at the end of the simulation), and out (Solution object, e.g., a view of a shared memory block, that the
+        results are written to and that is returned instead of a new one).
         :param func: (function type) simulation function
         """
 
         @sol_timer
-        def initialize_and_iterations(self) -> Solution:
-            prev_speed, prev_motor_speed, prev_distance, prev_SOC, prev_time = self.init_cond()  # initialization
-            sol = self.create_init_arrays()  # create arrays for results and calculations
+        def initialize_and_iterations(self, engine: str = "loop", channels: Optional[Sequence[str]] = None,
+                                      start_state: Optional[SimState] = None, start_index: Optional[int] = None,
+                                      checkpoint_every: Optional[int] = None,
+                                      checkpoint_file: Optional[str] = None,
+                                      out: Optional[Solution] = None) -> Solution:
+            channels = select_channels(channels)
+            if engine not in ("loop", "segment"):
+                raise ValueError(f"Unknown simulation engine '{engine}'. Use 'loop' or 'segment'.")
+            state = self.initial_state(start_state=start_state, start_index=start_index)  # initialization
+            self._check_checkpoint(checkpoint_every=checkpoint_every, checkpoint_file=checkpoint_file)
+            self._check_out(out, channels=channels, length=len(self.DriveCycle.t) - state.index)
+            if engine == "segment":
+                return self.simulate_segments(channels=channels, start_state=state, checkpoint_every=checkpoint_every,
+                                              checkpoint_file=checkpoint_file, out=out)
+            prev_time, prev_speed, prev_motor_speed = state.prev_time, state.prev_speed, state.prev_motor_speed
+            prev_distance, prev_SOC = state.prev_distance, state.prev_SOC
+            # create arrays for results and calculations. Only the requested channels and time steps are stored, and
+            # the other channels only keep the value of the current time step.
+            self._params = self.EV.kernel_params()  # EV parameters used by the time steps of this simulation
+            self._des_speed = np.minimum(self.DriveCycle.speed_kmph, self._params.max_speed) / 3.6
+            full = (channels == SOLUTION_CHANNELS) and (state.index == 0)
+            if out is not None:
+                sol = out
+                sol.t = self.DriveCycle.t[state.index:]
+            elif full:
+                sol = self.create_init_arrays()
+            else:
+                sol = Solution(veh_alias=self.EV.alias_name, t=self.DriveCycle.t[state.index:], channels=channels)
+            buffers = sol if full else self.step_buffers(sol, start=state.index)
             # Run the simulation.
-            for k in range(len(self.DriveCycle.t)):  # k represents time index.
-                func(self, sol, k, prev_time, prev_speed, prev_motor_speed, prev_distance, prev_SOC)
+            for k in range(state.index, len(self.DriveCycle.t)):  # k represents time index.
+                func(self, buffers, k, prev_time, prev_speed, prev_motor_speed, prev_distance, prev_SOC)
                 # update relevant variables below
                 prev_time = self.DriveCycle.t[k]
-                prev_speed = sol.actual_speed[k]
-                prev_motor_speed = sol.motor_speed[k]
-                prev_distance = sol.distance[k]
-                prev_SOC = sol.battery_SOC[k]
+                prev_speed = buffers.actual_speed[k]
+                prev_motor_speed = buffers.motor_speed[k]
+                prev_distance = buffers.distance[k]
+                prev_SOC = buffers.battery_SOC[k]
+                if (checkpoint_every is not None) and \
+                        ((k + 1 - state.index) % checkpoint_every == 0 or k + 1 == len(self.DriveCycle.t)):
+                    SimState(index=k + 1, prev_time=prev_time, prev_speed=prev_speed,
+                             prev_motor_speed=prev_motor_speed, prev_distance=prev_distance,
+                             prev_SOC=prev_SOC).save(checkpoint_file)
+            self._des_speed = None
             return sol
 
         return initialize_and_iterations
 
+    def simulate_segments(self, channels: Optional[Sequence[str]] = None, start_state: Optional[SimState] = None,
+                          checkpoint_every: Optional[int] = None, checkpoint_file: Optional[str] = None,
+                          out: Optional[Solution] = None) -> Solution:
+        """
+        Simulates the vehicle dynamics using the segment kernel. The cycle invariant arrays (desired speed, time step
+        sizes, grade force and the EV constants) are computed once and the runs of time steps where the vehicle follows
+        the drive cycle are evaluated with array operations. The results match the time stepping simulation within
+        kernel.SEGMENT_RTOL and kernel.SEGMENT_ATOL.
+        :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+        :param start_state: (SimState) state to resume the simulation from. None starts from the initial conditions.
+        :param checkpoint_every: (int) the drive cycle is simulated in blocks of this many time steps and the state
+        is saved to checkpoint_file after each block.
+        :param checkpoint_file: (str) file name of the checkpoint.
+        :param out: (Solution) Solution object with the requested channels and time steps that the results are written
+        to. None creates a new one.
+        :return: (Solution) Solution object containing the simulation results from the start state's index on.
+        """
+        state = self.initial_state(start_state=start_state)
+        self._check_checkpoint(checkpoint_every=checkpoint_every, checkpoint_file=checkpoint_file)
+        channels = select_channels(channels)
+        self._check_out(out, channels=channels, length=len(self.DriveCycle.t) - state.index)
+        t, des_speed, grade_angle = self.DriveCycle.t, self.des_speed, self.ExtCond.road_grade_angle
+        if (state.index == 0) and (checkpoint_every is None):
+            return simulate_segments(ev=self.EV, t=t, des_speed=des_speed, grade_angle=grade_angle,
+                                     rho=self.ExtCond.rho, road_force=self.ExtCond.road_force,
+                                     prev_time=state.prev_time, channels=channels, out=out)
+
+        rows = [0] + [1 + SOLUTION_CHANNELS.index(name) for name in channels]
+        start = state.index
+        if out is None:
+            sol = Solution(veh_alias=self.EV.alias_name, t=t[start:], channels=channels)
+        else:
+            sol = out
+            sol.t = t[start:]
+        block_size = checkpoint_every if checkpoint_every is not None else max(1, len(t) - start)
+        for a in range(start, len(t), block_size):
+            b = min(len(t), a + block_size)
+            block = simulate_segments(ev=self.EV, t=t[a:b], des_speed=des_speed[a:b],
+                                      grade_angle=grade_angle[a:b] if isinstance(grade_angle, np.ndarray) else
+                                      grade_angle, rho=self.ExtCond.rho, road_force=self.ExtCond.road_force,
+                                      prev_time=state.prev_time, init_speed=state.prev_speed,
+                                      init_motor_speed=state.prev_motor_speed, init_distance=state.prev_distance,
+                                      init_SOC=state.prev_SOC)
+            sol.data[:, a - start: b - start] = block.data[rows]
+            state = dataclasses.replace(SimState.from_solution(block, b - a), index=b)
+            if checkpoint_every is not None:
+                state.save(checkpoint_file)
+        return sol
+
+    def simulate_incremental(self, channels: Optional[Sequence[str]] = None, rtol: float = SEGMENT_RTOL,
+                             atol: float = SEGMENT_ATOL) -> Solution:
+        """
+        Simulates the vehicle dynamics using the results of the previous call as a cache. When only a section of the
+        drive cycle (or of the road grade) has been edited since the previous call, the simulation restarts from the
+        first edited time step and stops once the vehicle and motor speeds are back within the tolerances of the
+        cached ones after the last edited time step. The cached distance and battery SOC after that time step are
+        shifted by the offsets at that time step. The first call, and the calls after the EV, the external conditions
+        or the length of the drive cycle change, simulate the whole drive cycle with the segment kernel. The indices of
+        the recalculated time steps are stored in the incremental_range attribute.
+        :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+        :param rtol: (float) relative tolerance of the speeds for the trajectories to be considered converged.
+        :param atol: (float) absolute tolerance of the speeds for the trajectories to be considered converged.
+        :return: (Solution) Solution object containing the simulation results.
+        """
+        channels = select_channels(channels)
+        t = self.DriveCycle.t
+        des_speed = self.des_speed
+        grade_angle = np.broadcast_to(self.ExtCond.road_grade_angle, t.shape)
+        constants = _constants(ev=self.EV, rho=self.ExtCond.rho, road_force=self.ExtCond.road_force)
+        cache = self._incremental
+        if (cache is None) or (len(cache['t']) != len(t)) or (cache['constants'] != constants):
+            sol = self.simulate_segments()
+            self.incremental_range = (0, len(t))
+        else:
+            sol = cache['sol']
+            changed = (cache['des_speed'] != des_speed) | (cache['grade_angle'] != grade_angle)
+            t_changed = cache['t'] != t
+            changed[1:] |= t_changed[:-1]  # a time change also changes the time step size of the next time step
+            changed |= t_changed
+            if t_changed[:2].any():
+                changed[0] = True  # the time before the first time step depends on the first two times
+            if changed.any():
+                edited = np.nonzero(changed)[0]
+                stop = self._resimulate(sol, start=int(edited[0]), last_edit=int(edited[-1]), rtol=rtol, atol=atol)
+                self.incremental_range = (int(edited[0]), stop)
+            else:
+                self.incremental_range = (0, 0)
+        self._incremental = {'t': t.copy(), 'des_speed': des_speed.copy(), 'grade_angle': grade_angle.copy(),
+                             'constants': constants, 'sol': sol}
+        rows = [0] + [1 + SOLUTION_CHANNELS.index(name) for name in channels]
+        return Solution.from_buffer(veh_alias=self.EV.alias_name, data=sol.data[rows], channels=channels)
+
+    def _resimulate(self, sol: Solution, start: int, last_edit: int, rtol: float, atol: float) -> int:
+        """
+        Recalculates the cached results in place from the start index until the trajectory reconverges with the
+        cached one after the last edited time step. The drive cycle is simulated in blocks of doubling size with the
+        segment kernel.
+        :return: (int) index after the last recalculated time step
+        """
+        t, des_speed, grade_angle = self.DriveCycle.t, self.des_speed, self.ExtCond.road_grade_angle
+        sol.t = t
+        state = self.initial_state() if start == 0 else SimState.from_solution(sol, start)
+        a, block_size = start, max(64, last_edit + 1 - start)
+        while a < len(t):
+            b = min(len(t), a + block_size)
+            block = simulate_segments(ev=self.EV, t=t[a:b], des_speed=des_speed[a:b],
+                                      grade_angle=grade_angle[a:b] if isinstance(grade_angle, np.ndarray) else
+                                      grade_angle, rho=self.ExtCond.rho, road_force=self.ExtCond.road_force,
+                                      prev_time=state.prev_time, init_speed=state.prev_speed,
+                                      init_motor_speed=state.prev_motor_speed, init_distance=state.prev_distance,
+                                      init_SOC=state.prev_SOC)
+            check = max(a, last_edit) - a  # the trajectories can only reconverge after the last edited time step
+            converged = np.isclose(block.actual_speed[check:], sol.actual_speed[a + check: b], rtol=rtol, atol=atol) & \
+                np.isclose(block.motor_speed[check:], sol.motor_speed[a + check: b], rtol=rtol, atol=atol)
+            if converged.any():
+                j = check + int(np.argmax(converged))
+                distance_offset = block.distance[j] - sol.distance[a + j]
+                SOC_offset = block.battery_SOC[j] - sol.battery_SOC[a + j]
+                sol.data[:, a: a + j + 1] = block.data[:, :j + 1]
+                sol.distance[a + j + 1:] += distance_offset
+                sol.battery_SOC[a + j + 1:] += SOC_offset
+                return a + j + 1
+            sol.data[:, a: b] = block.data
+            state = dataclasses.replace(SimState.from_solution(block, b - a), index=b)
+            a, block_size = b, 2 * block_size
+        return len(t)
+
+    def _energy_and_SOC(self) -> tuple[float, float]:
+        """
+        Simulates the drive cycle with the segment kernel and returns the battery energy, kWh, and the final battery
+        SOC.
+        """
+        sol = self.simulate_segments(channels=("battery_demand", "battery_SOC"))
+        dt = np.diff(self.DriveCycle.t, prepend=self.init_cond()[-1])
+        return float(np.sum(sol.battery_demand * dt) / 3600), float(sol.battery_SOC[-1])
+
+    def resample_drive_cycle(self, rtol: float = 0.01, speed_tol: float = 8.0, max_halvings: int = 10) -> DriveCycle:
+        """
+        Returns the coarsest resampled drive cycle (see DriveCycle.resample) whose simulated battery energy and final
+        battery SOC are within the relative tolerance of the ones of the full resolution drive cycle. The speed
+        tolerance of the resampling is halved until the bound is met. The bound is checked for this object's EV and
+        external conditions, and the resampled drive cycle can be reused for similar vehicles. If the road grade is an
+        array, the time steps where it changes are retained and the decimated road grade is given by
+        road_grade[cycle.source_index].
+        :param rtol: (float) relative tolerance of the battery energy and the final battery SOC.
+        :param speed_tol: (float) initial speed tolerance of the resampling, km/h
+        :param max_halvings: (int) maximum number of times the speed tolerance is halved.
+        :return: (DriveCycle) resampled drive cycle, or a resampling that keeps all the time steps if the bound is not
+        met.
+        """
+        if rtol <= 0:
+            raise ValueError("rtol needs to be positive.")
+        energy, SOC = self._energy_and_SOC()
+        road_grade = self.ExtCond.road_grade
+        keep = None
+        if isinstance(road_grade, np.ndarray):
+            keep = np.nonzero(road_grade[1:] != road_grade[:-1])[0]
+            keep = np.concatenate((keep, keep + 1))
+
+        def within_bound(tol: float) -> Optional[DriveCycle]:
+            cycle = self.DriveCycle.resample(speed_tol=tol, keep=keep)
+            ext_cond = self.ExtCond if keep is None else \
+                ExternalConditions(rho=self.ExtCond.rho, road_grade=road_grade[cycle.source_index],
+                                   road_force=self.ExtCond.road_force)
+            coarse_energy, coarse_SOC = VehicleDynamics(ev_obj=self.EV, drive_cycle_obj=cycle,
+                                                        external_condition_obj=ext_cond)._energy_and_SOC()
+            if (abs(coarse_energy - energy) <= rtol * abs(energy)) and (abs(coarse_SOC - SOC) <= rtol * abs(SOC)):
+                return cycle
+            return None
+
+        for i in range(max_halvings + 1):
+            cycle = within_bound(speed_tol / 2 ** i)
+            if cycle is not None:
+                # a few bisection steps between the passing and the last failing speed tolerances
+                low, high = speed_tol / 2 ** i, speed_tol / 2 ** (i - 1)
+                for _ in range(3 if i > 0 else 0):
+                    candidate = within_bound((low + high) / 2)
+                    if candidate is None:
+                        high = (low + high) / 2
+                    else:
+                        low = (low + high) / 2
+                        cycle = candidate if len(candidate.t) < len(cycle.t) else cycle
+                return cycle
+        all_steps = np.arange(len(self.DriveCycle.t))
+        return self.DriveCycle.resample(speed_tol=0.0, keep=all_steps)
+
+    def stepper(self, prev_time: Optional[float] = None) -> VehicleStepper:
+        """
+        Returns a stepper that simulates the vehicle with this object's EV and external conditions one sample at a
+        time, e.g., for live telemetry. Feeding it the drive cycle's time and speed arrays reproduces the simulate
+        method's results.
+        :param prev_time: (float) time before the first sample, s. Defaults to the one of the drive cycle.
+        :return: (VehicleStepper) VehicleStepper object
+        """
+        if prev_time is None:
+            prev_time = self.init_cond()[-1]
+        return VehicleStepper(ev_obj=self.EV, external_condition_obj=self.ExtCond, prev_time=prev_time)
+
+    @staticmethod
+    @sol_timer
+    def simulate_batch(evs, cycles, conditions, channels: Optional[Sequence[str]] = None) -> BatchSolution:
+        """
+        Simulates all the combinations of the input vehicles, drive cycles and external conditions in lockstep. The
+        Python overhead is paid once per time step for the whole batch instead of once per time step per scenario.
+        The scenarios are ordered with the vehicles varying slowest and the external conditions fastest.
+        :param evs: (EV or list) EV object(s)
+        :param cycles: (DriveCycle or list) DriveCycle object(s)
+        :param conditions: (ExternalConditions or list) ExternalConditions object(s)
+        :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+        :return: (BatchSolution) time and simulation results of shape (scenario, 1 + channel, time)
+        """
+        evs = [evs] if isinstance(evs, EV) else list(evs)
+        cycles = [cycles] if isinstance(cycles, DriveCycle) else list(cycles)
+        conditions = [conditions] if isinstance(conditions, ExternalConditions) else list(conditions)
+        models = [VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle, external_condition_obj=cond)
+                  for ev in evs for cycle in cycles for cond in conditions]
+        if len(models) == 0:
+            raise ValueError("The batch needs at least one vehicle, drive cycle and external condition.")
+        return simulate_batch(evs=[model.EV for model in models], t=[model.DriveCycle.t for model in models],
+                              des_speed=[model.des_speed for model in models],
+                              grade_angle=[model.ExtCond.road_grade_angle for model in models],
+                              rho=[model.ExtCond.rho for model in models],
+                              road_force=[model.ExtCond.road_force for model in models],
+                              prev_time=[model.init_cond()[-1] for model in models],
+                              drive_cycle_names=[model.DriveCycle.drive_cycle_name for model in models],
+                              channels=channels)
+
     @simulate_over_all_timesteps
     def simulate(self, sol: Solution, k: int, prev_time: float, prev_speed: float, prev_motor_speed: float,
                  prev_distance: float, prev_SOC: float) -> None:
         """
         Performs vehicle dynamics simulation at a specific time step, k. It updates the Solution instance attributes
         at this time step, k.
-        :param sol: Solution object that contains the all the simulation results in a arrays.
+        :param sol: Solution object that contains the all the simulation results in a arrays, or the buffers returned
+        by step_buffers.
         :param k: time step
         :param prev_time: time at the previous time step
         :param prev_speed: speed at the previous time step
@@ -175,30 +525,30 @@ class VehicleDynamics:
         :param prev_SOC: SOC at the previous time step.
         :return: (None)
         """
-        sol.des_acc[k] = VehicleDynamics.desired_acc(desired_speed=self.des_speed[k], prev_speed=prev_speed,
+        p = self._params
+        sol.des_acc[k] = VehicleDynamics.desired_acc(desired_speed=self._des_speed[k], prev_speed=prev_speed,
                                                      current_time=self.DriveCycle.t[k], prev_time=prev_time)
-        sol.des_acc_F[k] = VehicleDynamics.desired_acc_F(equivalent_mass=self.EV.equiv_mass, desired_acc=sol.des_acc[k])
-        sol.aero_F[k] = VehicleDynamics.aero_F(self.ExtCond.rho, self.EV.A_front, self.EV.C_d, prev_speed)
-        sol.roll_grade_F[k] = VehicleDynamics.roll_grade_F(max_veh_mass=self.EV.max_mass,
+        sol.des_acc_F[k] = VehicleDynamics.desired_acc_F(equivalent_mass=p.equiv_mass, desired_acc=sol.des_acc[k])
+        sol.aero_F[k] = VehicleDynamics.aero_F(self.ExtCond.rho, p.A_front, p.C_d, prev_speed)
+        sol.roll_grade_F[k] = VehicleDynamics.roll_grade_F(max_veh_mass=p.max_mass,
                                                            gravity_acc=PhysicsConstants.g,
                                                            grade_angle=self.ExtCond.road_grade_angle)
         if np.abs(prev_speed) > 0:
-            sol.roll_grade_F[k] = sol.roll_grade_F[k] + self.EV.C_r * self.EV.max_mass * PhysicsConstants.g
+            sol.roll_grade_F[k] = sol.roll_grade_F[k] + p.C_r * p.max_mass * PhysicsConstants.g
         sol.demand_torque[k] = VehicleDynamics.demand_torque(des_acc_F=sol.des_acc_F[k], aero_F=sol.aero_F[k],
                                                              roll_grade_F=sol.roll_grade_F[k],
                                                              road_F=self.ExtCond.road_force,
-                                                             wheel_radius=self.EV.drive_train.wheel.r,
-                                                             gear_ratio=self.EV.drive_train.gear_box.N)
+                                                             wheel_radius=p.wheel_r, gear_ratio=p.gear_N)
 
         # The remaining calculations leads to actual speed
         # First check if demand torque is limited by the motor characteristics and calculate the max. torque and
         # limit torque
-        if prev_motor_speed < self.EV.motor.RPM_r:
-            sol.max_torque[k] = self.EV.motor.L_max
+        if prev_motor_speed < p.RPM_r:
+            sol.max_torque[k] = p.L_max
         else:
-            sol.max_torque[k] = self.EV.motor.L_max * self.EV.motor.RPM_r / prev_motor_speed
+            sol.max_torque[k] = p.L_max * p.RPM_r / prev_motor_speed
 
-        sol.limit_regen[k] = np.minimum(sol.max_torque[k], self.EV.drive_train.frac_regen_torque * self.EV.motor.L_max)
+        sol.limit_regen[k] = np.minimum(sol.max_torque[k], p.frac_regen_torque * p.L_max)
         sol.limit_torque[k] = np.minimum(sol.demand_torque[k], sol.max_torque[k])
         if sol.limit_torque[k] > 0:
             sol.motor_torque[k] = sol.limit_torque[k]
@@ -206,14 +556,13 @@ class VehicleDynamics:
             sol.motor_torque[k] = np.maximum(-sol.limit_regen[k], sol.limit_torque[k])
 
         # Now calculate the actual accelerations and speeds. Finally, the distance is calculated
-        sol.actual_acc_F[k] = sol.limit_torque[k] * self.EV.drive_train.gear_box.N / self.EV.drive_train.wheel.r - \
-                              sol.aero_F[k] - sol.roll_grade_F[k] - self.ExtCond.road_force
-        sol.actual_acc[k] = sol.actual_acc_F[k] / self.EV.equiv_mass
-        sol.motor_speed[k] = np.minimum(self.EV.motor.RPM_max, self.EV.drive_train.gear_box.N * (
+        sol.actual_acc_F[k] = sol.limit_torque[k] * p.gear_N / p.wheel_r - sol.aero_F[k] - sol.roll_grade_F[k] - \
+                              self.ExtCond.road_force
+        sol.actual_acc[k] = sol.actual_acc_F[k] / p.equiv_mass
+        sol.motor_speed[k] = np.minimum(p.RPM_max, p.gear_N * (
                 prev_speed + sol.actual_acc[k] * (self.DriveCycle.t[k] - prev_time)) * 60 / (
-                                                2 * np.pi * self.EV.drive_train.wheel.r))
-        sol.actual_speed[k] = sol.motor_speed[k] * 2 * np.pi * self.EV.drive_train.wheel.r / (
-                60 * self.EV.drive_train.gear_box.N)
+                                                2 * np.pi * p.wheel_r))
+        sol.actual_speed[k] = sol.motor_speed[k] * 2 * np.pi * p.wheel_r / (60 * p.gear_N)
         sol.actual_speed_kmph[k] = sol.actual_speed[k] * 3600 / 1000
         sol.distance[k] = prev_distance + ((sol.actual_speed[k] + prev_speed) / 2) * (self.DriveCycle.t[k] -
                                                                                       prev_time) / 1000
@@ -224,14 +573,14 @@ class VehicleDynamics:
         else:
             sol.demand_power[k] = np.maximum(sol.limit_torque[k], -sol.limit_regen[k])
         sol.demand_power[k] = (sol.demand_power[k] * 2 * np.pi) * (prev_motor_speed + sol.motor_speed[k]) / (2 * 60000)
-        sol.limit_power[k] = np.maximum(-self.EV.motor.P_max, np.minimum(self.EV.motor.P_max, sol.demand_power[k]))
-        sol.battery_demand[k] = self.EV.overhead_power / 1000
+        sol.limit_power[k] = np.maximum(-p.P_max, np.minimum(p.P_max, sol.demand_power[k]))
+        sol.battery_demand[k] = p.overhead_power / 1000
         if sol.limit_power[k] > 0:
-            sol.battery_demand[k] = sol.battery_demand[k] + sol.limit_power[k] / self.EV.drive_train.eff
+            sol.battery_demand[k] = sol.battery_demand[k] + sol.limit_power[k] / p.drive_train_eff
         else:
-            sol.battery_demand[k] = sol.battery_demand[k] + sol.limit_power[k] * self.EV.drive_train.eff
-        sol.current[k] = sol.battery_demand[k] * 1000 / self.EV.pack.pack_V_nom
-        sol.cell_current[k] = sol.current[k] / self.EV.pack.Np
+            sol.battery_demand[k] = sol.battery_demand[k] + sol.limit_power[k] * p.drive_train_eff
+        sol.current[k] = sol.battery_demand[k] * 1000 / p.pack_V_nom
+        sol.cell_current[k] = sol.current[k] / p.Np
         sol.battery_SOC[k] = prev_SOC - sol.current[k] * (self.DriveCycle.t[k] - prev_time)
 
     def __repr__(self):
@@ -0,0 +1,188 @@
+"""
+This module contains the classes and functionalities for querying the vehicles of the EV database by their
+parameters. The numeric parameters are indexed with sorted arrays and the categorical parameters with hash tables, so
+that the range and equality lookups do not scan all the vehicles.
+"""
+
+__all__ = ['CATEGORICAL_PARAMETERS', 'EVIndex', 'get_index']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import os
+import threading
+from collections.abc import Sequence
+from functools import reduce
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.config import definations
+from EV_sim.database import get_database
+from EV_sim.ev_table import EVTable
+
+
+# Categorical parameters and their (parameter classification, parameter name) rows in the EV database.
+CATEGORICAL_PARAMETERS = {'manufacturer': ('basic vehicle', 'manufacturer'),
+                          'model_name': ('basic vehicle', 'model_name'), 'year': ('basic vehicle', 'year'),
+                          'trim': ('basic vehicle', 'trim'), 'motor_type': ('motor', 'type'),
+                          'cell_manufacturer': ('cell', 'battery_cell_manufacturer'),
+                          'cell_chem': ('cell', 'positive electrode chem.')}
+
+# Derived parameters of the EVTable that can be queried.
+_DERIVED_PARAMETERS = ('module_mass', 'pack_mass', 'pack_energy', 'pack_V_nom', 'curb_mass', 'max_mass', 'rot_mass',
+                       'equiv_mass', 'max_speed', 'P_max')
+
+
+class EVIndex:
+    """
+    EVIndex indexes the vehicles of an EVTable and their categorical parameters. The sorted index of a numeric
+    parameter is built on its first lookup. The missing categorical parameters are indexed as 'Unknown', as in the EV
+    classes. The queries return the matching row indices in ascending order, or the aliases of the matching vehicles,
+    e.g.,
+
+    index = get_index()
+    index.query(manufacturer="Tesla", pack_energy=(70.0, None), motor__L_max=(None, 450.0))
+    """
+
+    def __init__(self, table: EVTable, categories: Optional[dict] = None) -> None:
+        """
+        EVIndex constructor.
+        :param table: (EVTable) table of the vehicles
+        :param categories: (dict) categorical parameter values of each vehicle, keyed by the parameter name.
+        """
+        self.table = table
+        self._sorted = {}  # (sort order, sorted values) of the numeric parameters
+        self._hashed = {}  # rows of each value of the categorical parameters
+        for name, values in (categories or {}).items():
+            if len(values) != len(table):
+                raise ValueError(f"The categorical parameter {name} needs to have one entry per vehicle.")
+            rows = {}
+            for i, value in enumerate(values):
+                rows.setdefault('Unknown' if value is None else value, []).append(i)
+            self._hashed[name] = {value: np.array(index, dtype=np.intp) for value, index in rows.items()}
+
+    @classmethod
+    def from_database(cls, database_dir: str = definations.EV_DATA_DIR) -> 'EVIndex':
+        """
+        Indexes all the vehicles in the EV database.
+        :param database_dir: (str) location of the EV database file
+        :return: (EVIndex) index of the vehicles
+        """
+        database = get_database(file_dir=database_dir)
+        rows = {key: i for i, key in enumerate(database.index)}
+        categories = {name: database.text[rows[key]] for name, key in CATEGORICAL_PARAMETERS.items() if key in rows}
+        return cls(table=EVTable.from_database(database_dir=database_dir), categories=categories)
+
+    def _resolve(self, name: str) -> str:
+        """
+        Returns the full name of a parameter. Besides the full attribute paths, the categorical and the derived
+        parameter names, the unique trailing parts of the attribute paths (e.g., 'L_max' or 'gear_box.N') are accepted.
+        """
+        if (name in self._hashed) or (name in self.table.columns) or (name in _DERIVED_PARAMETERS):
+            return name
+        matches = [path for path in self.table.columns if path.endswith(f'.{name}')]
+        if len(matches) != 1:
+            raise ValueError(f"{name} is not a unique EV parameter name.")
+        return matches[0]
+
+    def _sorted_index(self, name: str) -> tuple[npt.ArrayLike, npt.ArrayLike]:
+        """
+        Returns the sort order and the sorted values of a numeric parameter. The np.nan values are sorted last.
+        """
+        if name not in self._sorted:
+            values = getattr(self.table, name) if name in _DERIVED_PARAMETERS else self.table[name]
+            order = np.argsort(values, kind='stable')
+            self._sorted[name] = (order, values[order])
+        return self._sorted[name]
+
+    def range(self, name: str, low: Optional[float] = None, high: Optional[float] = None) -> npt.ArrayLike:
+        """
+        Returns the rows of the vehicles whose numeric parameter is in the closed interval [low, high].
+        :param name: (str) parameter name
+        :param low: (float) lower bound. None for no lower bound.
+        :param high: (float) upper bound. None for no upper bound.
+        :return: (np.ndarray) row indices in ascending order
+        """
+        order, values = self._sorted_index(self._resolve(name))
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, np.inf if high is None else high, side='right')
+        return np.sort(order[start: stop])
+
+    def equals(self, name: str, value) -> npt.ArrayLike:
+        """
+        Returns the rows of the vehicles whose parameter is equal to the value, or to any of the values if a list, a
+        tuple of more than two values or a set is given.
+        :param name: (str) parameter name
+        :param value: parameter value(s)
+        :return: (np.ndarray) row indices in ascending order
+        """
+        name = self._resolve(name)
+        values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        if name in self._hashed:
+            rows = [self._hashed[name].get(v, np.empty(0, dtype=np.intp)) for v in values]
+        else:
+            rows = [self.range(name, low=v, high=v) for v in values]
+        if len(rows) == 1:
+            return rows[0]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+
+    def rows(self, where: Optional[dict] = None, **conditions) -> npt.ArrayLike:
+        """
+        Returns the rows of the vehicles that meet all the conditions. A condition is either a (low, high) tuple for a
+        range lookup of a numeric parameter, or a value (or a list or set of values) for an equality lookup. The
+        parameter names with dots are given in the where dictionary, or as keyword arguments with the dots replaced by
+        double underscores.
+        :param where: (dict) conditions keyed by the parameter name
+        :return: (np.ndarray) row indices in ascending order
+        """
+        conditions = {**{key.replace('__', '.'): value for key, value in conditions.items()}, **(where or {})}
+        matches = [self.range(name, *condition) if isinstance(condition, tuple) and len(condition) == 2
+                   else self.equals(name, condition) for name, condition in conditions.items()]
+        if not matches:
+            return np.arange(len(self.table))
+        matches.sort(key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), matches)
+
+    def query(self, where: Optional[dict] = None, **conditions) -> list:
+        """
+        Returns the aliases of the vehicles that meet all the conditions. See the rows method for the conditions.
+        :param where: (dict) conditions keyed by the parameter name
+        :return: (list) vehicle aliases
+        """
+        return [self.table.aliases[i] for i in self.rows(where, **conditions)]
+
+    def categories(self, name: str) -> Sequence:
+        """
+        Returns the values of a categorical parameter.
+        :param name: (str) parameter name
+        :return: (list) sorted parameter values
+        """
+        if name not in self._hashed:
+            raise ValueError(f"{name} is not a categorical EV parameter.")
+        return sorted(self._hashed[name])
+
+    def __repr__(self):
+        return f"EVIndex({len(self.table)} vehicles)"
+
+
+_indexes = {}  # indexes of the process and the databases they were built from, keyed by the absolute file location
+_lock = threading.Lock()
+
+
+def get_index(database_dir: str = definations.EV_DATA_DIR) -> EVIndex:
+    """
+    Returns the index of the vehicles in the EV database. It is rebuilt when the database is reloaded (see
+    database.get_database).
+    :param database_dir: (str) location of the EV database file
+    :return: (EVIndex) index of the vehicles
+    """
+    key = os.path.abspath(database_dir)
+    database = get_database(file_dir=database_dir)
+    with _lock:
+        cached = _indexes.get(key)
+        if (cached is None) or (cached[0] is not database):
+            cached = (database, EVIndex.from_database(database_dir=database_dir))
+            _indexes[key] = cached
+        return cached[1]
@@ -0,0 +1,120 @@
+"""
+This module contains the functionalities for estimating the driving range of an electric vehicle by repeating a drive
+cycle until its battery pack is empty. Once the repetitions become periodic, i.e., a repetition starts from the same
+vehicle state as the previous one, every repetition draws the same charge and covers the same distance, and the
+remaining repetitions are extrapolated instead of simulated.
+"""
+
+__all__ = ['RangeEstimate', 'usable_charge', 'estimate_range']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from EV_sim.ev import EV
+from EV_sim.drivecycles import DriveCycle
+from EV_sim.extern_conditions import ExternalConditions
+from EV_sim.kernel import SEGMENT_RTOL, SEGMENT_ATOL, simulate_segments
+from EV_sim.sol import Solution
+
+
+@dataclass
+class RangeEstimate:
+    """
+    Class object that stores the results of a range estimation.
+    """
+    range_km: float  # distance driven until the battery pack is empty, km
+    repetitions: float  # number of drive cycle repetitions until the battery pack is empty, including the fraction
+    simulated_repetitions: int  # number of drive cycle repetitions that were simulated
+
+
+def usable_charge(ev: EV) -> float:
+    """
+    Calculates the charge that can be drawn from the battery pack between its full and empty SOC. The SOC limits in
+    the EV database are either in percent or fractions, and the ones larger than one are treated as percent.
+    :param ev: (EV) EV object
+    :return: (float) usable charge, A s
+    """
+    scale = 1 / 100 if ev.pack.SOC_full > 1 else 1.0
+    return (ev.pack.SOC_full - ev.pack.SOC_empty) * scale * ev.pack.module_cap * 3600
+
+
+def _depletion_distance(sol: Solution, charge: float) -> tuple[float, float]:
+    """
+    Finds the time step of a repetition where the charge drawn in the repetition first reaches the given charge.
+    :param sol: (Solution) simulation results of the repetition, starting from zero distance and SOC
+    :param charge: (float) remaining charge at the start of the repetition, A s
+    :return: (tuple) distance covered in the repetition until the pack is empty, km, and the fraction of the
+    repetition, or (nan, nan) if the pack does not become empty in the repetition.
+    """
+    drawn = -sol.battery_SOC
+    reached = np.nonzero(drawn >= charge)[0]
+    if len(reached) == 0:
+        return math.nan, math.nan
+    k = int(reached[0])
+    prev_drawn, prev_distance = (drawn[k - 1], sol.distance[k - 1]) if k > 0 else (0.0, 0.0)
+    frac = (charge - prev_drawn) / (drawn[k] - prev_drawn)
+    return float(prev_distance + frac * (sol.distance[k] - prev_distance)), float((k + frac) / len(sol.t))
+
+
+def estimate_range(ev: EV, cycle: DriveCycle, cond: ExternalConditions,
+                   max_simulated_repetitions: int = 100) -> RangeEstimate:
+    """
+    Estimates the driving range of the EV by repeating the drive cycle from a full battery pack until it reaches the
+    empty SOC of the pack. The repetitions are simulated until one ends in the vehicle state it started from (e.g.,
+    at standstill), which is usually after one or two repetitions. From then on, each repetition draws the same charge
+    and covers the same distance, so the number of full repetitions is calculated analytically and only the time steps
+    of the last partial repetition are searched for the time step where the pack is empty.
+    :param ev: (EV) EV object
+    :param cycle: (DriveCycle) drive cycle that is repeated
+    :param cond: (ExternalConditions) external conditions
+    :param max_simulated_repetitions: (int) maximum number of repetitions that are simulated while they are not
+    periodic.
+    :return: (RangeEstimate) driving range and the number of repetitions
+    """
+    if not isinstance(ev, EV):
+        raise TypeError("ev needs to be a EV object.")
+    if not isinstance(cycle, DriveCycle):
+        raise TypeError("cycle needs to be DriveCycle object.")
+    if not isinstance(cond, ExternalConditions):
+        raise TypeError("cond needs to be External condition object.")
+
+    # The repetitions share a time array that starts at zero, and the first time step of each repetition has the same
+    # size as the one of the drive cycle.
+    t = cycle.t - cycle.t[0]
+    prev_time = t[0] - (t[1] - t[0])
+    des_speed = np.minimum(cycle.speed_kmph, ev.kernel_params().max_speed) / 3.6
+    charge = usable_charge(ev)
+    drawn, distance = 0.0, 0.0  # charge drawn, A s, and distance, km, before the current repetition
+    speed, motor_speed = 0.0, 0.0  # state at the start of the current repetition
+    for i in range(max_simulated_repetitions):
+        sol = simulate_segments(ev=ev, t=t, des_speed=des_speed, grade_angle=cond.road_grade_angle, rho=cond.rho,
+                                road_force=cond.road_force, prev_time=prev_time,
+                                channels=('motor_speed', 'actual_speed', 'distance', 'battery_SOC'),
+                                init_speed=speed, init_motor_speed=motor_speed)
+        rep_distance, rep_frac = _depletion_distance(sol, charge - drawn)
+        if not math.isnan(rep_distance):
+            return RangeEstimate(range_km=distance + rep_distance, repetitions=i + rep_frac,
+                                 simulated_repetitions=i + 1)
+        rep_drawn, rep_covered = -float(sol.battery_SOC[-1]), float(sol.distance[-1])
+        periodic = np.isclose(sol.actual_speed[-1], speed, rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL) and \
+            np.isclose(sol.motor_speed[-1], motor_speed, rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL)
+        drawn, distance = drawn + rep_drawn, distance + rep_covered
+        if periodic:
+            if rep_drawn <= 0:
+                raise ValueError("The drive cycle does not draw charge from the battery pack.")
+            full_repetitions = math.floor((charge - drawn) / rep_drawn)
+            drawn, distance = drawn + full_repetitions * rep_drawn, distance + full_repetitions * rep_covered
+            # the repetition after the full ones is the same as the simulated one
+            rep_distance, rep_frac = _depletion_distance(sol, charge - drawn)
+            if math.isnan(rep_distance):  # round-off of the extrapolated charge
+                rep_distance, rep_frac = rep_covered, 1.0
+            return RangeEstimate(range_km=distance + rep_distance, repetitions=i + 1 + full_repetitions + rep_frac,
+                                 simulated_repetitions=i + 1)
+        speed, motor_speed = float(sol.actual_speed[-1]), float(sol.motor_speed[-1])
+    raise ValueError(f"The drive cycle repetitions did not become periodic within {max_simulated_repetitions} "
+                     f"repetitions.")
@@ -0,0 +1,244 @@
+"""
+This module contains the classes and functionalities to run many vehicle dynamics simulations in parallel processes.
+The worker processes write the simulation results directly into a shared memory block, so that they do not need to be
+pickled on their way back to the parent process. The EV parameters and the drive cycles are sent to each worker
+process once, when it starts, and the tasks only refer to them by their index.
+"""
+
+__all__ = ['ScenarioRunner']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.ev import EVKernelParams
+from EV_sim.kernel import _constants, simulate_segments, simulate_step
+from EV_sim.model import VehicleDynamics
+from EV_sim.sol import SOLUTION_CHANNELS, select_channels, Solution
+from EV_sim.utils.constants import PhysicsConstants
+
+_worker = {}  # data shared by the tasks of a worker process, set by _init_worker
+
+
+def _init_worker(shm_name: str, size: int, params: list, cycles: list, conditions: list, engine: str,
+                 channels: tuple) -> None:
+    """
+    Initializer of the worker processes. It stores the data shared by the tasks, so that it is sent to a worker process
+    once instead of with every chunk of scenarios.
+    :param shm_name: (str) name of the shared memory block
+    :param size: (int) number of float64 elements in the shared memory block
+    :param params: (list) EVKernelParams of the distinct EVs
+    :param cycles: (list) (time, s, desired speed, km/h) array pairs of the distinct drive cycles
+    :param conditions: (list) (road grade angle, air density, road force) tuples of the distinct external conditions
+    :param engine: (str) simulation engine, 'loop' or 'segment'
+    :param channels: (tuple) names of the simulation result channels to write
+    """
+    _worker.update(shm_name=shm_name, size=size, params=params, cycles=cycles, conditions=conditions, engine=engine,
+                   channels=channels)
+
+
+def _simulate_steps(p: EVKernelParams, t: npt.ArrayLike, des_speed: npt.ArrayLike, grade_angle, rho: float,
+                    road_force: float, prev_time: float, out: Solution) -> None:
+    """
+    Steps through the drive cycle one time step at a time with kernel.simulate_step, whose results are identical to
+    the ones of the loop engine, and writes the results of the channels of out to it.
+    :param p: (EVKernelParams) snapshot of the EV parameters
+    :param t: (np.ndarray) time array, s
+    :param des_speed: (np.ndarray) desired speed, m/s
+    :param grade_angle: (float or np.ndarray) road grade angle, rad
+    :param rho: (float) air density, kg/m^3
+    :param road_force: (float) road force, N
+    :param prev_time: (float) time before the first time step, s
+    :param out: (Solution) Solution object the results are written to
+    """
+    c = _constants(ev=p, rho=rho, road_force=road_force)
+    roll_F = np.broadcast_to(c['max_mass'] * PhysicsConstants.g * np.sin(grade_angle), (len(t),))
+    prev_speed, prev_motor_speed, prev_distance, prev_SOC = 0.0, 0.0, 0.0, 0.0
+    values = []
+    for t_k, des_speed_k, roll_F_k in zip(t.tolist(), des_speed.tolist(), roll_F.tolist()):
+        step = simulate_step(c, des_speed=des_speed_k, dt=t_k - prev_time, roll_F=roll_F_k, prev_speed=prev_speed,
+                             prev_motor_speed=prev_motor_speed, prev_distance=prev_distance, prev_SOC=prev_SOC)
+        values.append(step)
+        prev_time = t_k
+        prev_motor_speed, prev_speed, prev_distance, prev_SOC = step[11], step[12], step[14], step[20]
+    out.t = t
+    out.data[1:] = np.array(values)[:, [SOLUTION_CHANNELS.index(name) for name in out.channels]].T
+
+
+def _run_chunk(tasks: list) -> list:
+    """
+    Worker function that simulates a chunk of scenarios and writes their results into the shared memory block.
+    :param tasks: (list) list of (scenario index, offset, EV index, drive cycle index, external conditions index)
+    tuples, where the indices refer to the data passed to _init_worker
+    :return: (list) indices of the simulated scenarios
+    """
+    channels = _worker['channels']
+    shm = shared_memory.SharedMemory(name=_worker['shm_name'])
+    buffer = np.ndarray((_worker['size'],), dtype=np.float64, buffer=shm.buf)
+    out = None
+    try:
+        for index, offset, ev_index, cycle_index, cond_index in tasks:
+            p = _worker['params'][ev_index]
+            t, speed_kmph = _worker['cycles'][cycle_index]
+            grade_angle, rho, road_force = _worker['conditions'][cond_index]
+            # the results are written to a view of the scenario's part of the shared memory block
+            out = Solution.from_buffer(veh_alias=p.alias_name,
+                                       data=buffer[offset: offset + (1 + len(channels)) * len(t)].reshape(
+                                           1 + len(channels), len(t)), channels=channels)
+            # as VehicleDynamics.des_speed and VehicleDynamics.init_cond
+            des_speed = np.minimum(speed_kmph, p.max_speed) / 3.6
+            prev_time = 2 * t[0] - t[1]
+            if _worker['engine'] == "segment":
+                simulate_segments(ev=p, t=t, des_speed=des_speed, grade_angle=grade_angle, rho=rho,
+                                  road_force=road_force, prev_time=prev_time, channels=channels, out=out)
+            else:
+                _simulate_steps(p, t=t, des_speed=des_speed, grade_angle=grade_angle, rho=rho, road_force=road_force,
+                                prev_time=prev_time, out=out)
+    finally:
+        del buffer, out
+        shm.close()
+    return [task[0] for task in tasks]
+
+
+class ScenarioRunner:
+    """
+    ScenarioRunner simulates a list of (EV, DriveCycle, ExternalConditions) scenarios using a pool of worker processes.
+    The results of all the scenarios are stored in one preallocated shared memory block, and the Solution objects
+    returned by the runner are views of this block. Hence, they need to be copied if they are used after the runner is
+    closed. It is recommended to use the runner as a context manager, e.g.,
+
+    with ScenarioRunner(scenarios, max_workers=4) as runner:
+        for index, sol in runner.run(ordered=False):
+            ...
+
+    Note that on platforms that spawn new processes (e.g., Windows), the runner needs to be used under the
+    if __name__ == '__main__' guard.
+    """
+
+    def __init__(self, scenarios: list, max_workers: Optional[int] = None, chunksize: int = 1,
+                 engine: str = "segment", channels: Optional[Sequence[str]] = None) -> None:
+        """
+        ScenarioRunner constructor.
+        :param scenarios: (list) list of (EV, DriveCycle, ExternalConditions) tuples.
+        :param max_workers: (int) number of worker processes. Defaults to the number of processors on the machine.
+        :param chunksize: (int) number of scenarios sent to a worker process at a time.
+        :param engine: (str) simulation engine used by the worker processes, 'loop' or 'segment'.
+        :param channels: (Sequence) names of the simulation result channels to keep. None keeps all the channels.
+        """
+        self.models = [VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle, external_condition_obj=cond)
+                       for ev, cycle, cond in scenarios]
+        if len(self.models) == 0:
+            raise ValueError("ScenarioRunner needs at least one scenario.")
+
+        if (max_workers is not None) and ((not isinstance(max_workers, int)) or (max_workers < 1)):
+            raise ValueError("max_workers needs to be a positive integer or None.")
+        self.max_workers = max_workers
+
+        if (not isinstance(chunksize, int)) or (chunksize < 1):
+            raise ValueError("chunksize needs to be a positive integer.")
+        self.chunksize = chunksize
+
+        if engine not in ("loop", "segment"):
+            raise ValueError(f"Unknown simulation engine '{engine}'. Use 'loop' or 'segment'.")
+        self.engine = engine
+        self.channels = select_channels(channels)
+
+        self.lengths = np.array([len(model.DriveCycle.t) for model in self.models])
+        self.offsets = np.concatenate(([0], np.cumsum((1 + len(self.channels)) * self.lengths)[:-1]))
+        self.size = int((1 + len(self.channels)) * self.lengths.sum())
+        self._shm = None
+        self._buffer = None
+
+    def open(self) -> None:
+        """
+        Allocates the shared memory block for the simulation results.
+        """
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=self.size * np.dtype(np.float64).itemsize)
+            self._buffer = np.ndarray((self.size,), dtype=np.float64, buffer=self._shm.buf)
+
+    def close(self) -> None:
+        """
+        Releases the shared memory block. The Solution objects returned by the runner should be copied beforehand if
+        they are needed afterwards.
+        """
+        if self._shm is not None:
+            self._buffer = None
+            try:
+                self._shm.close()
+            except BufferError:
+                pass  # Solution views are still referenced, the memory is unmapped once they are garbage collected.
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def solution(self, index: int) -> Solution:
+        """
+        Returns the simulation results of a scenario. The arrays of the Solution object are views of the shared memory
+        block.
+        :param index: (int) scenario index
+        :return: (Solution) Solution object of the scenario
+        """
+        length = self.lengths[index]
+        offset = self.offsets[index]
+        block = self._buffer[offset: offset + (1 + len(self.channels)) * length].reshape(1 + len(self.channels), length)
+        return Solution.from_buffer(veh_alias=self.models[index].EV.alias_name, data=block, channels=self.channels)
+
+    def _worker_data(self) -> tuple[list, list, list, list]:
+        """
+        Collects the data sent to the worker processes. The EV, DriveCycle and ExternalConditions objects shared by
+        several scenarios are only included once.
+        :return: (tuple) EVKernelParams of the distinct EVs, (time, desired speed in km/h) pairs of the distinct drive
+        cycles, (road grade angle, air density, road force) tuples of the distinct external conditions, and the
+        (scenario index, offset, EV index, drive cycle index, external conditions index) task of each scenario
+        """
+        positions = {}  # positions of the distinct objects in their lists, keyed by the object ids
+        params, cycles, conditions, tasks = [], [], [], []
+        for i, model in enumerate(self.models):
+            if id(model.EV) not in positions:
+                positions[id(model.EV)] = len(params)
+                params.append(model.EV.kernel_params())
+            if id(model.DriveCycle) not in positions:
+                positions[id(model.DriveCycle)] = len(cycles)
+                cycles.append((model.DriveCycle.t, model.DriveCycle.speed_kmph))
+            if id(model.ExtCond) not in positions:
+                positions[id(model.ExtCond)] = len(conditions)
+                conditions.append((model.ExtCond.road_grade_angle, model.ExtCond.rho, model.ExtCond.road_force))
+            tasks.append((i, int(self.offsets[i]), positions[id(model.EV)], positions[id(model.DriveCycle)],
+                          positions[id(model.ExtCond)]))
+        return params, cycles, conditions, tasks
+
+    def run(self, ordered: bool = True) -> Iterator[tuple[int, Solution]]:
+        """
+        Simulates all the scenarios and yields their results.
+        :param ordered: (bool) If True, the results are yielded in the order of the scenarios. Otherwise, they are
+        yielded as soon as their chunk has been simulated.
+        :return: (Iterator) iterator of (scenario index, Solution) tuples.
+        """
+        self.open()
+        params, cycles, conditions, tasks = self._worker_data()
+        chunks = [tasks[start: start + self.chunksize] for start in range(0, len(tasks), self.chunksize)]
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(self._shm.name, self.size, params, cycles, conditions, self.engine,
+                                           self.channels)) as executor:
+            futures = [executor.submit(_run_chunk, chunk) for chunk in chunks]
+            for future in (futures if ordered else as_completed(futures)):
+                for index in future.result():
+                    yield index, self.solution(index)
+
+    def __repr__(self):
+        return f"ScenarioRunner({len(self.models)} scenarios, max_workers={self.max_workers}, " \
+               f"chunksize={self.chunksize}, engine='{self.engine}')"
@@ -2,51 +2,234 @@
 This modules contains the classes and functionailities for storing the simulation results.
 """
 
-__all__ = ['Solution']
+__all__ = ['SOLUTION_CHANNELS', 'select_channels', 'SimState', 'Solution', 'BatchSolution']
 
 __authors__ = "Moin Ahmed"
 __copyright__ = 'Copyright 2023 by EV_sim. All rights reserved.'
 
-from dataclasses import dataclass
+import json
+import os
+from dataclasses import asdict, dataclass
 
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 import numpy.typing as npt
-from typing import Optional
+from typing import Optional, Sequence
+
+
+# Names of the simulation result arrays stored in the Solution, in the order used by the BatchSolution's data tensor.
+# The speeds are in m/s (actual_speed_kmph in km/h), the powers in kW and the distance in km.
+SOLUTION_CHANNELS = ('des_acc', 'des_acc_F', 'aero_F', 'roll_grade_F', 'demand_torque', 'max_torque', 'limit_regen',
+                     'limit_torque', 'motor_torque', 'actual_acc_F', 'actual_acc', 'motor_speed', 'actual_speed',
+                     'actual_speed_kmph', 'distance', 'demand_power', 'limit_power', 'battery_demand', 'current',
+                     'cell_current', 'battery_SOC')
+
+
+def select_channels(channels: Optional[Sequence[str]] = None) -> tuple:
+    """
+    Validates the requested simulation result channels and returns them in the order of SOLUTION_CHANNELS.
+    :param channels: (Sequence) names of the requested channels. None requests all the channels.
+    :return: (tuple) requested channel names
+    """
+    if channels is None:
+        return SOLUTION_CHANNELS
+    if isinstance(channels, str):
+        channels = (channels,)
+    unknown = set(channels) - set(SOLUTION_CHANNELS)
+    if unknown:
+        raise ValueError(f"{sorted(unknown)} are not simulation result channels.")
+    return tuple(name for name in SOLUTION_CHANNELS if name in channels)
+
+
+@dataclass
+class SimState:
+    """
+    Class object that stores the state of a simulation before the time step with the given index, i.e., the variables
+    of the previous time step that the next time step depends on. A simulation can be resumed from, or branched off
+    at, this state.
+    """
+    index: int  # index of the next time step to be simulated
+    prev_time: float  # time at the previous time step, s
+    prev_speed: float = 0.0  # speed at the previous time step, m/s
+    prev_motor_speed: float = 0.0  # motor speed at the previous time step, rpm
+    prev_distance: float = 0.0  # distance at the previous time step, km
+    prev_SOC: float = 0.0  # battery SOC at the previous time step
+
+    def __post_init__(self):
+        if (not isinstance(self.index, (int, np.integer))) or (self.index < 0):
+            raise ValueError("The index of the simulation state needs to be a non-negative integer.")
+        self.index = int(self.index)
+        for name in ('prev_time', 'prev_speed', 'prev_motor_speed', 'prev_distance', 'prev_SOC'):
+            setattr(self, name, float(getattr(self, name)))
+
+    @classmethod
+    def from_solution(cls, sol: 'Solution', index: int) -> 'SimState':
+        """
+        Creates the simulation state before the time step with the given index from the simulation results. The
+        Solution object needs to contain the actual_speed, motor_speed, distance and battery_SOC channels.
+        :param sol: (Solution) simulation results
+        :param index: (int) index of the next time step to be simulated, in the range [1, len(sol.t)].
+        :return: (SimState) simulation state
+        """
+        missing = {'actual_speed', 'motor_speed', 'distance', 'battery_SOC'} - set(sol.channels)
+        if missing:
+            raise ValueError(f"The simulation state requires the {sorted(missing)} channels.")
+        if not 1 <= index <= len(sol.t):
+            raise ValueError("The index of the simulation state needs to be in the range [1, number of time steps].")
+        return cls(index=index, prev_time=sol.t[index - 1], prev_speed=sol.actual_speed[index - 1],
+                   prev_motor_speed=sol.motor_speed[index - 1], prev_distance=sol.distance[index - 1],
+                   prev_SOC=sol.battery_SOC[index - 1])
+
+    def save(self, file_name: str) -> None:
+        """
+        Saves the simulation state to a JSON file. The file is written to a temporary file first and then renamed,
+        so that an interrupted save does not corrupt an existing checkpoint.
+        :param file_name: (str) file name
+        """
+        tmp_file_name = f"{file_name}.tmp"
+        with open(tmp_file_name, 'w') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_file_name, file_name)
+
+    @classmethod
+    def load(cls, file_name: str) -> 'SimState':
+        """
+        Loads the simulation state saved by the save method.
+        :param file_name: (str) file name
+        :return: (SimState) simulation state
+        """
+        with open(file_name) as f:
+            return cls(**json.load(f))
 
 
 @dataclass
 class Solution:
     """
     Class object that stores the simulation results from the model. Furthermore, it contains methods to plot the
-    results.
+    results. Only the requested channels are stored, and the other channels are not attributes of the instance.
+
+    The time array and the channels are rows of a single C-contiguous 2-D array, data, of shape (1 + number of
+    channels, number of time steps), and the t and channel attributes are views of its rows. Assigning an array to one
+    of these attributes copies it into the data array. Hence, the whole result can be copied, pickled, saved or memory
+    mapped as one buffer.
     """
     veh_alias: Optional[str]
     t: Optional[npt.ArrayLike]
+    channels: Optional[Sequence[str]] = None
 
     def __post_init__(self):
+        self.channels = select_channels(self.channels)
+        self.data = None
         if isinstance(self.t, np.ndarray):
-            self.des_acc = np.zeros(len(self.t))
-            self.des_acc_F = np.zeros(len(self.t))
-            self.aero_F = np.zeros(len(self.t))
-            self.roll_grade_F = np.zeros(len(self.t))
-            self.demand_torque = np.zeros(len(self.t))
-            self.max_torque = np.zeros(len(self.t))
-            self.limit_regen = np.zeros(len(self.t))
-            self.limit_torque = np.zeros(len(self.t))
-            self.motor_torque = np.zeros(len(self.t))
-            self.actual_acc_F = np.zeros(len(self.t))
-            self.actual_acc = np.zeros(len(self.t))
-            self.motor_speed = np.zeros(len(self.t))
-            self.actual_speed = np.zeros(len(self.t))  # actual speed, m/s
-            self.actual_speed_kmph = np.zeros(len(self.t))  # actual speed, km/h
-            self.distance = np.zeros(len(self.t))
-            self.demand_power = np.zeros(len(self.t))
-            self.limit_power = np.zeros(len(self.t))
-            self.battery_demand = np.zeros(len(self.t))
-            self.current = np.zeros(len(self.t))
-            self.cell_current = np.zeros(len(self.t))
-            self.battery_SOC = np.zeros(len(self.t))
+            data = np.zeros((1 + len(self.channels), len(self.t)))
+            data[0] = self.t
+            self._attach(data)
+
+    def _attach(self, data: npt.ArrayLike) -> None:
+        """
+        Sets the data array and the t and channel attributes as views of its rows.
+        """
+        object.__setattr__(self, 'data', data)
+        for i, name in enumerate(('t',) + self.channels):
+            object.__setattr__(self, name, data[i])
+
+    def __setattr__(self, name, value):
+        if (self.__dict__.get('data') is not None) and (name == 't' or name in self.channels):
+            self.data[(('t',) + self.channels).index(name)] = value
+        else:
+            super().__setattr__(name, value)
+
+    def __getstate__(self):
+        return {'veh_alias': self.veh_alias, 'channels': self.channels, 'data': self.data, 't': self.t}
+
+    def __setstate__(self, state):
+        object.__setattr__(self, 'veh_alias', state['veh_alias'])
+        object.__setattr__(self, 'channels', state['channels'])
+        if state['data'] is not None:
+            self._attach(state['data'])
+        else:
+            object.__setattr__(self, 'data', None)
+            object.__setattr__(self, 't', state['t'])
+
+    @classmethod
+    def from_buffer(cls, veh_alias: Optional[str], data: npt.ArrayLike,
+                    channels: Optional[Sequence[str]] = None) -> 'Solution':
+        """
+        Creates a Solution object whose attributes are views of an existing array, without copying it.
+        :param veh_alias: (str) vehicle alias
+        :param data: (np.ndarray) array of shape (1 + number of channels, number of time steps) whose first row is the
+        time array and the remaining rows are the channels.
+        :param channels: (Sequence) channel names of the rows after the time array. None means all the channels.
+        :return: (Solution) Solution object
+        """
+        sol = cls(veh_alias=veh_alias, t=None, channels=channels)
+        if (np.ndim(data) != 2) or (len(data) != 1 + len(sol.channels)):
+            raise ValueError("data needs to be a 2-D array with one row for the time and one for each channel.")
+        sol._attach(data)
+        return sol
+
+    def copy(self) -> 'Solution':
+        """
+        Returns a copy of the Solution object. The data array is copied in one go.
+        :return: (Solution) copied Solution object
+        """
+        return Solution.from_buffer(veh_alias=self.veh_alias, data=self.data.copy(), channels=self.channels)
+
+    def _structured_dtype(self) -> np.dtype:
+        """
+        Structured data type with one field per row of the data array. The memory layout of a scalar of this data type
+        is the same as the one of the data array. The vehicle alias is stored as the title of the time field.
+        """
+        names = ['t'] + list(self.channels)
+        return np.dtype({'names': names, 'formats': [(np.float64, (self.data.shape[1],))] * len(names),
+                         'titles': [self.veh_alias] + [None] * len(self.channels)})
+
+    def save(self, file) -> None:
+        """
+        Saves the simulation results to a .npy file. The data array is written in a single write as a structured array
+        whose fields are named after the time and the channels, so that the file is self-describing.
+        :param file: (str or file) file name or file object
+        """
+        data = np.ascontiguousarray(self.data)
+        np.save(file, data.reshape(-1).view(self._structured_dtype()))
+
+    @classmethod
+    def load(cls, file, mmap_mode: Optional[str] = 'r') -> 'Solution':
+        """
+        Loads the simulation results saved by the save method. By default, the file is memory mapped, so that only the
+        parts of the results that are accessed are read from disk.
+        :param file: (str or file) file name or file object
+        :param mmap_mode: (str) memory map mode passed to np.load, or None to read the whole file into memory.
+        :return: (Solution) Solution object whose arrays are views of the loaded array.
+        """
+        arr = np.load(file, mmap_mode=mmap_mode)
+        names = arr.dtype.names
+        if (names is None) or (names[0] != 't'):
+            raise ValueError("The file does not contain simulation results saved by Solution.save.")
+        veh_alias = arr.dtype.fields['t'][2] if len(arr.dtype.fields['t']) > 2 else None
+        data = arr.view(np.float64).reshape(len(names), -1)
+        return cls.from_buffer(veh_alias=veh_alias, data=data, channels=names[1:])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the simulation results as a pandas DataFrame with the time and the channels as columns. The DataFrame
+        shares the data array instead of copying it.
+        :return: (pd.DataFrame) simulation results
+        """
+        return pd.DataFrame(self.data.T, columns=('t',) + self.channels, copy=False)
+
+    def to_arrow(self):
+        """
+        Returns the simulation results as a pyarrow Table with the time and the channels as columns. The columns are
+        views of the rows of the data array. Requires the optional pyarrow package.
+        :return: (pyarrow.Table) simulation results
+        """
+        try:
+            import pyarrow as pa
+        except ModuleNotFoundError as err:
+            raise ModuleNotFoundError("Solution.to_arrow requires the pyarrow package.") from err
+        return pa.table({name: pa.array(row) for name, row in zip(('t',) + self.channels, self.data)})
 
     def plot_battery_demand(self):
         """
@@ -85,3 +268,48 @@ class Solution:
 
         plt.tight_layout()
         plt.show()
+
+
+@dataclass
+class BatchSolution:
+    """
+    Class object that stores the simulation results of a batch of scenarios (vehicle, drive cycle and external
+    conditions combinations) in a single tensor of shape (scenario, 1 + channel, time), where the first row along the
+    channel axis is the time array. The drive cycles of different lengths are padded to the longest one, and the channels
+    at the padded time steps are filled with np.nan.
+    """
+    veh_alias: list  # vehicle alias of each scenario
+    drive_cycle_name: list  # drive cycle name of each scenario
+    lengths: npt.ArrayLike  # number of time steps of the drive cycle of each scenario
+    data: npt.ArrayLike  # time and simulation results of shape (scenario, 1 + channel, time)
+    channels: tuple = SOLUTION_CHANNELS  # channel names along the second axis of data, after the time
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def t(self) -> npt.ArrayLike:
+        """
+        Padded time array of each scenario, s.
+        :return: (np.ndarray) view of the time arrays of shape (scenario, time)
+        """
+        return self.data[:, 0, :]
+
+    def channel(self, name: str) -> npt.ArrayLike:
+        """
+        Returns the results of a channel for all scenarios.
+        :param name: (str) channel name, e.g., 'current'
+        :return: (np.ndarray) view of the results of shape (scenario, time)
+        """
+        if name not in self.channels:
+            raise ValueError(f"{name} is not a simulation result channel.")
+        return self.data[:, 1 + self.channels.index(name), :]
+
+    def __getitem__(self, index: int) -> Solution:
+        """
+        Returns the simulation results of a scenario as a Solution object. Its arrays are views of the data tensor.
+        :param index: (int) scenario index
+        :return: (Solution) Solution object of the scenario
+        """
+        return Solution.from_buffer(veh_alias=self.veh_alias[index], data=self.data[index, :, :self.lengths[index]],
+                                    channels=self.channels)
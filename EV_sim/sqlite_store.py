@@ -0,0 +1,210 @@
+"""
+This module contains the classes and functionalities for storing the EV database in a SQLite database file. The
+parameters are stored in a normalized table with one (alias, classification, parameter, value) row per vehicle
+parameter, so that a vehicle is added or looked up without reading or rewriting the other vehicles. The EVFromDatabase
+class uses the SQLite database when its database_dir is a .db, .sqlite or .sqlite3 file.
+"""
+
+__all__ = ['SQLITE_SUFFIXES', 'EVParameterStore', 'is_sqlite_file', 'import_csv', 'get_store', 'close_stores']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import math
+import os
+import pathlib
+import sqlite3
+import threading
+
+from EV_sim.config import definations
+from EV_sim.database import EVDatabase
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ev_parameters (
+    alias TEXT NOT NULL,
+    classification TEXT NOT NULL,
+    parameter TEXT NOT NULL,
+    value TEXT,
+    UNIQUE (alias, classification, parameter)
+);
+CREATE INDEX IF NOT EXISTS ev_parameters_by_parameter ON ev_parameters (classification, parameter, value);
+"""
+
+# The SQL statements are constant strings, so that the sqlite3 module reuses their prepared statements.
+_SELECT_VEHICLE = "SELECT classification, parameter, value FROM ev_parameters WHERE alias = ? ORDER BY rowid"
+_SELECT_ALIASES = "SELECT alias FROM ev_parameters GROUP BY alias ORDER BY MIN(rowid)"
+_DELETE_VEHICLE = "DELETE FROM ev_parameters WHERE alias = ?"
+_INSERT_PARAMETER = "INSERT INTO ev_parameters (alias, classification, parameter, value) VALUES (?, ?, ?, ?)"
+
+
+def is_sqlite_file(file_dir: str) -> bool:
+    """
+    Checks if a database location is a SQLite database file, by its suffix.
+    :param file_dir: (str) location of the database file
+    :return: (bool) True if the file is a SQLite database file
+    """
+    return os.path.splitext(file_dir)[1].lower() in SQLITE_SUFFIXES
+
+
+class EVParameterStore:
+    """
+    EVParameterStore stores the EV parameters in a SQLite database file. It keeps one connection open, which is
+    shared by all its lookups and is guarded by a lock, so that the store can be shared by threads. Its vehicle method
+    and aliases attribute are the same as the ones of the EVDatabase class.
+    """
+
+    def __init__(self, file_dir: str, create: bool = False) -> None:
+        """
+        EVParameterStore constructor. The table is created if it does not exist.
+        :param file_dir: (str) location of the SQLite database file
+        :param create: (bool) If True, the database file is created if it does not exist. Otherwise, a missing database
+        file raises a FileNotFoundError.
+        """
+        self.file_dir = file_dir
+        self._lock = threading.Lock()
+        if create:
+            self._connection = sqlite3.connect(file_dir, check_same_thread=False)
+        else:
+            uri = f"{pathlib.Path(os.path.abspath(file_dir)).as_uri()}?mode=rw"
+            try:
+                self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            except sqlite3.OperationalError as err:
+                raise FileNotFoundError(f"{file_dir} does not exist. Use import_csv to create a SQLite EV "
+                                        f"database.") from err
+        self._connection.executescript(_SCHEMA)
+        self._vehicles = {}  # parameters of the vehicles that have been looked up
+        self._aliases = None
+
+    @property
+    def aliases(self) -> list:
+        """
+        Vehicle aliases, in the order the vehicles were added
+        """
+        with self._lock:
+            if self._aliases is None:
+                self._aliases = [row[0] for row in self._connection.execute(_SELECT_ALIASES)]
+            return self._aliases
+
+    def vehicle(self, alias_name: str) -> dict:
+        """
+        Returns the parameters of a vehicle, grouped by the parameter classification, e.g.,
+        store.vehicle("Volt_2017")["wheel"]["radius [m]"]. The entries are texts, and the empty entries are np.nan.
+        :param alias_name: (str) vehicle alias
+        :return: (dict) dictionaries of the parameters keyed by the parameter classification
+        """
+        with self._lock:
+            if alias_name not in self._vehicles:
+                params = {}
+                for classification, name, value in self._connection.execute(_SELECT_VEHICLE, (alias_name,)):
+                    params.setdefault(classification, {})[name] = math.nan if value is None else value
+                if not params:
+                    raise Exception(f"{alias_name} not in EV dataset")
+                self._vehicles[alias_name] = params
+            return self._vehicles[alias_name]
+
+    def add_vehicles(self, vehicles: dict) -> None:
+        """
+        Adds the vehicles to the store in a single transaction. The vehicles that are already in the store are
+        replaced.
+        :param vehicles: (dict) parameters of the vehicles keyed by their alias. The parameters are grouped by the
+        parameter classification, as returned by the vehicle method. The np.nan and None entries are stored as empty.
+        """
+        rows = [(alias, classification, name, _to_text(value))
+                for alias, params in vehicles.items()
+                for classification, group in params.items()
+                for name, value in group.items()]
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(_DELETE_VEHICLE, [(alias,) for alias in vehicles])
+                self._connection.executemany(_INSERT_PARAMETER, rows)
+            for alias in vehicles:
+                self._vehicles.pop(alias, None)
+            self._aliases = None
+
+    def add_vehicle(self, alias_name: str, params: dict) -> None:
+        """
+        Adds a vehicle to the store. If the vehicle is already in the store, it is replaced.
+        :param alias_name: (str) vehicle alias
+        :param params: (dict) dictionaries of the parameters keyed by the parameter classification
+        """
+        self.add_vehicles({alias_name: params})
+
+    def remove_vehicle(self, alias_name: str) -> None:
+        """
+        Removes a vehicle from the store.
+        :param alias_name: (str) vehicle alias
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute(_DELETE_VEHICLE, (alias_name,))
+            self._vehicles.pop(alias_name, None)
+            self._aliases = None
+
+    def close(self) -> None:
+        """
+        Closes the connection to the database file.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def __repr__(self):
+        return f"EVParameterStore('{self.file_dir}')"
+
+
+def _to_text(value) -> str:
+    """
+    Converts a parameter value to the text that is stored, or None if it is empty. The integral floats are stored
+    without the decimal point, as they are in the .csv file, so that the counts are read back with int.
+    """
+    if (value is None) or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def import_csv(file_dir: str, csv_file: str = definations.EV_DATA_DIR) -> EVParameterStore:
+    """
+    Imports all the vehicles of an EV database .csv file into a SQLite database file in a single transaction. The
+    vehicles that are already in the SQLite database are replaced.
+    :param file_dir: (str) location of the SQLite database file
+    :param csv_file: (str) location of the EV_dataset.csv file
+    :return: (EVParameterStore) store of the SQLite database file
+    """
+    database = EVDatabase.from_csv(file_dir=csv_file)
+    store = get_store(file_dir=file_dir, create=True)
+    store.add_vehicles({alias: database.vehicle(alias) for alias in database.aliases})
+    return store
+
+
+_stores = {}  # open stores of the process, keyed by the absolute file location
+_lock = threading.Lock()
+
+
+def get_store(file_dir: str, create: bool = False) -> EVParameterStore:
+    """
+    Returns the store of a SQLite database file. The store and its connection are created on the first call and are
+    reused by the later calls.
+    :param file_dir: (str) location of the SQLite database file
+    :param create: (bool) If True, the database file is created if it does not exist. Otherwise, a missing database
+    file raises a FileNotFoundError.
+    :return: (EVParameterStore) store of the SQLite database file
+    """
+    key = os.path.abspath(file_dir)
+    with _lock:
+        if key not in _stores:
+            _stores[key] = EVParameterStore(file_dir=file_dir, create=create)
+        return _stores[key]
+
+
+def close_stores() -> None:
+    """
+    Closes and removes all the open stores of the process.
+    """
+    with _lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
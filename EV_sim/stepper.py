@@ -0,0 +1,236 @@
+"""
+This module contains the classes and functionalities for the streaming (online) vehicle dynamics simulations, where
+the drive cycle is not known in advance and the samples of the time, desired speed and road grade are fed to the
+simulation as they arrive, e.g., from live vehicle telemetry, or where the drive cycle is too long to be held in memory
+and is simulated chunk by chunk.
+"""
+
+__all__ = ['VehicleStepper', 'simulate_stream']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import dataclasses
+import math
+from collections.abc import Callable, Sequence
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.drivecycles import StreamingDriveCycle
+from EV_sim.ev import EV
+from EV_sim.extern_conditions import ExternalConditions
+from EV_sim.kernel import _constants, simulate_segments, simulate_step
+from EV_sim.sol import SOLUTION_CHANNELS, SimState, Solution, select_channels
+from EV_sim.utils.constants import PhysicsConstants
+
+
+class VehicleStepper:
+    """
+    VehicleStepper simulates the vehicle dynamics one sample at a time. It only keeps the state of the latest sample,
+    so that its memory use does not grow with the number of samples. The state is an array with the simulation
+    variables in the order of SOLUTION_CHANNELS, which is overwritten by every sample. Hence, it needs to be copied if
+    it is kept, e.g.,
+
+    stepper = model.stepper(prev_time=0.0)
+    for t, speed_kmph in telemetry:
+        state = stepper.step(t, speed_kmph)
+        current = stepper['current']
+    """
+
+    def __init__(self, ev_obj: EV, external_condition_obj: ExternalConditions, prev_time: float) -> None:
+        """
+        VehicleStepper constructor.
+        :param ev_obj: (EV) EV class object that contains vehicle parameters.
+        :param external_condition_obj: (ExternalConditions) ExternalConditions class object. Its road grade is used
+        for the samples without a road grade.
+        :param prev_time: (float) time before the first sample, s
+        """
+        if not isinstance(ev_obj, EV):
+            raise TypeError("ev_obj needs to be a EV object.")
+        if not isinstance(external_condition_obj, ExternalConditions):
+            raise TypeError("external_condition_obj needs to be External condition object.")
+        self.EV = ev_obj
+        self.ExtCond = external_condition_obj
+        self._c = _constants(ev=ev_obj, rho=external_condition_obj.rho, road_force=external_condition_obj.road_force)
+        self._max_speed = ev_obj.kernel_params().max_speed
+        self._index = {name: i for i, name in enumerate(SOLUTION_CHANNELS)}
+        self._chunk = np.empty((0, len(SOLUTION_CHANNELS)))  # reused output buffer of step_chunk
+        self._grade = None  # road grade of the latest sample, %
+        self._roll_F = 0.0  # grade force of the latest sample, N
+        self.state = np.zeros(len(SOLUTION_CHANNELS))
+        self.reset(prev_time=prev_time)
+
+    def reset(self, prev_time: float) -> None:
+        """
+        Resets the stepper to a vehicle at standstill.
+        :param prev_time: (float) time before the first sample, s
+        """
+        self.prev_time = float(prev_time)
+        self.prev_speed = 0.0
+        self.prev_motor_speed = 0.0
+        self.prev_distance = 0.0
+        self.prev_SOC = 0.0
+        self.state[:] = 0.0
+
+    def _grade_force(self, grade: Optional[float]) -> float:
+        """
+        Returns the grade force of a sample. The force is only recalculated when the road grade changes.
+        :param grade: (float) road grade, %. None uses the road grade of the external conditions.
+        :return: (float) grade force, N
+        """
+        if grade is None:
+            grade = self.ExtCond.road_grade
+            if not isinstance(grade, float):
+                raise ValueError("The samples need a road grade when the external conditions do not have a constant "
+                                 "road grade.")
+        if grade != self._grade:
+            self._grade = grade
+            self._roll_F = self._c['max_mass'] * PhysicsConstants.g * math.sin(math.atan(grade / 100))
+        return self._roll_F
+
+    def _advance(self, t: float, desired_speed: float, grade: Optional[float]) -> tuple:
+        """
+        Simulates a sample and updates the state variables of the previous time step.
+        :return: (tuple) values of the simulation variables in the order of SOLUTION_CHANNELS.
+        """
+        dt = t - self.prev_time
+        if dt <= 0:
+            raise ValueError("The sample times need to be increasing.")
+        values = simulate_step(self._c, des_speed=min(desired_speed, self._max_speed) / 3.6, dt=dt,
+                               roll_F=self._grade_force(grade), prev_speed=self.prev_speed,
+                               prev_motor_speed=self.prev_motor_speed, prev_distance=self.prev_distance,
+                               prev_SOC=self.prev_SOC)
+        self.prev_time = t
+        self.prev_motor_speed, self.prev_speed = values[11], values[12]
+        self.prev_distance, self.prev_SOC = values[14], values[20]
+        return values
+
+    def step(self, t: float, desired_speed: float, grade: Optional[float] = None) -> npt.ArrayLike:
+        """
+        Simulates a single sample.
+        :param t: (float) sample time, s
+        :param desired_speed: (float) desired speed, km/h. It is limited by the maximum speed of the EV.
+        :param grade: (float) road grade, %. None uses the road grade of the external conditions.
+        :return: (np.ndarray) state array with the simulation variables in the order of SOLUTION_CHANNELS. The array
+        is overwritten by the next sample.
+        """
+        self.state[:] = self._advance(float(t), float(desired_speed), grade)
+        return self.state
+
+    def step_chunk(self, t: npt.ArrayLike, desired_speed: npt.ArrayLike, grade=None,
+                   out: Optional[npt.ArrayLike] = None) -> npt.ArrayLike:
+        """
+        Simulates a chunk of consecutive samples.
+        :param t: (np.ndarray) sample times, s
+        :param desired_speed: (np.ndarray) desired speeds, km/h
+        :param grade: (float or np.ndarray) road grade(s), %. None uses the road grade of the external conditions.
+        :param out: (np.ndarray) array of shape (number of samples, number of channels) the results are written to. If
+        None, an internal buffer is used, which is overwritten by the next chunk.
+        :return: (np.ndarray) simulation variables of shape (number of samples, number of channels) in the order of
+        SOLUTION_CHANNELS.
+        """
+        t = np.asarray(t, dtype=float).tolist()
+        desired_speed = np.asarray(desired_speed, dtype=float).tolist()
+        if len(t) != len(desired_speed):
+            raise ValueError("The lengths of the sample times and desired speeds do not match.")
+        grade = [grade] * len(t) if (grade is None) or np.ndim(grade) == 0 else np.asarray(grade, dtype=float).tolist()
+        if len(grade) != len(t):
+            raise ValueError("The lengths of the sample times and road grades do not match.")
+        if out is None:
+            if len(self._chunk) < len(t):
+                self._chunk = np.empty((len(t), len(SOLUTION_CHANNELS)))
+            out = self._chunk[:len(t)]
+        elif out.shape != (len(t), len(SOLUTION_CHANNELS)):
+            raise ValueError("out needs to be of shape (number of samples, number of channels).")
+        for i in range(len(t)):
+            out[i] = self._advance(t[i], desired_speed[i], grade[i])
+        if len(t) > 0:
+            self.state[:] = out[-1]
+        return out
+
+    def __getitem__(self, name: str) -> float:
+        """
+        Returns the value of a simulation variable at the latest sample.
+        :param name: (str) channel name, e.g., 'current'
+        :return: (float) value of the channel
+        """
+        if name not in self._index:
+            raise ValueError(f"{name} is not a simulation result channel.")
+        return self.state[self._index[name]]
+
+    def __repr__(self):
+        return f"VehicleStepper({self.EV}, {self.ExtCond}, {self.prev_time})"
+
+
+def simulate_stream(ev: EV, drive_cycle: StreamingDriveCycle, external_condition: ExternalConditions,
+                    sink: Callable[[Solution], None], channels: Optional[Sequence[str]] = None,
+                    start_state: Optional[SimState] = None) -> SimState:
+    """
+    Simulates a streaming drive cycle chunk by chunk with the segment kernel. The vehicle state at the end of a chunk
+    is carried over to the next chunk, and the results of each chunk are passed to the sink and not kept, so that the
+    memory use does not depend on the length of the drive cycle, e.g.,
+
+    state = simulate_stream(ev, StreamingDriveCycle.from_binary("fleet_log.npy"), cond,
+                            sink=lambda sol: sol.save(f"results_{sol.t[0]:.0f}.npy"))
+    :param ev: (EV) EV object
+    :param drive_cycle: (StreamingDriveCycle) streaming drive cycle
+    :param external_condition: (ExternalConditions) external conditions. The road grade needs to be constant.
+    :param sink: function that is called with the Solution object of each chunk, in the order of the chunks
+    :param channels: (Sequence) names of the simulation result channels passed to the sink. None passes all channels.
+    :param start_state: (SimState) state to start the simulation from, e.g., the state returned by a previous call
+    for the preceding part of the drive cycle. None starts at standstill, with the time before the first time step
+    extrapolated from the first two time steps.
+    :return: (SimState) state after the last time step, with the number of simulated time steps as its index.
+    """
+    if not isinstance(ev, EV):
+        raise TypeError("ev needs to be a EV object.")
+    if not isinstance(drive_cycle, StreamingDriveCycle):
+        raise TypeError("drive_cycle needs to be StreamingDriveCycle object.")
+    if not isinstance(external_condition, ExternalConditions):
+        raise TypeError("external_condition needs to be External condition object.")
+    if not isinstance(external_condition.road_grade, float):
+        raise ValueError("The streaming simulations need a constant road grade.")
+    channels = select_channels(channels)
+    # the channels the state is carried over with are simulated in any case
+    simulated = select_channels(set(channels) | {'motor_speed', 'actual_speed', 'distance', 'battery_SOC'})
+    rows = None if simulated == channels else [0] + [1 + simulated.index(name) for name in channels]
+    max_speed = ev.kernel_params().max_speed
+
+    def simulate_chunk(t: npt.ArrayLike, speed_kmph: npt.ArrayLike, state: SimState) -> SimState:
+        chunk = simulate_segments(ev=ev, t=t, des_speed=np.minimum(speed_kmph, max_speed) / 3.6,
+                                  grade_angle=external_condition.road_grade_angle, rho=external_condition.rho,
+                                  road_force=external_condition.road_force, prev_time=state.prev_time,
+                                  channels=simulated, init_speed=state.prev_speed,
+                                  init_motor_speed=state.prev_motor_speed, init_distance=state.prev_distance,
+                                  init_SOC=state.prev_SOC)
+        next_state = dataclasses.replace(SimState.from_solution(chunk, len(t)), index=state.index + len(t))
+        if rows is not None:
+            sol = Solution(veh_alias=ev.alias_name, t=t, channels=channels)
+            sol.data[:] = chunk.data[rows]
+            chunk = sol
+        sink(chunk)
+        return next_state
+
+    state = start_state
+    first = None  # first chunk of a single time step, simulated once the time of the second time step is read
+    for t, speed_kmph in drive_cycle:
+        if len(t) == 0:
+            continue
+        if state is None:
+            # the time before the first time step is extrapolated from the first two time steps, as in init_cond
+            if first is not None:
+                state = simulate_chunk(*first, SimState(index=0, prev_time=2 * first[0][0] - t[0]))
+            elif len(t) == 1:
+                first = (t, speed_kmph)
+                continue
+            else:
+                state = SimState(index=0, prev_time=2 * t[0] - t[1])
+        state = simulate_chunk(t, speed_kmph, state)
+    if state is None:
+        if first is not None:
+            raise ValueError("The streaming drive cycle needs at least two time steps to extrapolate the time before "
+                             "the first time step, or a start_state.")
+        raise ValueError("The streaming drive cycle has no time steps.")
+    return state
@@ -0,0 +1,207 @@
+"""
+This module contains the functionalities for the parameter grid sweeps of the vehicle dynamics simulations. The
+vehicle parameters are varied over the Cartesian product of the input grids and all the variants are simulated in
+lockstep, without creating an EV object per variant. Only the summary metrics of each variant are stored.
+"""
+
+__all__ = ['SWEEP_METRICS', 'SWEEP_PARAMETERS', 'SweepResult', 'iter_sweep', 'sweep']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import operator
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.ev import EV
+from EV_sim.drivecycles import DriveCycle
+from EV_sim.extern_conditions import ExternalConditions
+from EV_sim.kernel import simulate_summary
+from EV_sim.utils.constants import PhysicsConstants
+
+
+SWEEP_METRICS = ('energy', 'Wh_per_km', 'peak_current', 'final_SOC')
+
+# EV parameters that can be swept, as attribute paths relative to the EV object.
+SWEEP_PARAMETERS = ('m', 'payload_capacity', 'C_d', 'A_front', 'C_r', 'overhead_power',
+                    'drive_train.wheel.r', 'drive_train.wheel.I', 'drive_train.num_wheel', 'drive_train.gear_box.N',
+                    'drive_train.gear_box.I', 'drive_train.frac_regen_torque', 'drive_train.eff',
+                    'motor.RPM_r', 'motor.RPM_max', 'motor.L_max', 'motor.I',
+                    'pack.cell_mass', 'pack.cell_V_nom', 'pack.Ns', 'pack.Np', 'pack.module_overhead_mass',
+                    'pack.num_modules', 'pack.pack_overhead_mass')
+
+# Names of the DriveTrain constructor arguments, which are not kept as DriveTrain attributes.
+_PARAMETER_ALIASES = {'wheel_radius': 'drive_train.wheel.r', 'wheel_inertia': 'drive_train.wheel.I',
+                      'gearbox_ratio': 'drive_train.gear_box.N', 'gearbox_inertia': 'drive_train.gear_box.I'}
+
+
+def _resolve_parameter(name: str) -> str:
+    """
+    Returns the attribute path of a sweep parameter relative to the EV object. Besides the full path, the path
+    relative to the EV's drive_train, motor or pack (e.g., 'gear_box.N') and the DriveTrain constructor argument names
+    (e.g., 'gearbox_ratio') are accepted.
+    :param name: (str) parameter name
+    :return: (str) attribute path relative to the EV object
+    """
+    name = name.split('.', 1)[1] if name.startswith('DriveTrain.') else name
+    if name in _PARAMETER_ALIASES:
+        return _PARAMETER_ALIASES[name]
+    for path in (name, f'drive_train.{name}', f'motor.{name}', f'pack.{name}'):
+        if path in SWEEP_PARAMETERS:
+            return path
+    raise ValueError(f"{name} is not a sweepable EV parameter.")
+
+
+def _derived_constants(p: dict, rho: float, road_force: float) -> dict:
+    """
+    Calculates the constants used by the simulation kernels from the EV parameters. The calculations are the same as
+    the ones of the EV properties and the derived attributes of its components, but work on arrays of parameters.
+    :param p: (dict) EV parameters (floats or np.ndarray) with the SWEEP_PARAMETERS as keys.
+    :param rho: (float) air density, kg/m^3
+    :param road_force: (float) road force, N
+    :return: (dict) constants used by the simulation kernels
+    """
+    module_mass = p['pack.Ns'] * p['pack.Np'] * (p['pack.cell_mass'] / 1000) / (1 - p['pack.module_overhead_mass'])
+    pack_mass = module_mass * p['pack.num_modules'] / (1 - p['pack.pack_overhead_mass'])
+    max_mass = p['m'] + pack_mass + p['payload_capacity']
+    rot_mass = ((p['motor.I'] + p['drive_train.gear_box.I']) * (p['drive_train.gear_box.N'] ** 2) +
+                (p['drive_train.wheel.I'] * p['drive_train.num_wheel'])) / (p['drive_train.wheel.r'] ** 2)
+    return {'equiv_mass': max_mass + rot_mass, 'max_mass': max_mass,
+            'aero_coeff': 0.5 * rho * p['A_front'] * p['C_d'], 'roll_F': p['C_r'] * max_mass * PhysicsConstants.g,
+            'road_F': road_force, 'r': p['drive_train.wheel.r'], 'N': p['drive_train.gear_box.N'],
+            'RPM_r': p['motor.RPM_r'], 'RPM_max': p['motor.RPM_max'], 'L_max': p['motor.L_max'],
+            'regen_torque': p['drive_train.frac_regen_torque'] * p['motor.L_max'],
+            'P_max': 2 * np.pi * p['motor.L_max'] * p['motor.RPM_r'] / 60000,
+            'overhead': p['overhead_power'] / 1000, 'eff': p['drive_train.eff'],
+            'V_nom': p['pack.num_modules'] * p['pack.Ns'] * p['pack.cell_V_nom'], 'Np': p['pack.Np'],
+            'max_speed': 2 * np.pi * p['drive_train.wheel.r'] * p['motor.RPM_max'] * 60 /
+                         (1000 * p['drive_train.gear_box.N'])}
+
+
+@dataclass
+class SweepResult:
+    """
+    Class object that stores the summary metrics of a parameter grid sweep. Each metric is an N-D array whose axes
+    correspond to the swept parameters, in the order of dims.
+    """
+    dims: tuple  # attribute paths of the swept parameters, one per axis
+    coords: dict  # values of each swept parameter along its axis
+    metrics: dict  # N-D array of each summary metric
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(len(self.coords[dim]) for dim in self.dims)
+
+    def __getitem__(self, metric: str) -> npt.ArrayLike:
+        if metric not in self.metrics:
+            raise ValueError(f"{metric} is not a sweep metric.")
+        return self.metrics[metric]
+
+    def sel(self, metric: str, **indexers) -> npt.ArrayLike:
+        """
+        Selects the values of a metric at the given parameter values. The parameters are given with their attribute
+        paths where the dots are replaced by double underscores, e.g., sel('energy', C_d=0.22,
+        drive_train__gear_box__N=12.0).
+        :param metric: (str) metric name
+        :return: (np.ndarray) metric values over the parameters that are not selected
+        """
+        index = [slice(None)] * len(self.dims)
+        for key, value in indexers.items():
+            dim = _resolve_parameter(key.replace('__', '.'))
+            if dim not in self.dims:
+                raise ValueError(f"{dim} is not a swept parameter.")
+            matches = np.nonzero(np.asarray(self.coords[dim]) == value)[0]
+            if len(matches) == 0:
+                raise ValueError(f"{value} is not in the grid of {dim}.")
+            index[self.dims.index(dim)] = int(matches[0])
+        return self[metric][tuple(index)]
+
+
+def _grid(grid: dict) -> tuple[tuple, dict]:
+    """
+    Validates the sweep grid and returns the resolved parameter paths and their values.
+    """
+    if not isinstance(grid, dict) or len(grid) == 0:
+        raise ValueError("The sweep grid needs to be a non-empty dictionary of parameter values.")
+    dims = tuple(_resolve_parameter(name) for name in grid)
+    if len(set(dims)) != len(dims):
+        raise ValueError("A parameter appears more than once in the sweep grid.")
+    coords = {dim: np.asarray(values, dtype=float) for dim, values in zip(dims, grid.values())}
+    for dim, values in coords.items():
+        if values.ndim != 1 or len(values) == 0:
+            raise ValueError(f"The grid values of {dim} need to be a non-empty 1-D sequence.")
+    return dims, coords
+
+
+def iter_sweep(base_ev: EV, grid: dict, cycle: DriveCycle, cond: ExternalConditions,
+               chunk_size: int = 4096) -> Iterator[tuple[slice, dict]]:
+    """
+    Simulates the variants of the base EV over the Cartesian product of the grid values in chunks and yields the
+    summary metrics of each chunk as soon as it is simulated. This allows grids that are too large to be held in memory
+    to be streamed to disk.
+    :param base_ev: (EV) EV object whose parameters are used for the parameters that are not swept.
+    :param grid: (dict) values of each swept parameter, e.g., {"C_d": [0.2, 0.25], "gear_box.N": [9.0, 12.0]}
+    :param cycle: (DriveCycle) drive cycle
+    :param cond: (ExternalConditions) external conditions
+    :param chunk_size: (int) number of variants simulated in lockstep at a time
+    :return: (Iterator) iterator of (slice of the flattened grid in C order, dict of 1-D metric arrays) tuples
+    """
+    if not isinstance(base_ev, EV):
+        raise TypeError("base_ev needs to be a EV object.")
+    if not isinstance(cycle, DriveCycle):
+        raise TypeError("cycle needs to be DriveCycle object.")
+    if not isinstance(cond, ExternalConditions):
+        raise TypeError("cond needs to be External condition object.")
+    if (not isinstance(chunk_size, int)) or (chunk_size < 1):
+        raise ValueError("chunk_size needs to be a positive integer.")
+    dims, coords = _grid(grid)
+    shape = tuple(len(coords[dim]) for dim in dims)
+    size = int(np.prod(shape))
+
+    base_params = {path: operator.attrgetter(path)(base_ev) for path in SWEEP_PARAMETERS}
+    t = cycle.t
+    dt = np.empty(len(t))
+    dt[0] = t[0] - (2 * t[0] - t[1])
+    dt[1:] = t[1:] - t[:-1]
+    grade_angle = np.atleast_1d(cond.road_grade_angle)
+    if len(grade_angle) not in (1, len(t)):
+        raise ValueError("The lengths of external condition's road grade and drive cycle's time array do not match.")
+
+    for start in range(0, size, chunk_size):
+        stop = min(size, start + chunk_size)
+        grid_index = np.unravel_index(np.arange(start, stop), shape)
+        params = dict(base_params)
+        for dim, index in zip(dims, grid_index):
+            params[dim] = coords[dim][index]
+        c = _derived_constants(params, rho=cond.rho, road_force=cond.road_force)
+        c = {key: np.broadcast_to(value, (stop - start,)) for key, value in c.items()}
+        des_speed = np.minimum(cycle.speed_kmph[:, None], c['max_speed'][None, :]) / 3.6
+        roll_F = np.broadcast_to(c['max_mass'][None, :] * PhysicsConstants.g * np.sin(grade_angle)[:, None],
+                                 (len(t), stop - start))
+        yield slice(start, stop), simulate_summary(c, des_speed=des_speed, dt=dt, roll_F=roll_F)
+
+
+def sweep(base_ev: EV, grid: dict, cycle: DriveCycle, cond: ExternalConditions,
+          chunk_size: int = 4096) -> SweepResult:
+    """
+    Simulates the variants of the base EV over the Cartesian product of the grid values and returns the summary
+    metrics (energy, kWh; Wh/km; peak battery current, A; final battery SOC) as N-D arrays labelled by the swept
+    parameters.
+    :param base_ev: (EV) EV object whose parameters are used for the parameters that are not swept.
+    :param grid: (dict) values of each swept parameter, e.g., {"C_d": [0.2, 0.25], "gear_box.N": [9.0, 12.0]}
+    :param cycle: (DriveCycle) drive cycle
+    :param cond: (ExternalConditions) external conditions
+    :param chunk_size: (int) number of variants simulated in lockstep at a time
+    :return: (SweepResult) summary metrics of the sweep
+    """
+    dims, coords = _grid(grid)
+    shape = tuple(len(coords[dim]) for dim in dims)
+    metrics = {metric: np.empty(shape) for metric in SWEEP_METRICS}
+    for chunk, chunk_metrics in iter_sweep(base_ev=base_ev, grid=grid, cycle=cycle, cond=cond,
+                                           chunk_size=chunk_size):
+        for metric in SWEEP_METRICS:
+            metrics[metric].reshape(-1)[chunk] = chunk_metrics[metric]
+    return SweepResult(dims=dims, coords=coords, metrics=metrics)
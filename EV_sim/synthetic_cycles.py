@@ -0,0 +1,164 @@
+"""
+This module contains the functionalities for generating synthetic drive cycles, e.g., for the robustness tests that
+need more drive cycles than the ones in data/drive_cycles. A speed-acceleration Markov chain is fitted to the existing
+drive cycles, and the synthetic drive cycles are sampled from it for all the drive cycles at once, one time step at a
+time.
+"""
+
+__all__ = ['MarkovDriveCycleGenerator']
+
+__authors__ = "Moin Ahmed"
+__copyright__ = "Copyright 2023 by EV_sim. All rights reserved."
+
+import os
+import typing
+
+import numpy as np
+import numpy.typing as npt
+
+from EV_sim.config import definations
+from EV_sim.drivecycles import DriveCycle, get_registry
+
+
+_STOP_SPEED = 0.01  # speeds below it, m/s, are the stopped state. The drive cycle speeds have a resolution of 0.1 mph.
+
+
+class MarkovDriveCycleGenerator:
+    """
+    MarkovDriveCycleGenerator fits a speed-acceleration Markov chain to drive cycles and generates synthetic drive
+    cycles from it. The state of the chain is the speed bin (with a separate stopped bin) and the acceleration bin of
+    the last time step. Each observed transition of the fitted drive cycles is kept with its exact acceleration, and
+    the acceleration of the next time step is drawn from the transitions observed from the current state, e.g.,
+
+    generator = MarkovDriveCycleGenerator.from_bundled()
+    cycles = generator.generate(num_cycles=10000, duration=3600, seed=0)
+
+    The states that are not observed in the fitted drive cycles use the transitions of the closest observed state, with
+    the speed bin taking precedence over the acceleration bin.
+    """
+
+    def __init__(self, drive_cycles: typing.Iterable[DriveCycle], speed_bin: float = 1.0,
+                 acc_bin: float = 0.2) -> None:
+        """
+        MarkovDriveCycleGenerator constructor. The drive cycles must have the same constant time step.
+        :param drive_cycles: (Iterable) drive cycles the Markov chain is fitted to
+        :param speed_bin: (float) width of the speed bins, m/s
+        :param acc_bin: (float) width of the acceleration bins, m/s2
+        """
+        if (speed_bin <= 0) or (acc_bin <= 0):
+            raise ValueError("speed_bin and acc_bin need to be positive.")
+        self.speed_bin = speed_bin
+        self.acc_bin = acc_bin
+
+        speeds, prev_accs, next_accs, dts = [], [], [], []
+        for cycle in drive_cycles:
+            t = np.asarray(cycle.t, dtype=float)
+            steps = np.diff(t)
+            if (len(steps) < 1) or (not np.allclose(steps, steps[0])):
+                raise ValueError(f"{cycle.drive_cycle_name} does not have a constant time step.")
+            speed = np.asarray(cycle.speed_mps, dtype=float)
+            acc = np.diff(speed) / steps[0]
+            speeds.append(speed[:-1])
+            prev_accs.append(np.concatenate(([0.0], acc[:-1])))
+            next_accs.append(acc)
+            dts.append(steps[0])
+        if not dts:
+            raise ValueError("At least one drive cycle is needed.")
+        if not np.allclose(dts, dts[0]):
+            raise ValueError("The drive cycles need to have the same time step.")
+        self.dt = float(dts[0])
+        speed, prev_acc, next_acc = np.concatenate(speeds), np.concatenate(prev_accs), np.concatenate(next_accs)
+
+        self.max_speed = float(np.max(speed + next_acc * self.dt))
+        self._num_speed_bins = 2 + int(self.max_speed // speed_bin)  # the stopped bin and the moving speed bins
+        self._half_acc_bins = int(np.ceil(np.max(np.abs(np.concatenate((prev_acc, next_acc)))) / acc_bin))
+        self._num_acc_bins = 2 * self._half_acc_bins + 1
+        num_states = self._num_speed_bins * self._num_acc_bins
+
+        # the observed accelerations are grouped by their state, so that the ones of a state are a contiguous block
+        state = self._state(speed, prev_acc)
+        order = np.argsort(state, kind='stable')
+        self._next_acc = next_acc[order]
+        counts = np.bincount(state, minlength=num_states)
+        offsets = np.cumsum(counts) - counts
+
+        observed = np.flatnonzero(counts)
+        all_states = np.arange(num_states)
+        speed_distance = np.abs(all_states[:, None] // self._num_acc_bins - observed // self._num_acc_bins)
+        acc_distance = np.abs(all_states[:, None] % self._num_acc_bins - observed % self._num_acc_bins)
+        closest = observed[np.argmin(speed_distance * self._num_acc_bins + acc_distance, axis=1)]
+        self._offsets = offsets[closest]
+        self._counts = counts[closest]
+
+    @classmethod
+    def from_bundled(cls, folder_dir: str = os.path.join(definations.ROOT_DIR, "data", "drive_cycles"),
+                     **kwargs) -> "MarkovDriveCycleGenerator":
+        """
+        Fits the Markov chain to all the drive cycles in a folder.
+        :param folder_dir: The relative path directory to data/drive_cycles.
+        :param kwargs: speed_bin and acc_bin of the constructor
+        :return: (MarkovDriveCycleGenerator) drive cycle generator
+        """
+        registry = get_registry(folder_dir=folder_dir)
+        return cls(drive_cycles=[registry.get(name) for name in registry.names()], **kwargs)
+
+    def _state(self, speed: npt.ArrayLike, acc: npt.ArrayLike) -> npt.ArrayLike:
+        """
+        Returns the Markov chain states of the speeds, m/s, and the accelerations of the last time step, m/s2.
+        """
+        speed_index = np.where(speed < _STOP_SPEED, 0,
+                               1 + np.minimum(speed // self.speed_bin, self._num_speed_bins - 2)).astype(np.intp)
+        acc_index = np.clip(np.rint(acc / self.acc_bin) + self._half_acc_bins, 0, self._num_acc_bins - 1)
+        return speed_index * self._num_acc_bins + acc_index.astype(np.intp)
+
+    def sample(self, num_cycles: int, duration: float, seed: typing.Optional[int] = None) -> tuple:
+        """
+        Samples the speeds of synthetic drive cycles. The drive cycles start from rest, and are sampled for all the
+        drive cycles at once, one time step at a time.
+        :param num_cycles: (int) number of drive cycles
+        :param duration: (float) duration of the drive cycles, s
+        :param seed: (int) seed of the random number generator. The same seed returns the same drive cycles.
+        :return: (tuple) time array, s, of the time steps and (num_cycles, number of time steps) array of the
+        desired speeds, m/s
+        """
+        num_steps = int(duration // self.dt) + 1
+        rng = np.random.default_rng(seed)
+        speeds = np.empty((num_steps, num_cycles))
+        speeds[0] = 0.0
+        acc = np.zeros(num_cycles)
+        for k in range(1, num_steps):
+            state = self._state(speeds[k - 1], acc)
+            index = self._offsets[state] + (rng.random(num_cycles) * self._counts[state]).astype(np.intp)
+            speed = np.clip(speeds[k - 1] + self._next_acc[index] * self.dt, 0.0, self.max_speed)
+            speed[speed < _STOP_SPEED] = 0.0
+            acc = (speed - speeds[k - 1]) / self.dt  # the clipped speeds change the acceleration
+            speeds[k] = speed
+        return np.arange(num_steps) * self.dt, np.ascontiguousarray(speeds.T)
+
+    def generate(self, num_cycles: int, duration: float, seed: typing.Optional[int] = None,
+                 dtype: npt.DTypeLike = None, name: str = "synthetic") -> list[DriveCycle]:
+        """
+        Generates synthetic drive cycles. The drive cycles share a read-only time array, and their speeds are rows of
+        a single array.
+        :param num_cycles: (int) number of drive cycles
+        :param duration: (float) duration of the drive cycles, s
+        :param seed: (int) seed of the random number generator. The same seed returns the same drive cycles.
+        :param dtype: floating point type of the time and speed arrays, e.g., np.float32 to halve their memory.
+        :param name: (str) drive cycle name prefix. The drive cycles are named f"{name}_{i}".
+        :return: (list) drive cycles
+        """
+        t, speeds = self.sample(num_cycles=num_cycles, duration=duration, seed=seed)
+        if dtype is not None:
+            t, speeds = t.astype(dtype), speeds.astype(dtype)
+        t.setflags(write=False)
+        cycles = []
+        for i, speed in enumerate(speeds):
+            cycle = DriveCycle(drive_cycle_name=None)
+            cycle.drive_cycle_name = f"{name}_{i}"
+            cycle.t = t
+            cycle.speed_mps = speed
+            cycles.append(cycle)
+        return cycles
+
+    def __repr__(self):
+        return f"MarkovDriveCycleGenerator({self.speed_bin}, {self.acc_bin})"
@@ -5,6 +5,7 @@ import numpy.typing as npt
 
 import EV_sim
 from EV_sim.custom_exceptions import *
+from EV_sim.drivecycles import get_registry
 
 
 class InputSimVariables:
@@ -47,7 +48,7 @@ class InputSimVariables:
         :return: (None)
         """
         if isinstance(drive_cycle_name, str):
-            self.dc_obj = EV_sim.DriveCycle(drive_cycle_name=drive_cycle_name)
+            self.dc_obj = get_registry().get(drive_cycle_name)
         else:
             raise UndefinedDriveCycleError
 
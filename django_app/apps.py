@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DjangoAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'django_app'
+
+    def ready(self):
+        from EV_sim.drivecycles import get_registry
+        get_registry().preload()  # parses the bundled drive cycles once, before the first request
@@ -10,16 +10,22 @@ from EV_sim.config import definations
 from EV_sim.ev import EVFromDatabase
 
 
+def ev_alias_choices() -> list:
+    """
+    Returns the choices of the EV alias field. It is called when a form is created, so that the choices follow the EV
+    database file.
+    """
+    return [(ev_alias, ev_alias) for ev_alias in EVFromDatabase.list_all_EV_alias(file_dir=definations.EV_DATA_DIR)]
+
+
 class SimulationInputForm(forms.Form):
     DRIVE_CYCLE_WILDCARD = glob.glob(os.path.join('EV_sim', 'data', 'drive_cycles', '*.csv'))
 
-    lst_choices_ev_alias: tuple = [(ev_alias, ev_alias) for ev_alias in
-                                 EVFromDatabase.list_all_EV_alias(file_dir=definations.EV_DATA_DIR)]
     lst_choices_drive_cycles: tuple = [(drive_cycle.split("\\")[-1].split('.')[0],
                                         drive_cycle.split("\\")[-1].split('.')[0])
                                        for drive_cycle in DRIVE_CYCLE_WILDCARD]
 
-    ev_alias = forms.ChoiceField(choices=lst_choices_ev_alias)
+    ev_alias = forms.ChoiceField(choices=ev_alias_choices)
     drive_cycle = forms.ChoiceField(choices=lst_choices_drive_cycles)
     air_density = forms.FloatField()
     road_grade = forms.FloatField()
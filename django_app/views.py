@@ -3,6 +3,7 @@ from django.http import JsonResponse
 
 from.forms import SimulationInputForm
 import EV_sim
+from EV_sim.drivecycles import get_registry
 from EV_sim.sol import Solution
 
 
@@ -19,11 +20,11 @@ def index(request):
             input_road_grade = get_simulation_inputs_from_post(request=request)
             print(get_simulation_inputs_from_post(request))
             obj_ev = EV_sim.EVFromDatabase(alias_name=input_ev_alias)
-            obj_drive_cycle = EV_sim.DriveCycle(drive_cycle_name=input_drive_cycle)
+            obj_drive_cycle = get_registry().get(input_drive_cycle)
             obj_ext_cond = EV_sim.ExternalConditions(rho=input_air_density, road_grade=input_road_grade)
             model = EV_sim.VehicleDynamics(ev_obj=obj_ev, drive_cycle_obj=obj_drive_cycle,
                                            external_condition_obj=obj_ext_cond)
-            sol: Solution = model.simulate()
+            sol: Solution = model.simulate(engine="segment", channels=("demand_power", "current"))
             result_t = sol.t.tolist()
             result_demand = sol.demand_power.tolist()
             result_current = sol.current.tolist()
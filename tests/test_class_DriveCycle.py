@@ -1,8 +1,14 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 import numpy as np
 
 import EV_sim
+from EV_sim.config import definations
+from EV_sim.drivecycles import DriveCycle, DriveCycleRegistry, MappedDriveCycle, convert_to_binary, get_registry
 
 
 class TestDriveCycleConstructor(unittest.TestCase):
@@ -16,4 +22,125 @@ class TestDriveCycleConstructor(unittest.TestCase):
     def test_constructor_with_None_inputs(self):
         unknown_drive_cycle = EV_sim.DriveCycle(drive_cycle_name=None)
         self.assertEqual(None, unknown_drive_cycle.drive_cycle_name)
+        self.assertRaises(AttributeError, getattr, unknown_drive_cycle, "speed_kmph")
 
+
+class TestDriveCycleSpeedUnits(unittest.TestCase):
+    def test_lazy_units(self):
+        udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+        self.assertEqual(['mph'], list(udds._speeds))
+        self.assertIs(udds.speed_kmph, udds.speed_kmph)
+        self.assertTrue(np.allclose(udds.speed_mps * 3.6, udds.speed_kmph, rtol=1e-12, atol=0.0))
+        # setting a speed replaces the speeds in the other units
+        udds.speed_kmph = np.full(len(udds.t), 36.0)
+        self.assertTrue(np.allclose(10.0, udds.speed_mps))
+        self.assertTrue(np.allclose(36.0 / 1.609344, udds.speed_mph))
+
+    def test_dtype(self):
+        udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+        udds32 = EV_sim.DriveCycle(drive_cycle_name="udds", dtype=np.float32)
+        self.assertEqual(np.float32, udds32.t.dtype)
+        self.assertEqual(np.float32, udds32.speed_mps.dtype)
+        self.assertEqual(np.float32, udds32.speed_kmph.dtype)
+        self.assertTrue(np.allclose(udds.speed_kmph, udds32.speed_kmph, rtol=1e-6))
+
+    def test_units_match_csv_conversion(self):
+        for drive_cycle_name in get_registry().names():
+            cycle = EV_sim.DriveCycle(drive_cycle_name=drive_cycle_name)
+            speed_mph = cycle.parse_file()['Target Speed, mph'].to_numpy()
+            self.assertTrue(np.array_equal(speed_mph * 1.609344, cycle.speed_kmph))
+            self.assertTrue(np.array_equal(speed_mph * 1.609344 * 1000 / 3600, cycle.speed_mps))
+
+
+class TestDriveCycleResample(unittest.TestCase):
+    def test_resample(self):
+        udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+        coarse = udds.resample(speed_tol=1.0)
+        self.assertLess(len(coarse.t), len(udds.t) / 3)
+        self.assertEqual(udds.t[0], coarse.t[0])
+        self.assertEqual(udds.t[-1], coarse.t[-1])
+        self.assertTrue(np.array_equal(udds.speed_kmph[coarse.source_index], coarse.speed_kmph))
+        self.assertLessEqual(np.max(np.abs(np.interp(udds.t, coarse.t, coarse.speed_kmph) - udds.speed_kmph)),
+                             1.0 + 1e-9)
+
+    def test_keep(self):
+        udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+        coarse = udds.resample(speed_tol=1000.0, keep=[100, 200])
+        self.assertTrue(np.isin([100, 200], coarse.source_index).all())
+        self.assertRaises(ValueError, udds.resample, speed_tol=-1.0)
+
+
+class TestDriveCycleRegistry(unittest.TestCase):
+    def test_memoized_parsing(self):
+        registry = DriveCycleRegistry()
+        self.assertIs(get_registry(), get_registry())
+        self.assertIn("us06", registry.names())
+        self.assertIn("us06", registry)
+        self.assertNotIn("unknown", registry)
+        with mock.patch.object(DriveCycle, "parse_file", autospec=True, side_effect=DriveCycle.parse_file) as parse:
+            first, second = registry.get("us06"), registry["us06"]
+            self.assertEqual(1, parse.call_count)
+        self.assertIsNot(first, second)
+        self.assertTrue(np.shares_memory(first.t, second.t))
+        expected = EV_sim.DriveCycle(drive_cycle_name="us06")
+        self.assertTrue(np.array_equal(expected.speed_kmph, first.speed_kmph))
+        self.assertFalse(first.speed_kmph.flags.writeable)
+        with self.assertRaises(ValueError):
+            first.speed_kmph[0] = 1.0
+        self.assertTrue(first.resample(speed_tol=1.0).speed_kmph.flags.writeable)
+
+    def test_preload_and_mtime_invalidation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ("us06", "udds"):
+                shutil.copy(os.path.join(definations.ROOT_DIR, "data", "drive_cycles", f"{name}.csv"), tmp_dir)
+            registry = DriveCycleRegistry(folder_dir=tmp_dir)
+            self.assertEqual(["udds", "us06"], registry.preload())
+            us06 = registry.get("us06")
+            file_dir = os.path.join(tmp_dir, "us06.csv")
+            with open(file_dir) as f:
+                lines = f.readlines()
+            with open(file_dir, 'w') as f:
+                f.writelines(lines[:11])
+            self.assertEqual(10, len(registry.get("us06").t))
+            self.assertEqual(len(lines) - 1, len(us06.t))
+
+
+class TestMappedDriveCycle(unittest.TestCase):
+    def test_binary_format(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shutil.copy(os.path.join(definations.ROOT_DIR, "data", "drive_cycles", "udds.csv"), tmp_dir)
+            file_dir = convert_to_binary(os.path.join(tmp_dir, "udds.csv"), chunksize=100)
+            self.assertEqual(os.path.join(tmp_dir, "udds.npy"), file_dir)
+            udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+            mapped = MappedDriveCycle(file_dir)
+            self.assertEqual("udds", mapped.drive_cycle_name)
+            self.assertIsInstance(mapped.t, np.memmap)
+            self.assertEqual((2, len(udds.t)), np.load(file_dir).shape)
+            self.assertTrue(np.array_equal(udds.t, mapped.t))
+            self.assertTrue(np.array_equal(udds.speed_mph, mapped.speed_mph))
+            self.assertTrue(np.array_equal(udds.speed_kmph, mapped.speed_kmph))
+            self.assertTrue(np.array_equal(udds.speed_mps, mapped.speed_mps))
+            self.assertTrue(np.array_equal(udds.resample(speed_tol=1.0).speed_kmph,
+                                           mapped.resample(speed_tol=1.0).speed_kmph))
+
+            single = convert_to_binary(os.path.join(tmp_dir, "udds.csv"), os.path.join(tmp_dir, "single.npy"),
+                                       dtype=np.float32)
+            udds_single = EV_sim.DriveCycle(drive_cycle_name="udds", dtype=np.float32)
+            mapped_single = MappedDriveCycle(single)
+            self.assertEqual(np.float32, mapped_single.t.dtype)
+            for unit in ('speed_mph', 'speed_kmph', 'speed_mps'):
+                self.assertTrue(np.array_equal(getattr(udds_single, unit), getattr(mapped_single, unit)))
+
+            volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+            cond = EV_sim.ExternalConditions(rho=1.225, road_grade=0.0)
+            expected = EV_sim.VehicleDynamics(ev_obj=volt, drive_cycle_obj=udds, external_condition_obj=cond)
+            model = EV_sim.VehicleDynamics(ev_obj=volt, drive_cycle_obj=mapped, external_condition_obj=cond)
+            self.assertTrue(np.array_equal(expected.simulate(engine="segment").current,
+                                           model.simulate(engine="segment").current))
+            del mapped, mapped_single, model
+
+    def test_not_a_drive_cycle(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_dir = os.path.join(tmp_dir, "array.npy")
+            np.save(file_dir, np.zeros((3, 10)))
+            self.assertRaises(ValueError, MappedDriveCycle, file_dir)
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 # import numpy as np
@@ -84,4 +85,49 @@ class TestEVReprAndStr(unittest.TestCase):
     def test_str(self):
         # alias_name = "Volt_2017"
         # volt = EV_sim.EVFromDatabase(alias_name=alias_name)
-        self.assertEqual(f"{self.alias_name} made by Chevy", str(self.volt))
\ No newline at end of file
+        self.assertEqual(f"{self.alias_name} made by Chevy", str(self.volt))
+
+class TestEVKernelParams(unittest.TestCase):
+    def test_snapshot(self):
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        params = volt.kernel_params()
+        self.assertEqual(volt.equiv_mass, params.equiv_mass)
+        self.assertEqual(volt.max_mass, params.max_mass)
+        self.assertEqual(volt.drive_train.gear_box.N, params.gear_N)
+        self.assertRaises(AttributeError, setattr, params, "gear_N", 1.0)
+        self.assertFalse(hasattr(params, "__dict__"))
+
+    def test_cache_invalidation(self):
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        params = volt.kernel_params()
+        self.assertIs(params, volt.kernel_params())
+        volt.drive_train.gear_box.N = 10.0
+        self.assertIsNot(params, volt.kernel_params())
+        self.assertEqual(10.0, volt.kernel_params().gear_N)
+        self.assertEqual(volt.equiv_mass, volt.kernel_params().equiv_mass)
+
+
+class TestEVFingerprint(unittest.TestCase):
+    def test_content(self):
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        other = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        self.assertEqual(volt.fingerprint(), other.fingerprint())
+        self.assertEqual(volt.fingerprint(), pickle.loads(pickle.dumps(other)).fingerprint())
+        other.alias_name = "Volt_copy"
+        self.assertEqual(volt.fingerprint(), other.fingerprint())
+        self.assertNotEqual(volt.fingerprint(),
+                            EV_sim.EVFromDatabase(alias_name="Tesla_2022_Model3_RWD").fingerprint())
+        self.assertEqual(1, len({volt.fingerprint(): 1, other.fingerprint(): 2}))
+
+    def test_mutation(self):
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        fingerprints = {volt.fingerprint()}
+        volt.drive_train.gear_box.N = 10.0
+        fingerprints.add(volt.fingerprint())
+        volt.pack.SOC_empty = 0.2
+        fingerprints.add(volt.fingerprint())
+        volt.motor.eff = 0.5
+        fingerprints.add(volt.fingerprint())
+        self.assertEqual(4, len(fingerprints))
+        volt.motor.eff = EV_sim.EVFromDatabase(alias_name="Volt_2017").motor.eff
+        self.assertIn(volt.fingerprint(), fingerprints)
@@ -0,0 +1,132 @@
+import operator
+import unittest
+
+import numpy as np
+
+import EV_sim
+from EV_sim.ev_table import EVTable
+
+
+class TestEVTable(unittest.TestCase):
+    table = EVTable.from_database()
+
+    def test_derived_parameters(self):
+        for i, alias_name in enumerate(self.table.aliases):
+            if alias_name == "Audi_2021_e-tron 55 quattro":  # its cell mass in the database is not a number
+                self.assertTrue(np.isnan(self.table.curb_mass[i]))
+                continue
+            ev = EV_sim.EVFromDatabase(alias_name=alias_name)
+            self.assertAlmostEqual(ev.curb_mass, self.table.curb_mass[i])
+            self.assertAlmostEqual(ev.rot_mass, self.table.rot_mass[i])
+            self.assertAlmostEqual(ev.equiv_mass, self.table.equiv_mass[i])
+            self.assertAlmostEqual(ev.max_speed, self.table.max_speed[i])
+            self.assertAlmostEqual(ev.motor.P_max, self.table.P_max[i])
+            self.assertAlmostEqual(ev.pack.pack_V_nom, self.table.pack_V_nom[i])
+            self.assertAlmostEqual(ev.pack.pack_energy, self.table.pack_energy[i])
+
+    def test_lazy_ev(self):
+        table = EVTable.from_database()
+        self.assertEqual({}, table._evs)
+        volt = table.ev("Volt_2017")
+        self.assertIs(volt, table.ev(table.row("Volt_2017")))
+        self.assertEqual(12.0, table["drive_train.gear_box.N"][table.row("Volt_2017")])
+
+    def test_from_evs(self):
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        table = EVTable.from_evs([volt])
+        self.assertIs(volt, table.ev(0))
+        self.assertAlmostEqual(volt.equiv_mass, table.equiv_mass[0])
+        self.assertRaises(KeyError, table.__getitem__, "unknown")
+
+
+class TestEVTableBulkConstruction(unittest.TestCase):
+    table = EVTable.from_database()
+    aliases = [alias for alias in table.aliases if alias != "Audi_2021_e-tron 55 quattro"]
+
+    def test_matches_database(self):
+        for ev in self.table.to_evs(self.aliases):
+            expected = EV_sim.EVFromDatabase(alias_name=ev.alias_name)
+            self.assertEqual(expected.kernel_params(), ev.kernel_params())
+            self.assertIsInstance(ev.pack, EV_sim.ev.BatteryPack)
+            for component in ('motor', 'pack', 'drive_train.wheel', 'drive_train.gear_box'):
+                self.assertEqual(repr(operator.attrgetter(component)(expected).__dict__),
+                                 repr(operator.attrgetter(component)(ev).__dict__))
+            self.assertEqual(expected.drive_train.num_wheel, ev.drive_train.num_wheel)
+            self.assertEqual(expected.year, ev.year)
+
+    def assertSameAttributes(self, expected, actual):
+        """
+        Asserts that the objects, and the component objects they hold, have the same attribute names, types and values.
+        """
+        self.assertEqual(sorted(vars(expected)), sorted(vars(actual)))
+        for name, value in vars(expected).items():
+            if hasattr(value, '__dict__'):
+                self.assertIs(type(value), type(getattr(actual, name)))
+                self.assertSameAttributes(value, getattr(actual, name))
+            else:
+                self.assertEqual((name, type(value), repr(value)),
+                                 (name, type(getattr(actual, name)), repr(getattr(actual, name))))
+
+    def test_derived_attributes_match_database(self):
+        for ev in self.table.to_evs(self.aliases):
+            self.assertSameAttributes(EV_sim.EVFromDatabase(alias_name=ev.alias_name), ev)
+
+    def test_derived_attributes_match_constructors(self):
+        rng = np.random.default_rng(1)
+        volt = self.table.row("Volt_2017")
+        columns = {path: np.repeat(self.table[path][volt], 10) for path in EVTable.PARAMETERS}
+        for path in ('motor.L_max', 'pack.cell_cap', 'pack.cell_mass', 'drive_train.wheel.r', 'm'):
+            columns[path] = columns[path] * rng.uniform(0.8, 1.2, 10)
+        columns['pack.Ns'] = rng.integers(80, 100, 10).astype(float)
+        text = {path: column[volt:volt + 1] * 10 for path, column in self.table.text.items()}
+        table = EVTable(aliases=[f"variant_{i}" for i in range(10)], columns=columns, text=text)
+        for i, ev in enumerate(table.to_evs()):
+            c = {path: column[i].item() for path, column in columns.items()}
+            t = {path: np.nan if column[i] is None else column[i] for path, column in text.items()}
+            expected = EV_sim.EV(
+                alias_name=f"variant_{i}", model_name=t['model_name'], year=t['year'],
+                manufacturer=t['manufacturer'], trim=t['trim'],
+                drive_train=EV_sim.ev.DriveTrain(
+                    wheel_radius=c['drive_train.wheel.r'], wheel_inertia=c['drive_train.wheel.I'],
+                    num_wheel=int(c['drive_train.num_wheel']), gearbox_ratio=c['drive_train.gear_box.N'],
+                    gearbox_inertia=c['drive_train.gear_box.I'], inverter_eff=c['drive_train.inverter_eff'],
+                    frac_regen_torque=c['drive_train.frac_regen_torque'], eff=c['drive_train.eff']),
+                motor=EV_sim.ev.ACInductionMotor(
+                    motor_type=t['motor.motor_type'], RPM_r=c['motor.RPM_r'], RPM_max=c['motor.RPM_max'],
+                    L_max=c['motor.L_max'], eff=c['motor.eff'], I=c['motor.I']),
+                pack=EV_sim.ev.BatteryPack(
+                    cell_manufacturer=t['pack.cell_manufacturer'], cell_cap=c['pack.cell_cap'],
+                    cell_mass=c['pack.cell_mass'], cell_V_max=c['pack.cell_V_max'], cell_V_nom=c['pack.cell_V_nom'],
+                    cell_V_min=c['pack.cell_V_min'], cell_chem=t['pack.cell_chem'], Ns=int(c['pack.Ns']),
+                    Np=int(c['pack.Np']),
+                    module_overhead_mass=c['pack.module_overhead_mass'], num_modules=int(c['pack.num_modules']),
+                    pack_overhead_mass=c['pack.pack_overhead_mass'], SOC_full=c['pack.SOC_full'],
+                    SOC_empty=c['pack.SOC_empty'], eff=c['pack.eff']),
+                C_d=c['C_d'], A_front=c['A_front'], m=c['m'], payload_capacity=c['payload_capacity'],
+                overhead_power=c['overhead_power'])
+            expected.C_r = c['C_r']
+            self.assertSameAttributes(expected, ev)
+
+    def test_validation(self):
+        self.assertRaises(ValueError, self.table.to_evs)  # the Audi cell mass is not a number
+        columns = {path: np.repeat(self.table[path][:1], 3) for path in EVTable.PARAMETERS}
+        columns['pack.Ns'] = np.array([96.0, 96.5, 96.0])
+        table = EVTable(aliases=["a", "b", "c"], columns=columns)
+        with self.assertRaises(ValueError) as context:
+            table.validate()
+        self.assertIn("['b']", str(context.exception))
+        self.assertEqual(["a", "c"], [ev.alias_name for ev in table.to_evs(["a", 2])])
+
+    def test_synthetic_variants(self):
+        rng = np.random.default_rng(0)
+        volt = self.table.row("Volt_2017")
+        columns = {path: np.repeat(self.table[path][volt], 100) for path in EVTable.PARAMETERS}
+        columns['motor.L_max'] = rng.uniform(200.0, 400.0, 100)
+        table = EVTable(aliases=[f"variant_{i}" for i in range(100)], columns=columns)
+        evs = table.to_evs()
+        self.assertEqual(100, len(evs))
+        self.assertEqual("Unknown", evs[0].motor.motor_type)
+        for i in (0, 99):
+            self.assertEqual(columns['motor.L_max'][i], evs[i].motor.L_max)
+            self.assertAlmostEqual(table.P_max[i], evs[i].motor.P_max)
+            self.assertEqual(table.equiv_mass[i], evs[i].equiv_mass)
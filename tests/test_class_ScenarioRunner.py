@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+import EV_sim
+from EV_sim.runner import ScenarioRunner
+
+
+class TestScenarioRunner(unittest.TestCase):
+    volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+    model3 = EV_sim.EVFromDatabase(alias_name="Tesla_2022_Model3_RWD")
+    us06 = EV_sim.DriveCycle(drive_cycle_name="us06")
+    hwfet = EV_sim.DriveCycle(drive_cycle_name="hwfet")
+    waterloo = EV_sim.ExternalConditions(rho=1.225, road_grade=0.3)
+    scenarios = [(volt, us06, waterloo), (volt, hwfet, waterloo), (model3, us06, waterloo), (model3, hwfet, waterloo)]
+
+    def test_ordered_results(self):
+        with ScenarioRunner(self.scenarios, max_workers=2, chunksize=3) as runner:
+            results = list(runner.run())
+            self.assertEqual([0, 1, 2, 3], [index for index, sol in results])
+            for index, sol in results:
+                ev, cycle, cond = self.scenarios[index]
+                sol_expected = EV_sim.VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle,
+                                                      external_condition_obj=cond).simulate_segments()
+                self.assertEqual(ev.alias_name, sol.veh_alias)
+                self.assertTrue(np.array_equal(sol_expected.current, sol.current))
+                self.assertTrue(np.array_equal(sol_expected.battery_SOC, sol.battery_SOC))
+
+    def test_loop_engine(self):
+        with ScenarioRunner(self.scenarios, max_workers=2, engine="loop", channels=["current"]) as runner:
+            for index, sol in runner.run():
+                ev, cycle, cond = self.scenarios[index]
+                sol_expected = EV_sim.VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle,
+                                                      external_condition_obj=cond).simulate(channels=["current"])
+                self.assertTrue(np.array_equal(sol_expected.data, sol.data))
+
+    def test_loop_engine_all_channels(self):
+        with ScenarioRunner(self.scenarios[:2], max_workers=1, engine="loop") as runner:
+            for index, sol in runner.run():
+                ev, cycle, cond = self.scenarios[index]
+                sol_expected = EV_sim.VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle,
+                                                      external_condition_obj=cond).simulate()
+                self.assertTrue(np.array_equal(sol_expected.data, sol.data))
+
+    def test_worker_data(self):
+        runner = ScenarioRunner(self.scenarios)
+        params, cycles, conditions, tasks = runner._worker_data()
+        self.assertEqual([self.volt.kernel_params(), self.model3.kernel_params()], params)
+        self.assertEqual([len(self.us06.t), len(self.hwfet.t)], [len(t) for t, speed_kmph in cycles])
+        self.assertEqual(1, len(conditions))
+        self.assertEqual([(0, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0)], [task[2:] for task in tasks])
+        self.assertEqual(runner.offsets.tolist(), [task[1] for task in tasks])
+
+    def test_as_completed_results(self):
+        with ScenarioRunner(self.scenarios, max_workers=2) as runner:
+            indices = sorted(index for index, sol in runner.run(ordered=False))
+        self.assertEqual([0, 1, 2, 3], indices)
+
+    def test_invalid_inputs(self):
+        self.assertRaises(ValueError, ScenarioRunner, [])
+        self.assertRaises(ValueError, ScenarioRunner, self.scenarios, max_workers=0)
+        self.assertRaises(ValueError, ScenarioRunner, self.scenarios, chunksize=0)
+        self.assertRaises(ValueError, ScenarioRunner, self.scenarios, engine="unknown")
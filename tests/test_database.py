@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import EV_sim
+from EV_sim.config import definations
+from EV_sim.database import EVDatabase, compile_database, get_database, clear_database_cache, list_aliases, \
+    list_vehicles, snapshot_paths
+
+
+class TestEVDatabaseCache(unittest.TestCase):
+    def setUp(self):
+        clear_database_cache()
+
+    def test_single_parse(self):
+        with mock.patch("EV_sim.database.pd.read_csv", wraps=pd.read_csv) as read_csv:
+            for alias_name in EV_sim.EVFromDatabase.list_all_EV_alias(file_dir=definations.EV_DATA_DIR):
+                if alias_name != "Audi_2021_e-tron 55 quattro":  # its cell mass in the database is not a number
+                    EV_sim.EVFromDatabase(alias_name=alias_name)
+            self.assertEqual(1, read_csv.call_count)
+
+    def test_mtime_invalidation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_dir = os.path.join(tmp_dir, "EV_dataset.csv")
+            shutil.copy(definations.EV_DATA_DIR, file_dir)
+            database = get_database(file_dir=file_dir)
+            self.assertIs(database, get_database(file_dir=file_dir))
+            stat = os.stat(file_dir)
+            os.utime(file_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertTrue(database.is_stale())
+            self.assertIsNot(database, get_database(file_dir=file_dir))
+
+    def test_unknown_alias(self):
+        database = EVDatabase.from_csv()
+        self.assertIn("Volt_2017", database.aliases)
+        self.assertRaises(Exception, database.vehicle, "unknown")
+
+
+class TestEVDatabaseSnapshot(unittest.TestCase):
+    def setUp(self):
+        clear_database_cache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_dir = os.path.join(self.tmp_dir.name, "EV_dataset.csv")
+        shutil.copy(definations.EV_DATA_DIR, self.file_dir)
+
+    def tearDown(self):
+        clear_database_cache()
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_matches_csv(self):
+        csv_database = get_database(file_dir=self.file_dir)
+        compile_database(file_dir=self.file_dir)
+        database = get_database(file_dir=self.file_dir)
+        self.assertIsNot(csv_database, database)
+        self.assertIsInstance(database.values, np.memmap)
+        self.assertEqual(csv_database.aliases, database.aliases)
+        self.assertEqual(csv_database.index, database.index)
+        self.assertTrue(np.array_equal(csv_database.values, database.values, equal_nan=True))
+        self.assertEqual(repr(csv_database.vehicle("Volt_2017")), repr(database.vehicle("Volt_2017")))
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017", database_dir=self.file_dir)
+        self.assertEqual("2017", volt.year)
+        self.assertEqual(EV_sim.EVFromDatabase(alias_name="Volt_2017").equiv_mass, volt.equiv_mass)
+
+    def test_csv_newer_than_snapshot(self):
+        compile_database(file_dir=self.file_dir)
+        stat = os.stat(self.file_dir)
+        os.utime(self.file_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 10))
+        self.assertNotIsInstance(get_database(file_dir=self.file_dir).values, np.memmap)
+
+    def test_numeric_parameters_from_float_array(self):
+        compile_database(file_dir=self.file_dir)
+        with open(snapshot_paths(self.file_dir)[1]) as f:
+            side_table = json.load(f)
+        rows = {tuple(key): i for i, key in enumerate(side_table['index'])}
+        self.assertIsNone(side_table['text'][rows[('wheel', 'radius [m]')]])
+        self.assertEqual(['Volt', 'Model 3'], side_table['text'][rows[('basic vehicle', 'model_name')]][:2])
+        database = get_database(file_dir=self.file_dir)
+        row, column = rows[('wheel', 'radius [m]')], database.aliases.index("Volt_2017")
+        self.assertEqual(database.values[row, column], database.vehicle("Volt_2017")["wheel"]["radius [m]"])
+        self.assertEqual("2017", database.vehicle("Volt_2017")["basic vehicle"]["year"])
+        self.assertEqual("AC Induction Motor", database.vehicle("Volt_2017")["motor"]["type"])
+
+
+class TestVehicleListing(unittest.TestCase):
+    def setUp(self):
+        clear_database_cache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_dir = os.path.join(self.tmp_dir.name, "EV_dataset.csv")
+        shutil.copy(definations.EV_DATA_DIR, self.file_dir)
+
+    def tearDown(self):
+        clear_database_cache()
+        self.tmp_dir.cleanup()
+
+    def test_header_only(self):
+        with mock.patch("EV_sim.database.pd.read_csv", wraps=pd.read_csv) as read_csv:
+            aliases = EV_sim.EVFromDatabase.list_all_EV_alias(file_dir=self.file_dir)
+            vehicles = list_vehicles(file_dir=self.file_dir)
+            self.assertEqual(0, read_csv.call_count)
+        database = EVDatabase.from_csv(file_dir=self.file_dir)
+        self.assertEqual(database.aliases, aliases)
+        for vehicle in vehicles:
+            basic = database.vehicle(vehicle.alias_name)['basic vehicle']
+            for name in ('model_name', 'year', 'manufacturer', 'trim'):
+                expected = basic[name]
+                self.assertEqual(None if pd.isnull(expected) else expected, getattr(vehicle, name))
+
+    def test_memoized_per_file_version(self):
+        with mock.patch("EV_sim.database._read_listing", wraps=EV_sim.database._read_listing) as read_listing:
+            self.assertEqual(list_aliases(file_dir=self.file_dir), list_aliases(file_dir=self.file_dir))
+            self.assertEqual(1, read_listing.call_count)
+            with open(self.file_dir) as f:
+                lines = f.readlines()
+            lines[0] = lines[0].replace("Volt_2017", "Volt_2017_renamed")
+            with open(self.file_dir, 'w') as f:
+                f.writelines(lines)
+            stat = os.stat(self.file_dir)
+            os.utime(self.file_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertIn("Volt_2017_renamed", list_aliases(file_dir=self.file_dir))
+            self.assertEqual(2, read_listing.call_count)
@@ -1,6 +1,9 @@
 #  Copyright (c) 2023. Moin Ahmed. All rights reserved.
 
+import os
+import pickle
 import sys
+import tempfile
 import unittest
 
 import numpy
@@ -8,6 +11,10 @@ import numpy as np
 from random import randint
 
 import EV_sim
+from EV_sim.drivecycles import StreamingDriveCycle, convert_to_binary
+from EV_sim.kernel import SEGMENT_RTOL, SEGMENT_ATOL
+from EV_sim.range_estimation import estimate_range, usable_charge
+from EV_sim.stepper import simulate_stream
 
 
 np.set_printoptions(threshold=sys.maxsize)
@@ -232,3 +239,334 @@ class TestVehicleDynamics(unittest.TestCase):
             self.assertAlmostEqual(quotient, np_test, None, "Current ratio does not match the assigned ", 0.000001)
 
 
+
+
+class VoltUDDSTestCase(unittest.TestCase):
+    """
+    Shared fixture of the Volt driving along the UDDS drive cycle on a 0.3 % road grade.
+    """
+    volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+    udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+    waterloo = EV_sim.ExternalConditions(rho=1.225, road_grade=0.3)
+
+
+class TestSegmentKernel(VoltUDDSTestCase):
+    def test_segment_matches_loop(self):
+        for drive_cycle_name in ["udds", "us06", "nycc"]:
+            drive_cycle = EV_sim.DriveCycle(drive_cycle_name=drive_cycle_name)
+            model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=drive_cycle,
+                                           external_condition_obj=self.waterloo)
+            sol_loop = model.simulate()
+            sol_segment = model.simulate(engine="segment")
+            for name in ["des_acc", "demand_torque", "limit_torque", "motor_speed", "actual_speed", "distance",
+                         "demand_power", "current", "cell_current", "battery_SOC"]:
+                self.assertTrue(np.allclose(getattr(sol_loop, name), getattr(sol_segment, name),
+                                            rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+
+    def test_unknown_engine(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds, external_condition_obj=self.waterloo)
+        self.assertRaises(ValueError, model.simulate, engine="unknown")
+
+
+class TestBatchSimulation(VoltUDDSTestCase):
+    evs = [EV_sim.EVFromDatabase(alias_name="Volt_2017"), EV_sim.EVFromDatabase(alias_name="Tesla_2022_Model3_RWD")]
+    cycles = [EV_sim.DriveCycle(drive_cycle_name="us06"), EV_sim.DriveCycle(drive_cycle_name="udds")]
+
+    def test_batch_shape(self):
+        batch_sol = EV_sim.VehicleDynamics.simulate_batch(self.evs, self.cycles, self.waterloo)
+        self.assertEqual((4, 1 + len(EV_sim.sol.SOLUTION_CHANNELS), 1370), batch_sol.data.shape)
+        self.assertEqual(["us06", "udds", "us06", "udds"], batch_sol.drive_cycle_name)
+        self.assertTrue(np.all(np.isnan(batch_sol.channel("current")[0, 601:])))
+        self.assertFalse(np.any(np.isnan(batch_sol.channel("current")[1])))
+
+    def test_batch_matches_simulate(self):
+        batch_sol = EV_sim.VehicleDynamics.simulate_batch(self.evs, self.cycles, self.waterloo)
+        scenarios = [(ev, cycle) for ev in self.evs for cycle in self.cycles]
+        for i, (ev, cycle) in enumerate(scenarios):
+            sol = EV_sim.VehicleDynamics(ev_obj=ev, drive_cycle_obj=cycle, external_condition_obj=self.waterloo).simulate()
+            for name in EV_sim.sol.SOLUTION_CHANNELS:
+                self.assertTrue(np.allclose(getattr(sol, name), getattr(batch_sol[i], name), rtol=SEGMENT_RTOL,
+                                            atol=SEGMENT_ATOL))
+
+
+class TestSolutionChannels(VoltUDDSTestCase):
+    def test_requested_channels_only(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds, external_condition_obj=self.waterloo)
+        sol = model.simulate()
+        for engine in ["loop", "segment"]:
+            sol_channels = model.simulate(engine=engine, channels=["battery_SOC", "current"])
+            self.assertEqual(("current", "battery_SOC"), sol_channels.channels)
+            self.assertFalse(hasattr(sol_channels, "des_acc"))
+            self.assertFalse(hasattr(sol_channels, "distance"))
+            self.assertTrue(np.allclose(sol.current, sol_channels.current, rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+            self.assertTrue(np.allclose(sol.battery_SOC, sol_channels.battery_SOC, rtol=SEGMENT_RTOL,
+                                        atol=SEGMENT_ATOL))
+
+    def test_buffer_holds_requested_channels(self):
+        for engine in ["loop", "segment"]:
+            model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                           external_condition_obj=self.waterloo)
+            for channels in (["current"], ["battery_SOC", "current", "distance"]):
+                sol = model.simulate(engine=engine, channels=channels)
+                self.assertEqual((1 + len(channels), len(self.udds.t)), sol.data.shape)  # time row and the channels
+                for name in EV_sim.sol.SOLUTION_CHANNELS:
+                    if name not in channels:
+                        self.assertIsNone(getattr(sol, name, None))
+
+    def test_batch_channels(self):
+        batch_sol = EV_sim.VehicleDynamics.simulate_batch(self.volt, self.udds, self.waterloo, channels=["current"])
+        self.assertEqual((1, 2, 1370), batch_sol.data.shape)
+        self.assertFalse(hasattr(batch_sol[0], "battery_SOC"))
+
+    def test_unknown_channel(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds, external_condition_obj=self.waterloo)
+        self.assertRaises(ValueError, model.simulate, channels=["unknown"])
+
+
+class TestSolutionBuffer(VoltUDDSTestCase):
+    def setUp(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds, external_condition_obj=self.waterloo)
+        self.sol = model.simulate(engine="segment")
+
+    def test_attributes_are_views(self):
+        self.assertTrue(self.sol.data.flags['C_CONTIGUOUS'])
+        self.assertEqual((1 + len(EV_sim.sol.SOLUTION_CHANNELS), 1370), self.sol.data.shape)
+        self.assertTrue(np.shares_memory(self.sol.t, self.sol.data))
+        self.assertTrue(np.shares_memory(self.sol.current, self.sol.data))
+        self.sol.current = np.ones(1370)
+        self.assertTrue(np.array_equal(np.ones(1370), self.sol.data[1 + self.sol.channels.index("current")]))
+
+    def test_copy_and_pickle(self):
+        sol_copy = self.sol.copy()
+        self.assertFalse(np.shares_memory(sol_copy.data, self.sol.data))
+        sol_pickled = pickle.loads(pickle.dumps(self.sol))
+        self.assertTrue(np.array_equal(self.sol.data, sol_pickled.data))
+        self.assertTrue(np.shares_memory(sol_pickled.current, sol_pickled.data))
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "sol.npy")
+            self.sol.save(file_name)
+            sol_loaded = EV_sim.sol.Solution.load(file_name)
+            self.assertIsInstance(sol_loaded.data, np.memmap)
+            self.assertEqual("Volt_2017", sol_loaded.veh_alias)
+            self.assertEqual(self.sol.channels, sol_loaded.channels)
+            self.assertTrue(np.array_equal(self.sol.current, sol_loaded.current))
+            del sol_loaded
+
+    def test_to_dataframe(self):
+        df = self.sol.to_dataframe()
+        self.assertEqual(("t",) + self.sol.channels, tuple(df.columns))
+        self.assertTrue(np.array_equal(self.sol.current, df["current"].to_numpy()))
+
+    def test_out(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds, external_condition_obj=self.waterloo)
+        data = np.full((3, 2 * 1370), np.nan)
+        for engine in ["loop", "segment"]:
+            sol_expected = model.simulate(engine=engine, channels=["current", "battery_SOC"])
+            out = EV_sim.sol.Solution.from_buffer(veh_alias="Volt_2017", data=data[:, 1370:],
+                                                  channels=["current", "battery_SOC"])
+            self.assertIs(out, model.simulate(engine=engine, channels=["current", "battery_SOC"], out=out))
+            self.assertTrue(np.array_equal(sol_expected.data, data[:, 1370:]))
+            self.assertTrue(np.isnan(data[:, :1370]).all())
+        self.assertRaises(ValueError, model.simulate, channels=["current"], out=out)
+
+
+class TestStepper(VoltUDDSTestCase):
+    def setUp(self):
+        self.model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                            external_condition_obj=self.waterloo)
+        self.sol = self.model.simulate()
+
+    def test_step_matches_simulate(self):
+        stepper = self.model.stepper()
+        state = stepper.step(self.udds.t[0], self.udds.speed_kmph[0])
+        for k in range(1, len(self.udds.t)):
+            self.assertIs(state, stepper.step(self.udds.t[k], self.udds.speed_kmph[k]))
+        for i, name in enumerate(EV_sim.sol.SOLUTION_CHANNELS):
+            self.assertTrue(np.isclose(getattr(self.sol, name)[-1], state[i], rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+        self.assertEqual(state[EV_sim.sol.SOLUTION_CHANNELS.index("current")], stepper["current"])
+
+    def test_step_chunk_matches_simulate(self):
+        stepper = self.model.stepper()
+        results = [stepper.step_chunk(self.udds.t[i: i + 100], self.udds.speed_kmph[i: i + 100], grade=0.3).copy()
+                   for i in range(0, len(self.udds.t), 100)]
+        results = np.concatenate(results)
+        for i, name in enumerate(EV_sim.sol.SOLUTION_CHANNELS):
+            self.assertTrue(np.allclose(getattr(self.sol, name), results[:, i], rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+
+    def test_invalid_samples(self):
+        stepper = self.model.stepper(prev_time=0.0)
+        self.assertRaises(ValueError, stepper.step, 0.0, 10.0)
+        self.assertRaises(ValueError, stepper.step_chunk, [1.0, 2.0], [10.0])
+        self.assertRaises(ValueError, stepper.__getitem__, "unknown")
+
+
+class TestStreamingSimulation(VoltUDDSTestCase):
+    def setUp(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                       external_condition_obj=self.waterloo)
+        self.sol = model.simulate()
+
+    def assert_matches(self, chunks, channels=("current", "battery_SOC", "distance")):
+        for name in channels:
+            streamed = np.concatenate([getattr(chunk, name) for chunk in chunks])
+            self.assertTrue(np.allclose(getattr(self.sol, name), streamed, rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+        self.assertTrue(np.array_equal(self.udds.t, np.concatenate([chunk.t for chunk in chunks])))
+
+    def test_chunks_match_simulate(self):
+        chunks = []
+        state = simulate_stream(self.volt, StreamingDriveCycle.from_drive_cycle(self.udds, chunk_size=100),
+                                self.waterloo, sink=chunks.append, channels=("current", "battery_SOC", "distance"))
+        self.assertEqual(14, len(chunks))
+        self.assertEqual(("distance", "current", "battery_SOC"), chunks[0].channels)
+        self.assertEqual(len(self.udds.t), state.index)
+        self.assertAlmostEqual(self.sol.battery_SOC[-1], state.prev_SOC)
+        self.assert_matches(chunks)
+
+    def test_sources(self):
+        file_dir = os.path.join(EV_sim.config.definations.ROOT_DIR, "data", "drive_cycles", "udds.csv")
+        samples = zip(self.udds.t.tolist(), self.udds.speed_kmph.tolist())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            binary_file_dir = convert_to_binary(file_dir, os.path.join(tmp_dir, "udds.npy"))
+            for stream in [StreamingDriveCycle.from_csv(file_dir, chunk_size=256),
+                           StreamingDriveCycle.from_binary(binary_file_dir, chunk_size=256),
+                           StreamingDriveCycle.from_iterator(samples, chunk_size=256)]:
+                chunks = []
+                simulate_stream(self.volt, stream, self.waterloo, sink=chunks.append)
+                self.assertEqual(6, len(chunks))
+                self.assert_matches(chunks, channels=EV_sim.sol.SOLUTION_CHANNELS)
+
+    def test_single_time_step_chunks(self):
+        chunks = []
+        state = simulate_stream(self.volt, StreamingDriveCycle.from_drive_cycle(self.udds, chunk_size=1),
+                                self.waterloo, sink=chunks.append)
+        self.assertEqual(len(self.udds.t), len(chunks))
+        self.assertEqual(len(self.udds.t), state.index)
+        self.assert_matches(chunks)
+
+        single = StreamingDriveCycle.from_iterator([(0.0, 10.0)], chunk_size=1)
+        self.assertRaises(ValueError, simulate_stream, self.volt, single, self.waterloo, sink=chunks.append)
+        single = StreamingDriveCycle.from_iterator([(1.0, 10.0)], chunk_size=1)
+        state = simulate_stream(self.volt, single, self.waterloo, sink=chunks.append,
+                                start_state=EV_sim.sol.SimState(index=0, prev_time=0.0))
+        self.assertEqual(1, state.index)
+
+    def test_resume(self):
+        first, second = [], []
+        half = EV_sim.DriveCycle(drive_cycle_name=None)
+        half.t, half.speed_kmph = self.udds.t[:700], self.udds.speed_kmph[:700]
+        state = simulate_stream(self.volt, StreamingDriveCycle.from_drive_cycle(half, chunk_size=300), self.waterloo,
+                                sink=first.append)
+        half.t, half.speed_kmph = self.udds.t[700:], self.udds.speed_kmph[700:]
+        state = simulate_stream(self.volt, StreamingDriveCycle.from_drive_cycle(half, chunk_size=300), self.waterloo,
+                                sink=second.append, start_state=state)
+        self.assertEqual(len(self.udds.t), state.index)
+        self.assert_matches(first + second)
+
+    def test_invalid_inputs(self):
+        grade = EV_sim.ExternalConditions(rho=1.225, road_grade=np.zeros(len(self.udds.t)))
+        stream = StreamingDriveCycle.from_drive_cycle(self.udds)
+        self.assertRaises(ValueError, simulate_stream, self.volt, stream, grade, sink=print)
+        self.assertRaises(TypeError, simulate_stream, self.volt, self.udds, self.waterloo, sink=print)
+        self.assertRaises(ValueError, simulate_stream, self.volt, StreamingDriveCycle.from_iterator([]),
+                          self.waterloo, sink=print)
+        self.assertRaises(ValueError, StreamingDriveCycle.from_drive_cycle, self.udds, chunk_size=0)
+
+
+class TestCheckpointResume(VoltUDDSTestCase):
+    def setUp(self):
+        self.model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                            external_condition_obj=self.waterloo)
+        self.sol = self.model.simulate()
+
+    def test_resume_from_solution(self):
+        state = EV_sim.sol.SimState.from_solution(self.sol, 500)
+        for engine in ["loop", "segment"]:
+            sol_resumed = self.model.simulate(engine=engine, start_state=state)
+            self.assertEqual(1370 - 500, len(sol_resumed.t))
+            for name in EV_sim.sol.SOLUTION_CHANNELS:
+                self.assertTrue(np.allclose(getattr(self.sol, name)[500:], getattr(sol_resumed, name),
+                                            rtol=SEGMENT_RTOL, atol=SEGMENT_ATOL))
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "state.json")
+            for engine in ["loop", "segment"]:
+                sol_checkpointed = self.model.simulate(engine=engine, channels=["battery_SOC"], checkpoint_every=300,
+                                                       checkpoint_file=file_name)
+                self.assertTrue(np.allclose(self.sol.battery_SOC, sol_checkpointed.battery_SOC, rtol=SEGMENT_RTOL,
+                                            atol=SEGMENT_ATOL))
+                state = EV_sim.sol.SimState.load(file_name)
+                self.assertEqual(1370, state.index)
+                self.assertAlmostEqual(self.sol.battery_SOC[-1], state.prev_SOC)
+
+    def test_resume_from_final_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "state.json")
+            self.model.simulate(checkpoint_every=100, checkpoint_file=file_name)
+            for engine in ["loop", "segment"]:
+                sol_resumed = self.model.simulate(engine=engine, start_state=EV_sim.sol.SimState.load(file_name))
+                self.assertEqual(0, len(sol_resumed.t))
+                self.assertEqual(0, len(sol_resumed.battery_SOC))
+
+    def test_invalid_start(self):
+        state = EV_sim.sol.SimState.from_solution(self.sol, 500)
+        self.assertRaises(ValueError, self.model.simulate, start_index=10)
+        self.assertRaises(ValueError, self.model.simulate, start_state=state, start_index=2000)
+        self.assertRaises(ValueError, self.model.simulate, checkpoint_every=10)
+        self.assertRaises(ValueError, EV_sim.sol.SimState.from_solution, self.sol, 0)
+
+
+class TestIncrementalSimulation(VoltUDDSTestCase):
+    def setUp(self):
+        self.udds = EV_sim.DriveCycle(drive_cycle_name="udds")
+        self.model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                            external_condition_obj=self.waterloo)
+
+    def test_edit_recalculates_section(self):
+        self.model.simulate_incremental()
+        self.assertEqual((0, 1370), self.model.incremental_range)
+        self.udds.speed_kmph = self.udds.speed_kmph.copy()
+        self.udds.speed_kmph[300:320] *= 1.1
+        sol_incremental = self.model.simulate_incremental()
+        start, stop = self.model.incremental_range
+        self.assertEqual(300, start)
+        self.assertLess(stop, 1370)
+        sol = self.model.simulate()
+        for name in EV_sim.sol.SOLUTION_CHANNELS:
+            self.assertTrue(np.allclose(getattr(sol, name), getattr(sol_incremental, name), rtol=1e-6, atol=1e-6))
+
+    def test_no_edit(self):
+        sol1 = self.model.simulate_incremental(channels=["current"])
+        sol2 = self.model.simulate_incremental(channels=["current"])
+        self.assertEqual((0, 0), self.model.incremental_range)
+        self.assertTrue(np.array_equal(sol1.current, sol2.current))
+
+
+class TestResampledDriveCycle(VoltUDDSTestCase):
+    def test_energy_within_bound(self):
+        model = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=self.udds,
+                                       external_condition_obj=self.waterloo)
+        coarse = model.resample_drive_cycle(rtol=0.02)
+        self.assertLess(len(coarse.t), len(self.udds.t) / 5)
+        sol = model.simulate(engine="segment")
+        coarse_sol = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=coarse,
+                                            external_condition_obj=self.waterloo).simulate(engine="segment")
+        self.assertLessEqual(abs(coarse_sol.battery_SOC[-1] - sol.battery_SOC[-1]), 0.02 * abs(sol.battery_SOC[-1]))
+
+
+class TestRangeEstimation(VoltUDDSTestCase):
+    def test_matches_repeated_cycle(self):
+        hwfet = EV_sim.DriveCycle(drive_cycle_name="hwfet")
+        estimate = estimate_range(ev=self.volt, cycle=hwfet, cond=self.waterloo)
+        self.assertEqual(1, estimate.simulated_repetitions)
+
+        repeated = EV_sim.DriveCycle(drive_cycle_name=None)
+        num_repetitions = int(np.ceil(estimate.repetitions))
+        repeated.t = np.arange(len(hwfet.t) * num_repetitions)
+        repeated.speed_kmph = np.tile(hwfet.speed_kmph, num_repetitions)
+        sol = EV_sim.VehicleDynamics(ev_obj=self.volt, drive_cycle_obj=repeated,
+                                     external_condition_obj=self.waterloo).simulate(engine="segment")
+        k = np.nonzero(-sol.battery_SOC >= usable_charge(self.volt))[0][0]
+        self.assertTrue(sol.distance[k - 1] <= estimate.range_km <= sol.distance[k])
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+import numpy as np
+
+from EV_sim.config import definations
+from EV_sim.database import get_database
+from EV_sim.query import EVIndex, get_index
+
+
+class TestEVIndex(unittest.TestCase):
+    index = get_index()
+
+    def test_range(self):
+        pack_energy = self.index.table.pack_energy
+        rows = self.index.range('pack_energy', 60.0, 200.0)
+        self.assertEqual(np.nonzero((pack_energy >= 60.0) & (pack_energy <= 200.0))[0].tolist(), rows.tolist())
+        L_max = self.index.table['motor.L_max']
+        self.assertEqual(np.nonzero(L_max <= 420.0)[0].tolist(), self.index.range('L_max', high=420.0).tolist())
+        self.assertEqual(np.nonzero(~np.isnan(L_max))[0].tolist(), self.index.range('motor.L_max').tolist())
+
+    def test_equals(self):
+        database = get_database()
+        manufacturer = database.text[database.index.index(('basic vehicle', 'manufacturer'))]
+        expected = [alias for alias, value in zip(database.aliases, manufacturer) if value == "Tesla"]
+        self.assertEqual(expected, self.index.query(manufacturer="Tesla"))
+        self.assertEqual([], self.index.query(manufacturer="Unknown manufacturer"))
+        self.assertEqual(sorted(self.index.query(cell_chem="NCA") + self.index.query(cell_chem="LFP")),
+                         sorted(self.index.query(cell_chem={"NCA", "LFP"})))
+        self.assertEqual(self.index.range('motor.L_max', 420.0, 420.0).tolist(),
+                         self.index.equals('L_max', 420.0).tolist())
+
+    def test_query(self):
+        table = self.index.table
+        mask = (table.pack_energy >= 60.0) & (table['motor.L_max'] <= 450.0)
+        mask &= np.array([alias.startswith("Tesla") for alias in table.aliases])
+        expected = [alias for alias, match in zip(table.aliases, mask) if match]
+        self.assertEqual(expected, self.index.query(manufacturer="Tesla", pack_energy=(60.0, None),
+                                                    motor__L_max=(None, 450.0)))
+        self.assertEqual(expected, self.index.query(where={'motor.L_max': (None, 450.0)}, manufacturer="Tesla",
+                                                    pack_energy=(60.0, None)))
+        self.assertEqual(table.aliases, self.index.query())
+
+    def test_parameter_names(self):
+        self.assertRaises(ValueError, self.index.range, 'eff')  # motor, pack and drive train efficiencies
+        self.assertRaises(ValueError, self.index.range, 'top_speed')
+        self.assertRaises(ValueError, self.index.categories, 'pack_energy')
+        self.assertIn("Unknown", self.index.categories('cell_chem'))
+
+    def test_cache(self):
+        self.assertIs(get_index(), get_index())
+        relative_dir = os.path.relpath(definations.EV_DATA_DIR)
+        self.assertIs(get_index(), get_index(database_dir=relative_dir))
+        self.assertIs(get_index(), get_index(database_dir=os.path.join(os.path.dirname(relative_dir), ".",
+                                                                       os.path.basename(relative_dir))))
+        self.assertRaises(ValueError, EVIndex, self.index.table, {'manufacturer': ["Tesla"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
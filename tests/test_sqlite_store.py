@@ -0,0 +1,82 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import EV_sim
+from EV_sim.database import _to_float, get_database
+from EV_sim.sqlite_store import EVParameterStore, is_sqlite_file, import_csv, get_store, close_stores
+
+
+class TestEVParameterStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, "EV_dataset.db")
+
+    def tearDown(self):
+        close_stores()
+        self.tmp_dir.cleanup()
+
+    def test_import_csv(self):
+        store = import_csv(self.db_file)
+        database = get_database()
+        self.assertEqual(database.aliases, store.aliases)
+        for alias in database.aliases:
+            for classification, params in database.vehicle(alias).items():
+                for name, entry in params.items():
+                    stored = store.vehicle(alias)[classification][name]
+                    if isinstance(entry, float):  # the numeric parameters, repr compares the nan entries
+                        stored = _to_float(stored)
+                    self.assertEqual(repr(entry), repr(stored))
+        # importing again replaces the vehicles
+        import_csv(self.db_file)
+        self.assertEqual(database.aliases, store.aliases)
+        self.assertRaises(Exception, store.vehicle, "unknown alias")
+
+    def test_ev_from_database(self):
+        import_csv(self.db_file)
+        self.assertTrue(is_sqlite_file(self.db_file))
+        self.assertFalse(is_sqlite_file(EV_sim.config.definations.EV_DATA_DIR))
+        ev = EV_sim.EVFromDatabase(alias_name="Volt_2017", database_dir=self.db_file)
+        expected = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        self.assertEqual(expected.kernel_params(), ev.kernel_params())
+        self.assertEqual(expected.pack.cell_chem, ev.pack.cell_chem)
+        self.assertEqual(get_database().aliases, EV_sim.EVFromDatabase.list_all_EV_alias(file_dir=self.db_file))
+
+    def test_add_and_remove_vehicle(self):
+        store = get_store(self.db_file, create=True)
+        self.assertIs(store, get_store(self.db_file))
+        self.assertEqual([], store.aliases)
+        volt = get_database().vehicle("Volt_2017")
+        store.add_vehicle("Volt_copy", volt)
+        self.assertEqual(["Volt_copy"], store.aliases)
+        self.assertEqual(volt["wheel"]["radius [m]"], float(store.vehicle("Volt_copy")["wheel"]["radius [m]"]))
+        self.assertEqual("3", store.vehicle("Volt_copy")["module"]["Np"])
+        store.add_vehicle("Volt_copy", {**volt, 'wheel': {**volt['wheel'], 'radius [m]': 0.5}})
+        self.assertEqual("0.5", store.vehicle("Volt_copy")["wheel"]["radius [m]"])
+        # the vehicles are stored in the file
+        other = EVParameterStore(self.db_file)
+        self.assertEqual(["Volt_copy"], other.aliases)
+        other.close()
+        store.remove_vehicle("Volt_copy")
+        self.assertEqual([], store.aliases)
+
+    def test_missing_file(self):
+        self.assertRaises(FileNotFoundError, EV_sim.EVFromDatabase, alias_name="Volt_2017", database_dir=self.db_file)
+        self.assertRaises(FileNotFoundError, EV_sim.EVFromDatabase.list_all_EV_alias, file_dir=self.db_file)
+        self.assertFalse(os.path.exists(self.db_file))
+
+    def test_threads(self):
+        store = import_csv(self.db_file)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.vehicle("Volt_2017")["motor"]["Lmax [Nm]"]))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([get_database().vehicle("Volt_2017")["motor"]["Lmax [Nm]"]] * 4, [float(x) for x in results])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import copy
+import unittest
+
+import numpy as np
+
+import EV_sim
+from EV_sim.sweep import SWEEP_METRICS, iter_sweep, sweep
+
+
+class TestSweep(unittest.TestCase):
+    volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+    us06 = EV_sim.DriveCycle(drive_cycle_name="us06")
+    waterloo = EV_sim.ExternalConditions(rho=1.225, road_grade=0.3)
+    grid = {"C_d": [0.22, 0.3], "gear_box.N": [10.0, 12.0, 14.0], "Np": [3, 4]}
+
+    def test_result_shape_and_labels(self):
+        result = sweep(self.volt, self.grid, self.us06, self.waterloo)
+        self.assertEqual(("C_d", "drive_train.gear_box.N", "pack.Np"), result.dims)
+        self.assertEqual((2, 3, 2), result.shape)
+        for metric in SWEEP_METRICS:
+            self.assertEqual((2, 3, 2), result[metric].shape)
+        self.assertEqual((3, 2), result.sel("energy", C_d=0.3).shape)
+
+    def test_matches_simulate(self):
+        result = sweep(self.volt, self.grid, self.us06, self.waterloo)
+        ev = copy.deepcopy(self.volt)
+        ev.C_d = 0.3
+        ev.drive_train.gear_box.N = 14.0
+        sol = EV_sim.VehicleDynamics(ev_obj=ev, drive_cycle_obj=self.us06, external_condition_obj=self.waterloo).simulate()
+        selection = {"C_d": 0.3, "gear_box__N": 14.0, "Np": 3}
+        energy = np.sum(sol.battery_demand * np.diff(sol.t, prepend=-1)) / 3600
+        self.assertAlmostEqual(sol.battery_SOC[-1], result.sel("final_SOC", **selection))
+        self.assertAlmostEqual(np.max(sol.current), result.sel("peak_current", **selection))
+        self.assertAlmostEqual(energy, result.sel("energy", **selection))
+        self.assertAlmostEqual(energy * 1000 / sol.distance[-1], result.sel("Wh_per_km", **selection))
+
+    def test_streamed_chunks(self):
+        chunks = list(iter_sweep(self.volt, self.grid, self.us06, self.waterloo, chunk_size=5))
+        self.assertEqual([slice(0, 5), slice(5, 10), slice(10, 12)], [chunk for chunk, metrics in chunks])
+        result = sweep(self.volt, self.grid, self.us06, self.waterloo)
+        streamed = np.concatenate([metrics["final_SOC"] for chunk, metrics in chunks])
+        self.assertTrue(np.array_equal(result["final_SOC"].reshape(-1), streamed))
+
+    def test_invalid_parameter(self):
+        self.assertRaises(ValueError, sweep, self.volt, {"unknown": [1.0]}, self.us06, self.waterloo)
+        self.assertRaises(ValueError, sweep, self.volt, {}, self.us06, self.waterloo)
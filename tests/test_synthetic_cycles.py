@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+import EV_sim
+from EV_sim.drivecycles import get_registry
+from EV_sim.synthetic_cycles import MarkovDriveCycleGenerator
+
+
+class TestMarkovDriveCycleGenerator(unittest.TestCase):
+    generator = MarkovDriveCycleGenerator.from_bundled()
+
+    def test_seeded_reproducibility(self):
+        t, speeds = self.generator.sample(num_cycles=20, duration=600, seed=1)
+        self.assertTrue(np.array_equal(np.arange(601), t))
+        self.assertEqual((20, 601), speeds.shape)
+        self.assertTrue(np.array_equal(speeds, self.generator.sample(num_cycles=20, duration=600, seed=1)[1]))
+        self.assertFalse(np.array_equal(speeds, self.generator.sample(num_cycles=20, duration=600, seed=2)[1]))
+
+    def test_statistics(self):
+        _, speeds = self.generator.sample(num_cycles=200, duration=3600, seed=0)
+        registry = get_registry()
+        bundled = np.concatenate([registry.get(name).speed_mps for name in registry.names()])
+        self.assertTrue(np.all(speeds[:, 0] == 0.0))
+        self.assertGreaterEqual(np.min(speeds), 0.0)
+        self.assertLessEqual(np.max(speeds), self.generator.max_speed)
+        self.assertLessEqual(np.max(np.abs(np.diff(speeds, axis=1))), np.max(np.abs(np.diff(bundled))) + 1e-9)
+        self.assertAlmostEqual(np.mean(bundled), np.mean(speeds), delta=0.2 * np.mean(bundled))
+        self.assertAlmostEqual(np.mean(bundled == 0.0), np.mean(speeds == 0.0), delta=0.1)
+
+    def test_generate_drive_cycles(self):
+        cycles = self.generator.generate(num_cycles=3, duration=900, seed=0, dtype=np.float32)
+        self.assertEqual(["synthetic_0", "synthetic_1", "synthetic_2"], [cycle.drive_cycle_name for cycle in cycles])
+        self.assertEqual(np.float32, cycles[0].speed_mps.dtype)
+        self.assertIs(cycles[0].t, cycles[1].t)
+        self.assertFalse(cycles[0].t.flags.writeable)
+        volt = EV_sim.EVFromDatabase(alias_name="Volt_2017")
+        waterloo = EV_sim.ExternalConditions(rho=1.225, road_grade=0.0)
+        sol = EV_sim.VehicleDynamics(ev_obj=volt, drive_cycle_obj=cycles[0], external_condition_obj=waterloo).simulate()
+        self.assertEqual(901, len(sol.t))
+        self.assertTrue(np.all(np.isfinite(sol.battery_SOC)))
+
+    def test_invalid_drive_cycles(self):
+        cycle = EV_sim.DriveCycle(drive_cycle_name=None)
+        cycle.t = np.array([0.0, 1.0, 3.0])
+        cycle.speed_mps = np.zeros(3)
+        self.assertRaises(ValueError, MarkovDriveCycleGenerator, [cycle])
+        self.assertRaises(ValueError, MarkovDriveCycleGenerator, [])
+
+
+if __name__ == '__main__':
+    unittest.main()